@@ -0,0 +1,83 @@
+import os
+import time
+
+from fastapi import Request
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.database.database import (
+    DATABASE_READ_URLS, DATABASE_URL, ReplicaSet, pool_options, read_your_writes_until, set_sqlite_pragmas, watch_replica
+)
+
+# Pila asíncrona (AsyncSession) para las rutas de mayor tráfico: la concurrencia queda
+# limitada por el pool de conexiones y no por el threadpool de FastAPI.
+
+# Controladores asíncronos equivalentes a los síncronos
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+def to_async_url(url: str) -> str:
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)).render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+def _create_async_engine(url: str, **options):
+    options = {**pool_options(url), **options}
+    if options.get("poolclass"):
+        options["poolclass"] = AsyncAdaptedQueuePool
+    if url.startswith("sqlite"):
+        async_engine = create_async_engine(url, connect_args={"check_same_thread": False}, **options)
+        event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
+        return async_engine
+    return create_async_engine(url, **options)
+
+async_engine = _create_async_engine(ASYNC_DATABASE_URL)
+
+async_replicas = ReplicaSet([_create_async_engine(to_async_url(url), pool_pre_ping=True) for url in DATABASE_READ_URLS])
+for _replica in async_replicas.engines:
+    watch_replica(async_replicas, _replica)
+
+# Equivalente asíncrono de warm_pool
+async def warm_async_pool() -> int:
+    opened = 0
+    for target in [async_engine, *async_replicas.engines]:
+        pool = target.sync_engine.pool
+        count = pool.size() if isinstance(pool, QueuePool) else 1
+        connections = []
+        try:
+            for _ in range(count):
+                connections.append(await target.connect())
+        except exc.DBAPIError:
+            if target is async_engine:
+                raise
+            async_replicas.mark_failed(target)
+        finally:
+            for connection in connections:
+                await connection.close()
+        opened += len(connections)
+    return opened
+
+# Sin expirar tras el commit: en modo asíncrono no se pueden recargar atributos de forma perezosa
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+# Sesión asíncrona de lectura y escritura (siempre el primario)
+async def get_async_db(request: Request):
+    async with AsyncSessionLocal(info={"request": request}) as db:
+        yield db
+
+# Sesión asíncrona de solo lectura, con el mismo enrutado que get_read_db (conexión perezosa)
+async def get_async_read_db(request: Request):
+    replica = None
+    if async_replicas.engines and read_your_writes_until(request) < time.time():
+        replica = async_replicas.choose()
+    db = AsyncSessionLocal(bind=replica) if replica is not None else AsyncSessionLocal(info={"request": request})
+    try:
+        yield db
+    finally:
+        await db.close()
@@ -1,23 +1,215 @@
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, event, exc
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
-# Cargar variables de entorno
+# Cargar variables de entorno (única carga del .env: el resto de módulos importan este antes de leerlas)
 load_dotenv()
 
 # Obtener URL de conexión desde variables de entorno
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-# Configuración especial para SQLite
-if DATABASE_URL and DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        DATABASE_URL, connect_args={"check_same_thread": False}
-    )
-else:
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "si", "sí")
+
+# Configuración del pool de conexiones
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", -1))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", False)
+
+# Réplicas de solo lectura (URLs separadas por comas) y ventana de "leer tus escrituras"
+DATABASE_READ_URLS = [url.strip() for url in os.getenv("DATABASE_READ_URLS", "").split(",") if url.strip()]
+REPLICA_RETRY_INTERVAL = float(os.getenv("REPLICA_RETRY_INTERVAL", 30))
+READ_YOUR_WRITES_WINDOW = float(os.getenv("READ_YOUR_WRITES_WINDOW", 5))
+READ_PRIMARY_COOKIE = "read_primary_until"
+
+# Pragmas de SQLite aplicados a cada conexión nueva
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", -20000))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 268435456))
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool que mide cuánto esperan las peticiones por una conexión."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._depth = threading.local()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        # QueuePool._do_get se llama a sí mismo al reintentar: solo se mide la llamada externa
+        if getattr(self._depth, "value", 0):
+            return super()._do_get()
+        self._depth.value = 1
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            self._depth.value = 0
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+def pool_options(url: str) -> dict:
+    # Las bases SQLite en memoria comparten una única conexión: no admiten pool configurable
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/") == "sqlite:"):
+        return {}
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+    cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+def _create_engine(url: str, **options):
+    options = {**pool_options(url), **options}
+    # Configuración especial para SQLite
+    if url and url.startswith("sqlite"):
+        sqlite_engine = create_engine(url, connect_args={"check_same_thread": False}, **options)
+        event.listen(sqlite_engine, "connect", set_sqlite_pragmas)
+        return sqlite_engine
     # Configuración para otras bases de datos como PostgreSQL
-    engine = create_engine(DATABASE_URL)
+    return create_engine(url, **options)
+
+engine = _create_engine(DATABASE_URL)
+
+class ReplicaSet:
+    """Reparte las lecturas entre réplicas en turno rotatorio, saltando las caídas."""
+
+    def __init__(self, engines):
+        self.engines = engines
+        self._lock = threading.Lock()
+        self._next = 0
+        self._failed_at = {}
+
+    def mark_failed(self, replica) -> None:
+        with self._lock:
+            self._failed_at[replica] = time.monotonic()
+
+    def mark_healthy(self, replica) -> None:
+        with self._lock:
+            self._failed_at.pop(replica, None)
+
+    def choose(self):
+        # Una réplica caída vuelve a probarse pasado REPLICA_RETRY_INTERVAL
+        now = time.monotonic()
+        with self._lock:
+            for _ in range(len(self.engines)):
+                replica = self.engines[self._next]
+                self._next = (self._next + 1) % len(self.engines)
+                failed_at = self._failed_at.get(replica)
+                if failed_at is None or now - failed_at > REPLICA_RETRY_INTERVAL:
+                    return replica
+        return None
+
+    def status(self) -> list:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "url": replica.url.render_as_string(hide_password=True),
+                    "healthy": replica not in self._failed_at or now - self._failed_at[replica] > REPLICA_RETRY_INTERVAL
+                }
+                for replica in self.engines
+            ]
+
+# Las réplicas verifican la conexión al sacarla del pool para detectar caídas enseguida
+replicas = ReplicaSet([_create_engine(url, pool_pre_ping=True) for url in DATABASE_READ_URLS])
+
+def watch_replica(replica_set: ReplicaSet, replica) -> None:
+    # Los motores asíncronos reciben los eventos a través de su motor síncrono interno
+    target = getattr(replica, "sync_engine", replica)
+
+    @event.listens_for(target, "handle_error")
+    def _on_error(context):
+        if context.is_disconnect or isinstance(context.original_exception, target.dialect.loaded_dbapi.OperationalError):
+            replica_set.mark_failed(replica)
+
+    @event.listens_for(target, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        replica_set.mark_healthy(replica)
+
+for _replica in replicas.engines:
+    watch_replica(replicas, _replica)
+
+# Estadísticas del pool en vivo
+def get_pool_status() -> dict:
+    pool = engine.pool
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+            timeout=pool.timeout(),
+        )
+    if isinstance(pool, InstrumentedQueuePool):
+        with pool._stats_lock:
+            status.update(
+                checkouts=pool.checkouts,
+                timeouts=pool.timeouts,
+                wait_total_seconds=round(pool.wait_total, 6),
+                wait_avg_seconds=round(pool.wait_total / pool.checkouts, 6) if pool.checkouts else 0.0,
+                wait_max_seconds=round(pool.wait_max, 6),
+            )
+    if replicas.engines:
+        status["replicas"] = replicas.status()
+    return status
+
+# Abrir por adelantado las conexiones del pool (primario y réplicas) para que las primeras
+# peticiones tras el arranque no paguen el connect ni los PRAGMA
+def warm_pool() -> int:
+    opened = 0
+    for target in [engine, *replicas.engines]:
+        count = target.pool.size() if isinstance(target.pool, QueuePool) else 1
+        connections = []
+        try:
+            for _ in range(count):
+                connections.append(target.connect())
+        except exc.DBAPIError:
+            if target is engine:
+                raise
+            replicas.mark_failed(target)
+        finally:
+            for connection in connections:
+                connection.close()
+        opened += len(connections)
+    return opened
 
 # Crear sesión local
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -25,10 +217,43 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Base para modelos
 Base = declarative_base()
 
-# Función para obtener una sesión de base de datos
-def get_db():
-    db = SessionLocal()
+# Marcar la petición que confirma cambios para que sus próximas lecturas vayan al primario
+# (se escucha en Session para cubrir también las sesiones asíncronas)
+@event.listens_for(Session, "after_commit")
+def _remember_write(session):
+    request = session.info.get("request")
+    if request is not None:
+        request.state.wrote_data = True
+
+def read_your_writes_until(request: Request) -> float:
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0))
+    except ValueError:
+        return 0.0
+
+# Función para obtener una sesión de base de datos (lectura y escritura, siempre el primario).
+# Es la unidad de trabajo de la petición: la conexión se saca del pool con la primera sentencia
+# (una petición que no llega a consultar no la toca), los handlers usan flush() cuando necesitan
+# ids intermedios y confirman una sola vez al final. Tras el commit los objetos no se expiran,
+# así que devolverlos no cuesta un refresh() ni una recarga por cada atributo.
+def get_db(request: Request):
+    db = SessionLocal(info={"request": request}, expire_on_commit=False)
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Sesión de solo lectura: una réplica sana, o el primario si no hay réplicas disponibles
+# o si el cliente escribió hace menos de READ_YOUR_WRITES_WINDOW segundos. La sesión solo se
+# enlaza al motor de la réplica: como en get_db, la conexión se saca del pool (y se verifica
+# con pre_ping) con la primera sentencia. Si la réplica no responde, esa sentencia falla y el
+# listener handle_error la aparta durante REPLICA_RETRY_INTERVAL.
+def get_read_db(request: Request):
+    replica = None
+    if replicas.engines and read_your_writes_until(request) < time.time():
+        replica = replicas.choose()
+    db = SessionLocal(bind=replica) if replica is not None else SessionLocal(info={"request": request})
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
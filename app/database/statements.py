@@ -0,0 +1,34 @@
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.orm import selectinload
+
+from app.models.models import Cart, CartItem, Product, User
+
+# Sentencias de las búsquedas más frecuentes, construidas una sola vez al importar.
+# Los valores llegan como parámetros enlazados, así que cada petición reutiliza el mismo
+# objeto: SQLAlchemy memoriza su clave de caché y no vuelve a construir ni recorrer la consulta.
+#
+# Uso: db.scalars(CART_BY_USER, {"user_id": user.id}).first()
+
+# El email se pasa ya en minúsculas (usa el índice ix_users_email_lower)
+USER_BY_EMAIL = select(User).where(func.lower(User.email) == bindparam("email"))
+
+PRODUCT_BY_ID = select(Product).where(Product.id == bindparam("product_id"))
+
+ACTIVE_PRODUCT_BY_ID = select(Product).where(Product.id == bindparam("product_id"), Product.is_active == True)
+
+PRODUCT_WITH_CATEGORIES_BY_ID = PRODUCT_BY_ID.options(selectinload(Product.categories))
+
+CART_BY_USER = select(Cart).where(Cart.user_id == bindparam("user_id"))
+
+# Carrito con sus productos cargados por adelantado (en modo asíncrono no hay carga perezosa)
+CART_WITH_ITEMS_BY_USER = CART_BY_USER.options(
+    selectinload(Cart.items).selectinload(CartItem.product).selectinload(Product.categories)
+).execution_options(populate_existing=True)
+
+CART_ITEM_BY_ID = select(CartItem).where(CartItem.id == bindparam("item_id"), CartItem.cart_id == bindparam("cart_id"))
+
+CART_ITEM_BY_PRODUCT = select(CartItem).where(CartItem.cart_id == bindparam("cart_id"), CartItem.product_id == bindparam("product_id"))
+
+CART_ITEM_WITH_PRODUCT_BY_ID = select(CartItem).where(CartItem.id == bindparam("item_id")).options(
+    selectinload(CartItem.product).selectinload(Product.categories)
+).execution_options(populate_existing=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, DateTime, Table, Text, Enum
+from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, DateTime, Table, Text, Enum, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -10,11 +10,13 @@ from app.database.database import Base
 product_category = Table(
     'product_category',
     Base.metadata,
-    Column('product_id', Integer, ForeignKey('products.id')),
-    Column('category_id', Integer, ForeignKey('categories.id'))
+    Column('product_id', Integer, ForeignKey('products.id'), primary_key=True),
+    Column('category_id', Integer, ForeignKey('categories.id'), primary_key=True),
+    # Índice de cobertura para listar los productos de una categoría sin leer la tabla
+    Index('ix_product_category_category_product', 'category_id', 'product_id')
 )
 
-class GenderType(enum.Enum):
+class GenderType(str, enum.Enum):
     HOMBRE = "hombre"
     MUJER = "mujer"
     UNISEX = "unisex"
@@ -52,6 +54,12 @@ class Product(Base):
     
     created_at = Column(DateTime(timezone=True), default=func.now())
     updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+    
+    # Índices parciales: el catálogo solo consulta productos activos
+    __table_args__ = (
+        Index("ix_products_active_price", price, id, sqlite_where=is_active == True, postgresql_where=is_active == True),
+        Index("ix_products_active_name", name, id, sqlite_where=is_active == True, postgresql_where=is_active == True),
+    )
 
 class User(Base):
     __tablename__ = "users"
@@ -71,6 +79,13 @@ class User(Base):
     
     created_at = Column(DateTime(timezone=True), default=func.now())
     updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+    
+    # Índices para búsquedas sin distinguir mayúsculas (por prefijo) en el directorio de usuarios
+    __table_args__ = (
+        Index("ix_users_email_lower", func.lower(email)),
+        Index("ix_users_first_name_lower", func.lower(first_name)),
+        Index("ix_users_last_name_lower", func.lower(last_name)),
+    )
 
 class Address(Base):
     __tablename__ = "addresses"
@@ -89,6 +104,10 @@ class Address(Base):
     
     created_at = Column(DateTime(timezone=True), default=func.now())
     updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index("ix_addresses_user_id", "user_id"),
+    )
 
 class Cart(Base):
     __tablename__ = "carts"
@@ -118,8 +137,12 @@ class CartItem(Base):
     
     created_at = Column(DateTime(timezone=True), default=func.now())
     updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index("ix_cart_items_cart_id_product_id", "cart_id", "product_id"),
+    )
 
-class OrderStatus(enum.Enum):
+class OrderStatus(str, enum.Enum):
     PENDIENTE = "pendiente"
     PAGADO = "pagado"
     ENVIADO = "enviado"
@@ -141,6 +164,11 @@ class Order(Base):
     
     created_at = Column(DateTime(timezone=True), default=func.now())
     updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+    
+    # Historial de órdenes de un usuario, de la más reciente a la más antigua
+    __table_args__ = (
+        Index("ix_orders_user_id_created_at", "user_id", "created_at"),
+    )
 
 class OrderItem(Base):
     __tablename__ = "order_items"
@@ -157,4 +185,125 @@ class OrderItem(Base):
     product = relationship("Product", back_populates="order_items")
     
     created_at = Column(DateTime(timezone=True), default=func.now())
-    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index("ix_order_items_order_id", "order_id"),
+    )
+
+class MovementType(str, enum.Enum):
+    RESERVA = "reserva"
+    VENTA = "venta"
+    CANCELACION = "cancelacion"
+    REPOSICION = "reposicion"
+
+class InventoryMovement(Base):
+    __tablename__ = "inventory_movements"
+    
+    # Libro de movimientos de solo inserción: nunca se actualiza ni se borra
+    id = Column(Integer, primary_key=True, index=True)
+    quantity = Column(Integer, nullable=False)  # Positivo entra stock, negativo sale
+    movement_type = Column(Enum(MovementType), nullable=False)
+    
+    # Relaciones
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    product = relationship("Product")
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=True)
+    
+    created_at = Column(DateTime(timezone=True), default=func.now())
+    
+    __table_args__ = (
+        Index("ix_inventory_movements_product_id_id", "product_id", "id"),
+    )
+
+class InventoryBalance(Base):
+    __tablename__ = "inventory_balances"
+    
+    # Saldo compactado: incluye todos los movimientos hasta last_movement_id
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0)
+    last_movement_id = Column(Integer, nullable=False, default=0)
+    
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+
+class HotProduct(Base):
+    __tablename__ = "hot_products"
+    
+    # Productos marcados como "calientes": su stock se reparte en varias filas de stock_shards
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    shard_count = Column(Integer, nullable=False)
+    hot_until = Column(DateTime(timezone=True), nullable=False)
+    
+    created_at = Column(DateTime(timezone=True), default=func.now())
+
+class StockShard(Base):
+    __tablename__ = "stock_shards"
+    
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    shard_index = Column(Integer, primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0)
+
+class DiscountType(str, enum.Enum):
+    PORCENTAJE = "porcentaje"
+    FIJO = "fijo"
+
+class Promotion(Base):
+    __tablename__ = "promotions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), nullable=False)
+    discount_type = Column(Enum(DiscountType), nullable=False)
+    value = Column(Float, nullable=False)  # Porcentaje (0-100) o importe fijo por unidad
+    min_quantity = Column(Integer, default=1)  # Regla de paquete: unidades mínimas del alcance en el carrito
+    is_active = Column(Boolean, default=True)
+    starts_at = Column(DateTime(timezone=True), nullable=True)
+    ends_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Alcance (sin alcance la promoción aplica a todo el catálogo)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
+    gender = Column(Enum(GenderType), nullable=True)
+    
+    created_at = Column(DateTime(timezone=True), default=func.now())
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+
+class ProductCooccurrence(Base):
+    __tablename__ = "product_cooccurrence"
+    
+    # Matriz dispersa producto x producto de órdenes en común.
+    # La diagonal (product_id == other_product_id) guarda el número de órdenes del producto.
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    other_product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class ProductRecommendation(Base):
+    __tablename__ = "product_recommendations"
+    
+    # Top-K de productos comprados junto a product_id, ya ordenados por rank
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    related_product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    score = Column(Float, nullable=False)
+
+class RecommendationRun(Base):
+    __tablename__ = "recommendation_runs"
+    
+    # Cada ejecución guarda la última orden procesada para las actualizaciones incrementales
+    id = Column(Integer, primary_key=True, index=True)
+    last_order_id = Column(Integer, nullable=False)
+    orders_processed = Column(Integer, nullable=False, default=0)
+    products_updated = Column(Integer, nullable=False, default=0)
+    
+    created_at = Column(DateTime(timezone=True), default=func.now())
+
+class ProductSalesCounter(Base):
+    __tablename__ = "product_sales_counters"
+    
+    # Unidades vendidas con decaimiento exponencial, referidas al instante decayed_at.
+    # Se alimentan de inventory_movements, de modo que el checkout no escribe en esta tabla.
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    units_24h = Column(Float, nullable=False, default=0)
+    units_7d = Column(Float, nullable=False, default=0)
+    units_30d = Column(Float, nullable=False, default=0)
+    units_total = Column(Integer, nullable=False, default=0)
+    last_movement_id = Column(Integer, nullable=False, default=0)
+    decayed_at = Column(DateTime, nullable=False)
@@ -0,0 +1,59 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from app.database.database import get_pool_status
+from app.models.models import User
+from app.schemas.schemas import PoolStatus, ProfileDetail, ProfileSummary, SlowQuery
+from app.utils.auth import get_current_admin_user
+from app.utils.profiling import get_profile, list_profiles
+from app.utils.slow_queries import get_slow_queries, reset_slow_queries
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    responses={404: {"description": "No encontrado"}}
+)
+
+SLOW_QUERY_ORDERS = ("total", "max", "count")
+
+@router.get("/pool", response_model=PoolStatus)
+def get_database_pool(current_user: User = Depends(get_current_admin_user)):
+    # Conexiones en uso, desbordamiento y tiempos de espera del pool
+    return get_pool_status()
+
+@router.get("/slow-queries", response_model=List[SlowQuery])
+def list_slow_queries(
+    limit: int = Query(20, ge=1, le=500),
+    order: str = "total",
+    current_user: User = Depends(get_current_admin_user)
+):
+    # Consultas que superan SLOW_QUERY_THRESHOLD_MS, agrupadas por huella, con su plan
+    if order not in SLOW_QUERY_ORDERS:
+        raise HTTPException(status_code=400, detail=f"order debe ser uno de: {', '.join(SLOW_QUERY_ORDERS)}")
+    return get_slow_queries(limit, order)
+
+@router.delete("/slow-queries", status_code=status.HTTP_204_NO_CONTENT)
+def clear_slow_queries(current_user: User = Depends(get_current_admin_user)):
+    reset_slow_queries()
+
+@router.get("/profiles", response_model=List[ProfileSummary])
+def list_request_profiles(current_user: User = Depends(get_current_admin_user)):
+    # Perfiles guardados en este proceso, del más reciente al más antiguo
+    return list_profiles()
+
+def _get_profile_or_404(profile_id: str):
+    profile = get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado (puede ser de otro worker o haber expirado)")
+    return profile
+
+@router.get("/profiles/{profile_id}", response_model=ProfileDetail)
+def get_request_profile(profile_id: str, current_user: User = Depends(get_current_admin_user)):
+    return _get_profile_or_404(profile_id).detail()
+
+@router.get("/profiles/{profile_id}/folded", response_class=PlainTextResponse)
+def get_request_profile_folded(profile_id: str, current_user: User = Depends(get_current_admin_user)):
+    # Pilas en formato "folded": flamegraph.pl, speedscope o inferno
+    return PlainTextResponse(_get_profile_or_404(profile_id).folded())
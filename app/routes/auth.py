@@ -13,8 +13,9 @@ router = APIRouter(
     responses={401: {"description": "No autorizado"}}
 )
 
+# Síncrona: bcrypt y la consulta del usuario se ejecutan en el threadpool, sin bloquear el bucle de eventos
 @router.post("/login", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     user = authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
@@ -1,11 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from app.database.database import get_db
-from app.models.models import Cart, CartItem, Product, User
+from app.database.async_database import get_async_db
+from app.database.statements import (
+    ACTIVE_PRODUCT_BY_ID, CART_BY_USER, CART_ITEM_BY_ID, CART_ITEM_BY_PRODUCT, CART_ITEM_WITH_PRODUCT_BY_ID, CART_WITH_ITEMS_BY_USER
+)
+from app.models.models import Cart, CartItem, User
 from app.schemas.schemas import CartItem as CartItemSchema, CartItemCreate, CartItemUpdate, Cart as CartSchema
-from app.utils.auth import get_current_active_user
+from app.utils.auth import get_current_active_user, get_current_active_user_async
+from app.utils.fieldsets import FieldSet, dump_fieldset, fieldset_options, parse_fieldset
+from app.utils.inventory import get_available_stock
 
 router = APIRouter(
     prefix="/cart",
@@ -13,44 +22,58 @@ router = APIRouter(
     responses={404: {"description": "No encontrado"}}
 )
 
+# Carrito con sus productos cargados por adelantado (en modo asíncrono no hay carga perezosa)
+async def _load_cart(db: AsyncSession, user_id: int, fieldset: Optional[FieldSet] = None) -> Optional[Cart]:
+    if fieldset:
+        query = select(Cart).where(Cart.user_id == user_id).options(*fieldset_options(fieldset))
+        return (await db.scalars(query.execution_options(populate_existing=True))).first()
+    return (await db.scalars(CART_WITH_ITEMS_BY_USER, {"user_id": user_id})).first()
+
+async def _load_cart_item(db: AsyncSession, item_id: int) -> CartItem:
+    return (await db.scalars(CART_ITEM_WITH_PRODUCT_BY_ID, {"item_id": item_id})).one()
+
 @router.get("/", response_model=CartSchema)
-def get_user_cart(db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    cart = db.query(Cart).filter(Cart.user_id == current_user.id).first()
+async def get_user_cart(
+    fields: Optional[str] = None,
+    embed: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user_async)
+):
+    # Respuesta parcial (?fields=, ?embed=): solo se consultan las columnas y relaciones pedidas
+    fieldset = parse_fieldset(CartSchema, Cart, fields, embed)
+    cart = await _load_cart(db, current_user.id, fieldset)
     if not cart:
         # Si el usuario no tiene carrito, crear uno nuevo
-        cart = Cart(user_id=current_user.id)
-        db.add(cart)
-        db.commit()
-        db.refresh(cart)
-    return cart
+        db.add(Cart(user_id=current_user.id))
+        await db.commit()
+        cart = await _load_cart(db, current_user.id, fieldset)
+    return ORJSONResponse(dump_fieldset(cart, fieldset)) if fieldset else cart
 
 @router.post("/items", response_model=CartItemSchema, status_code=status.HTTP_201_CREATED)
-def add_item_to_cart(item: CartItemCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+async def add_item_to_cart(item: CartItemCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_active_user_async)):
     # Obtener o crear el carrito del usuario
-    cart = db.query(Cart).filter(Cart.user_id == current_user.id).first()
+    cart = (await db.scalars(CART_BY_USER, {"user_id": current_user.id})).first()
     if not cart:
         cart = Cart(user_id=current_user.id)
         db.add(cart)
-        db.commit()
-        db.refresh(cart)
+        await db.flush()
     
     # Verificar que el producto existe y está activo
-    product = db.query(Product).filter(Product.id == item.product_id, Product.is_active == True).first()
+    product = (await db.scalars(ACTIVE_PRODUCT_BY_ID, {"product_id": item.product_id})).first()
     if not product:
         raise HTTPException(status_code=404, detail="Producto no encontrado o no disponible")
     
     # Verificar stock suficiente
-    if product.stock < item.quantity:
+    if await db.run_sync(get_available_stock, product.id) < item.quantity:
         raise HTTPException(status_code=400, detail="Stock insuficiente")
     
     # Verificar si el producto ya está en el carrito
-    cart_item = db.query(CartItem).filter(CartItem.cart_id == cart.id, CartItem.product_id == item.product_id).first()
+    cart_item = (await db.scalars(CART_ITEM_BY_PRODUCT, {"cart_id": cart.id, "product_id": item.product_id})).first()
     if cart_item:
         # Actualizar cantidad si ya existe
         cart_item.quantity += item.quantity
-        db.commit()
-        db.refresh(cart_item)
-        return cart_item
+        await db.commit()
+        return await _load_cart_item(db, cart_item.id)
     
     # Crear nuevo item en el carrito
     new_item = CartItem(
@@ -59,42 +82,39 @@ def add_item_to_cart(item: CartItemCreate, db: Session = Depends(get_db), curren
         quantity=item.quantity
     )
     db.add(new_item)
-    db.commit()
-    db.refresh(new_item)
-    return new_item
+    await db.commit()
+    return await _load_cart_item(db, new_item.id)
 
 @router.put("/items/{item_id}", response_model=CartItemSchema)
 def update_cart_item(item_id: int, item_update: CartItemUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
     # Obtener el carrito del usuario
-    cart = db.query(Cart).filter(Cart.user_id == current_user.id).first()
+    cart = db.scalars(CART_BY_USER, {"user_id": current_user.id}).first()
     if not cart:
         raise HTTPException(status_code=404, detail="Carrito no encontrado")
     
     # Buscar el item en el carrito
-    cart_item = db.query(CartItem).filter(CartItem.id == item_id, CartItem.cart_id == cart.id).first()
+    cart_item = db.scalars(CART_ITEM_BY_ID, {"item_id": item_id, "cart_id": cart.id}).first()
     if not cart_item:
         raise HTTPException(status_code=404, detail="Item no encontrado en el carrito")
     
     # Verificar stock suficiente si se actualiza la cantidad
     if item_update.quantity:
-        product = db.query(Product).filter(Product.id == cart_item.product_id).first()
-        if product.stock < item_update.quantity:
+        if get_available_stock(db, cart_item.product_id) < item_update.quantity:
             raise HTTPException(status_code=400, detail="Stock insuficiente")
         cart_item.quantity = item_update.quantity
     
     db.commit()
-    db.refresh(cart_item)
     return cart_item
 
 @router.delete("/items/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
 def remove_cart_item(item_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
     # Obtener el carrito del usuario
-    cart = db.query(Cart).filter(Cart.user_id == current_user.id).first()
+    cart = db.scalars(CART_BY_USER, {"user_id": current_user.id}).first()
     if not cart:
         raise HTTPException(status_code=404, detail="Carrito no encontrado")
     
     # Buscar el item en el carrito
-    cart_item = db.query(CartItem).filter(CartItem.id == item_id, CartItem.cart_id == cart.id).first()
+    cart_item = db.scalars(CART_ITEM_BY_ID, {"item_id": item_id, "cart_id": cart.id}).first()
     if not cart_item:
         raise HTTPException(status_code=404, detail="Item no encontrado en el carrito")
     
@@ -106,7 +126,7 @@ def remove_cart_item(item_id: int, db: Session = Depends(get_db), current_user:
 @router.delete("/", status_code=status.HTTP_204_NO_CONTENT)
 def clear_cart(db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
     # Obtener el carrito del usuario
-    cart = db.query(Cart).filter(Cart.user_id == current_user.id).first()
+    cart = db.scalars(CART_BY_USER, {"user_id": current_user.id}).first()
     if not cart:
         raise HTTPException(status_code=404, detail="Carrito no encontrado")
     
@@ -1,11 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+import base64
+import binascii
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import and_, exists, func, or_, select
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional
 
-from app.database.database import get_db
-from app.models.models import Category, User
-from app.schemas.schemas import CategoryCreate, Category as CategorySchema, CategoryUpdate
+from app.database.database import get_db, get_read_db
+from app.models.models import Category, Product, User, product_category
+from app.schemas.schemas import CategoryCreate, Category as CategorySchema, CategoryUpdate, CategoryWithCount, ProductPage, PRODUCT_PAGE
 from app.utils.auth import get_current_active_user, get_current_admin_user
+from app.utils.category_registry import get_cached_categories, get_cached_category, load_categories
+from app.utils.inventory import apply_available_stock
+from app.utils.responses import model_response
 
 router = APIRouter(
     prefix="/categories",
@@ -13,14 +20,109 @@ router = APIRouter(
     responses={404: {"description": "No encontrado"}}
 )
 
-@router.get("/", response_model=List[CategorySchema])
-def get_categories(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    categories = db.query(Category).offset(skip).limit(limit).all()
-    return categories
+# Las lecturas se sirven desde el registro en memoria, con el número de productos activos
+# (sin sesión de base de datos por petición)
+@router.get("/", response_model=List[CategoryWithCount])
+def get_categories(skip: int = 0, limit: int = 100):
+    return get_cached_categories()[skip:skip + limit]
 
-@router.get("/{category_id}", response_model=CategorySchema)
-def get_category(category_id: int, db: Session = Depends(get_db)):
-    db_category = db.query(Category).filter(Category.id == category_id).first()
+# Columnas por las que se puede ordenar el listado de productos; el id desempata
+PRODUCT_SORT_COLUMNS = {
+    "id": Product.id,
+    "price": Product.price,
+    "name": Product.name,
+}
+
+def _encode_cursor(value, product_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([value, product_id]).encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        value, product_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return value, int(product_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+def _list_category_products(
+    db: Session,
+    category_ids: List[int],
+    mode: str,
+    sort: str,
+    order: str,
+    after: Optional[str],
+    limit: int
+) -> dict:
+    if sort not in PRODUCT_SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Orden inválido. Valores permitidos: {', '.join(PRODUCT_SORT_COLUMNS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="Dirección inválida. Valores permitidos: asc, desc")
+    if mode not in ("union", "intersection"):
+        raise HTTPException(status_code=400, detail="Modo inválido. Valores permitidos: union, intersection")
+    limit = max(1, min(limit, 200))
+    
+    # Productos de las categorías, resueltos solo con el índice (category_id, product_id)
+    category_ids = sorted(set(category_ids))
+    product_ids = select(product_category.c.product_id).where(product_category.c.category_id.in_(category_ids))
+    if mode == "intersection" and len(category_ids) > 1:
+        product_ids = product_ids.group_by(product_category.c.product_id).having(
+            func.count(func.distinct(product_category.c.category_id)) == len(category_ids)
+        )
+    
+    query = db.query(Product).filter(Product.id.in_(product_ids), Product.is_active == True)
+    
+    # Paginación por clave sobre (columna de orden, id)
+    column = PRODUCT_SORT_COLUMNS[sort]
+    descending = order == "desc"
+    if after:
+        value, last_id = _decode_cursor(after)
+        if sort == "id":
+            query = query.filter(Product.id < last_id if descending else Product.id > last_id)
+        elif descending:
+            query = query.filter(or_(column < value, and_(column == value, Product.id < last_id)))
+        else:
+            query = query.filter(or_(column > value, and_(column == value, Product.id > last_id)))
+    
+    if sort == "id":
+        ordering = [Product.id.desc() if descending else Product.id]
+    else:
+        ordering = [column.desc(), Product.id.desc()] if descending else [column, Product.id]
+    products = query.options(selectinload(Product.categories)).order_by(*ordering).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(products) > limit:
+        last = products[limit - 1]
+        next_cursor = _encode_cursor(getattr(last, sort), last.id)
+    return {"items": apply_available_stock(db, products[:limit]), "next_cursor": next_cursor}
+
+# Productos de varias categorías a la vez: unión (cualquiera) o intersección (todas)
+@router.get("/products", response_model=ProductPage)
+def get_products_in_categories(
+    ids: List[int] = Query(...),
+    mode: str = "union",
+    sort: str = "id",
+    order: str = "asc",
+    after: Optional[str] = None,
+    limit: int = 50,
+    db: Session = Depends(get_read_db)
+):
+    return model_response(PRODUCT_PAGE, _list_category_products(db, ids, mode, sort, order, after, limit))
+
+@router.get("/{category_id}/products", response_model=ProductPage)
+def get_category_products(
+    category_id: int,
+    sort: str = "id",
+    order: str = "asc",
+    after: Optional[str] = None,
+    limit: int = 50,
+    db: Session = Depends(get_read_db)
+):
+    if get_cached_category(category_id) is None:
+        raise HTTPException(status_code=404, detail="Categoría no encontrada")
+    return model_response(PRODUCT_PAGE, _list_category_products(db, [category_id], "union", sort, order, after, limit))
+
+@router.get("/{category_id}", response_model=CategoryWithCount)
+def get_category(category_id: int):
+    db_category = get_cached_category(category_id)
     if db_category is None:
         raise HTTPException(status_code=404, detail="Categoría no encontrada")
     return db_category
@@ -31,10 +133,10 @@ def create_category(category: CategoryCreate, db: Session = Depends(get_db), cur
     if db_category:
         raise HTTPException(status_code=400, detail="La categoría ya existe")
     
-    db_category = Category(**category.dict())
+    db_category = Category(**category.model_dump())
     db.add(db_category)
     db.commit()
-    db.refresh(db_category)
+    load_categories(db)
     return db_category
 
 @router.put("/{category_id}", response_model=CategorySchema)
@@ -56,7 +158,7 @@ def update_category(category_id: int, category: CategoryUpdate, db: Session = De
         db_category.description = category.description
     
     db.commit()
-    db.refresh(db_category)
+    load_categories(db)
     return db_category
 
 @router.delete("/{category_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -65,10 +167,12 @@ def delete_category(category_id: int, db: Session = Depends(get_db), current_use
     if db_category is None:
         raise HTTPException(status_code=404, detail="Categoría no encontrada")
     
-    # Verificar si hay productos asociados a esta categoría
-    if db_category.products:
+    # Verificar si hay productos asociados a esta categoría (EXISTS, sin cargar la lista)
+    has_products = db.query(exists().where(product_category.c.category_id == category_id)).scalar()
+    if has_products:
         raise HTTPException(status_code=400, detail="No se puede eliminar una categoría que tiene productos asociados")
     
     db.delete(db_category)
     db.commit()
+    load_categories(db)
     return None
\ No newline at end of file
@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List
+
+from app.database.database import get_db
+from app.models.models import InventoryMovement, Product, User
+from app.schemas.schemas import InventoryMovement as InventoryMovementSchema, InventoryStock, InventoryDiscrepancy, InventoryCompaction, HotProductCreate, HotProduct as HotProductSchema
+from app.utils.auth import get_current_admin_user
+from app.utils.inventory import get_available_stock, compact_inventory, check_inventory_consistency, lock_stock
+from app.utils.stock_shards import enable_sharding, merge_shards
+
+router = APIRouter(
+    prefix="/inventory",
+    tags=["inventory"],
+    responses={404: {"description": "No encontrado"}}
+)
+
+@router.get("/consistency", response_model=List[InventoryDiscrepancy])
+def get_inventory_consistency(db: Session = Depends(get_db), current_user: User = Depends(get_current_admin_user)):
+    # Productos cuyo saldo compactado no coincide con Product.stock o con stock negativo
+    return check_inventory_consistency(db)
+
+@router.post("/compact", response_model=InventoryCompaction)
+def compact_inventory_balances(db: Session = Depends(get_db), current_user: User = Depends(get_current_admin_user)):
+    return {"compacted_products": compact_inventory(db)}
+
+@router.get("/{product_id}", response_model=InventoryStock)
+def get_product_inventory(product_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_admin_user)):
+    if db.query(Product.id).filter(Product.id == product_id).first() is None:
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+    return {"product_id": product_id, "available": get_available_stock(db, product_id)}
+
+@router.get("/{product_id}/movements", response_model=List[InventoryMovementSchema])
+def get_product_movements(product_id: int, skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(get_current_admin_user)):
+    # Historial de auditoría del producto, del más reciente al más antiguo
+    movements = db.query(InventoryMovement).filter(
+        InventoryMovement.product_id == product_id
+    ).order_by(InventoryMovement.id.desc()).offset(skip).limit(limit).all()
+    return movements
+
+@router.post("/{product_id}/shards", response_model=HotProductSchema, status_code=status.HTTP_201_CREATED)
+def enable_product_sharding(product_id: int, hot_product: HotProductCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_admin_user)):
+    # Repartir el stock del producto en varios fragmentos durante el periodo caliente
+    if db.query(Product.id).filter(Product.id == product_id).first() is None:
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+    # Los fragmentos se siembran con el saldo del libro leído de la base con el stock bloqueado:
+    # primero se fusionan los fragmentos anteriores (el DELETE espera a las compras que los
+    # estén descontando) y después se bloquea el producto frente a las compras normales
+    merge_shards(db, product_id)
+    lock_stock(db, [product_id])
+    available = get_available_stock(db, product_id, use_cache=False)
+    db_hot_product = enable_sharding(db, product_id, hot_product.shard_count, hot_product.hot_until, available)
+    db.commit()
+    return db_hot_product
+
+@router.delete("/{product_id}/shards", status_code=status.HTTP_204_NO_CONTENT)
+def merge_product_shards(product_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_admin_user)):
+    # Terminar el periodo caliente antes de tiempo
+    merge_shards(db, product_id)
+    db.commit()
+    return None
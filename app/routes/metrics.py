@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.utils.metrics import render_metrics
+
+router = APIRouter(tags=["metrics"])
+
+# Métricas para Prometheus (asíncrona: se lee el estado desde el mismo bucle que lo actualiza)
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
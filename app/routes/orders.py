@@ -1,12 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from sqlalchemy import func
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional
+from sqlalchemy import func, select
 
-from app.database.database import get_db
-from app.models.models import Order, OrderItem, Cart, CartItem, Product, User, OrderStatus
+from app.database.database import get_db, get_read_db
+from app.database.async_database import get_async_db, get_async_read_db
+from app.database.statements import CART_BY_USER
+from app.models.models import Order, OrderItem, Cart, CartItem, Product, User, OrderStatus, MovementType
 from app.schemas.schemas import OrderCreate, Order as OrderSchema, OrderUpdate
-from app.utils.auth import get_current_active_user, get_current_admin_user
+from app.utils.auth import get_current_active_user, get_current_active_user_async, get_current_admin_user
+from app.utils.fieldsets import dump_fieldset, fieldset_options, parse_fieldset
+from app.utils.inventory import OrderStock, record_movement
+from app.utils.pricing import price_cart
+from app.utils.stock_shards import get_hot_products, return_to_shards
 
 router = APIRouter(
     prefix="/orders",
@@ -28,63 +36,77 @@ def create_order(order_data: OrderCreate, db: Session = Depends(get_db), current
                 detail="Solo los administradores pueden crear órdenes para otros usuarios"
             )
     
-    # Crear la orden
-    new_order = Order(
-        user_id=user_id,
-        total_amount=order_data.total_amount,
-        shipping_address=order_data.shipping_address,
-        status=order_data.status
-    )
-    db.add(new_order)
-    db.commit()
-    db.refresh(new_order)
+    # Bloquear el stock de los productos hasta el commit y cargarlos en una sola consulta
+    product_ids = [item_data.product_id for item_data in order_data.items]
+    stock = OrderStock(db, product_ids)
+    products = {
+        product.id: product
+        for product in db.query(Product).filter(Product.id.in_(product_ids), Product.is_active == True).all()
+    }
     
-    # Agregar los items de la orden
+    lines = []
     for item_data in order_data.items:
         # Verificar que el producto existe y está activo
-        product = db.query(Product).filter(Product.id == item_data.product_id, Product.is_active == True).first()
+        product = products.get(item_data.product_id)
         if not product:
-            # Rollback y eliminar la orden
-            db.delete(new_order)
-            db.commit()
             raise HTTPException(status_code=404, detail=f"Producto con ID {item_data.product_id} no encontrado o no disponible")
         
-        # Verificar stock suficiente
-        if product.stock < item_data.quantity:
-            # Rollback y eliminar la orden
-            db.delete(new_order)
-            db.commit()
+        # Verificar stock suficiente (los productos calientes descuentan de sus fragmentos)
+        if not stock.take(product.id, item_data.quantity):
             raise HTTPException(status_code=400, detail=f"Stock insuficiente para el producto con ID {item_data.product_id}")
-        
-        # Crear item de orden
-        order_item = OrderItem(
-            order_id=new_order.id,
-            product_id=item_data.product_id,
-            quantity=item_data.quantity,
-            price=item_data.price
-        )
-        db.add(order_item)
-        
-        # Actualizar stock del producto
-        product.stock -= item_data.quantity
+        lines.append((product, item_data.quantity))
+    
+    # Calcular precios y total en el servidor (se ignoran los enviados por el cliente)
+    priced_cart = price_cart(db, lines)
+    
+    # Crear la orden con sus items (flush para obtener el id; se confirma todo junto al final)
+    new_order = Order(
+        user_id=user_id,
+        total_amount=priced_cart.total,
+        shipping_address=order_data.shipping_address,
+        status=order_data.status,
+        items=[
+            OrderItem(product=products[line.product_id], quantity=line.quantity, price=line.unit_price)
+            for line in priced_cart.lines
+        ]
+    )
+    db.add(new_order)
+    db.flush()
+    
+    # Registrar la salida en el libro de inventario (las órdenes pendientes reservan stock)
+    movement_type = MovementType.RESERVA if new_order.status == OrderStatus.PENDIENTE else MovementType.VENTA
+    for line in priced_cart.lines:
+        record_movement(db, line.product_id, -line.quantity, movement_type, order_id=new_order.id)
     
     db.commit()
-    db.refresh(new_order)
     return new_order
 
+# Órdenes con sus productos cargados por adelantado (en modo asíncrono no hay carga perezosa)
+ORDER_LOAD_OPTIONS = selectinload(Order.items).selectinload(OrderItem.product).selectinload(Product.categories)
+
 @router.post("/checkout", response_model=OrderSchema)
-def checkout(shipping_address: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+async def checkout(shipping_address: str, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_active_user_async)):
+    # La lógica de reserva y precios es síncrona y se ejecuta sobre la misma conexión asíncrona
+    order_id = await db.run_sync(_checkout_cart, current_user, shipping_address)
+    return (await db.execute(
+        select(Order).options(ORDER_LOAD_OPTIONS).where(Order.id == order_id).execution_options(populate_existing=True)
+    )).scalars().one()
+
+def _checkout_cart(db: Session, current_user: User, shipping_address: str) -> int:
     # Obtener el carrito del usuario
-    cart = db.query(Cart).filter(Cart.user_id == current_user.id).first()
+    cart = db.scalars(CART_BY_USER, {"user_id": current_user.id}).first()
     if not cart or not cart.items:
         raise HTTPException(status_code=400, detail="El carrito está vacío")
     
-    # Verificar stock y calcular total
-    total_amount = 0
-    order_items = []
+    # Verificar stock cargando todos los productos del carrito en una sola consulta, con su
+    # stock bloqueado hasta el commit
+    lines = []
+    product_ids = [cart_item.product_id for cart_item in cart.items]
+    stock = OrderStock(db, product_ids)
+    products = {product.id: product for product in db.query(Product).filter(Product.id.in_(product_ids)).all()}
     
     for cart_item in cart.items:
-        product = db.query(Product).filter(Product.id == cart_item.product_id).first()
+        product = products.get(cart_item.product_id)
         
         # Verificar que el producto existe y está activo
         if not product or not product.is_active:
@@ -93,71 +115,75 @@ def checkout(shipping_address: str, db: Session = Depends(get_db), current_user:
                 detail=f"El producto con ID {cart_item.product_id} ya no está disponible"
             )
         
-        # Verificar stock suficiente
-        if product.stock < cart_item.quantity:
+        # Verificar stock suficiente (los productos calientes descuentan de sus fragmentos)
+        if not stock.take(product.id, cart_item.quantity):
             raise HTTPException(
                 status_code=400,
-                detail=f"Stock insuficiente para {product.name}. Disponible: {product.stock}, Solicitado: {cart_item.quantity}"
+                detail=f"Stock insuficiente para {product.name}. Disponible: {stock.available.get(product.id, 0)}, Solicitado: {cart_item.quantity}"
             )
         
-        # Calcular subtotal y agregar al total
-        item_price = product.price
-        item_total = item_price * cart_item.quantity
-        total_amount += item_total
-        
-        # Crear item de orden para agregar más tarde
-        order_items.append({
-            "product_id": product.id,
-            "quantity": cart_item.quantity,
-            "price": item_price
-        })
-    
-    # Crear la orden
+        lines.append((product, cart_item.quantity))
+    
+    # Calcular precios, promociones y total del carrito en una pasada
+    priced_cart = price_cart(db, lines)
+    
+    # Crear la orden con sus items (flush para obtener el id; se confirma todo junto al final)
     new_order = Order(
         user_id=current_user.id,
-        total_amount=total_amount,
+        total_amount=priced_cart.total,
         shipping_address=shipping_address,
-        status=OrderStatus.PENDIENTE
+        status=OrderStatus.PENDIENTE,
+        items=[
+            OrderItem(product=products[line.product_id], quantity=line.quantity, price=line.unit_price)
+            for line in priced_cart.lines
+        ]
     )
     db.add(new_order)
-    db.commit()
-    db.refresh(new_order)
-    
-    # Agregar los items de la orden y actualizar stock
-    for item_data in order_items:
-        order_item = OrderItem(
-            order_id=new_order.id,
-            product_id=item_data["product_id"],
-            quantity=item_data["quantity"],
-            price=item_data["price"]
-        )
-        db.add(order_item)
-        
-        # Actualizar stock del producto
-        product = db.query(Product).filter(Product.id == item_data["product_id"]).first()
-        product.stock -= item_data["quantity"]
+    db.flush()
+    
+    # Reservar el stock en el libro de inventario
+    for line in priced_cart.lines:
+        record_movement(db, line.product_id, -line.quantity, MovementType.RESERVA, order_id=new_order.id)
     
     # Vaciar el carrito
     db.query(CartItem).filter(CartItem.cart_id == cart.id).delete()
     
     db.commit()
-    db.refresh(new_order)
-    return new_order
+    return new_order.id
 
 @router.get("/", response_model=List[OrderSchema])
-def get_user_orders(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    # Si es administrador, mostrar todas las órdenes con paginación
-    if current_user.is_admin:
-        orders = db.query(Order).offset(skip).limit(limit).all()
-    else:
-        # Si es un usuario regular, mostrar solo sus órdenes
-        orders = db.query(Order).filter(Order.user_id == current_user.id).offset(skip).limit(limit).all()
-    return orders
+async def get_user_orders(
+    skip: int = 0,
+    limit: int = 100,
+    fields: Optional[str] = None,
+    embed: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_active_user_async)
+):
+    # Respuesta parcial (?fields=, ?embed=): p. ej. un listado sin ítems con fields=id,status,total_amount&embed=
+    fieldset = parse_fieldset(OrderSchema, Order, fields, embed)
+    query = select(Order).options(*fieldset_options(fieldset)) if fieldset else select(Order).options(ORDER_LOAD_OPTIONS)
+    # Si es un usuario regular, mostrar solo sus órdenes; los administradores ven todas
+    if not current_user.is_admin:
+        query = query.where(Order.user_id == current_user.id)
+    orders = (await db.execute(query.offset(skip).limit(limit))).scalars().all()
+    return ORJSONResponse([dump_fieldset(order, fieldset) for order in orders]) if fieldset else orders
 
 @router.get("/{order_id}", response_model=OrderSchema)
-def get_order(order_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    # Buscar la orden
-    order = db.query(Order).filter(Order.id == order_id).first()
+def get_order(
+    order_id: int,
+    fields: Optional[str] = None,
+    embed: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    fieldset = parse_fieldset(OrderSchema, Order, fields, embed)
+    
+    # Buscar la orden (user_id se carga siempre para comprobar el permiso)
+    query = db.query(Order).filter(Order.id == order_id)
+    if fieldset:
+        query = query.options(*fieldset_options(fieldset, required=["user_id"]))
+    order = query.first()
     if not order:
         raise HTTPException(status_code=404, detail="Orden no encontrada")
     
@@ -168,7 +194,7 @@ def get_order(order_id: int, db: Session = Depends(get_db), current_user: User =
             detail="No tienes permiso para ver esta orden"
         )
     
-    return order
+    return ORJSONResponse(dump_fieldset(order, fieldset)) if fieldset else order
 
 @router.put("/{order_id}", response_model=OrderSchema)
 def update_order(order_id: int, order_update: OrderUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_admin_user)):
@@ -185,7 +211,6 @@ def update_order(order_id: int, order_update: OrderUpdate, db: Session = Depends
         order.shipping_address = order_update.shipping_address
     
     db.commit()
-    db.refresh(order)
     return order
 
 @router.delete("/{order_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -212,11 +237,12 @@ def cancel_order(order_id: int, db: Session = Depends(get_db), current_user: Use
     # Actualizar estado a CANCELADO
     order.status = OrderStatus.CANCELADO
     
-    # Restaurar el stock de los productos
+    # Liberar el stock reservado en el libro de inventario
+    hot_products = get_hot_products(db, [item.product_id for item in order.items])
     for item in order.items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if product:
-            product.stock += item.quantity
+        if item.product_id in hot_products:
+            return_to_shards(db, hot_products[item.product_id], item.quantity)
+        record_movement(db, item.product_id, item.quantity, MovementType.CANCELACION, order_id=order.id)
     
     db.commit()
     return None
\ No newline at end of file
@@ -1,11 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional
 
-from app.database.database import get_db
-from app.models.models import Product, Category, User, GenderType
-from app.schemas.schemas import ProductCreate, Product as ProductSchema, ProductUpdate
+from app.database.database import get_db, get_read_db
+from app.database.async_database import get_async_read_db
+from app.database.statements import PRODUCT_BY_ID, PRODUCT_WITH_CATEGORIES_BY_ID
+from app.models.models import Product, Category, User, GenderType, MovementType
+from app.schemas.schemas import PRODUCT_LIST, ProductCreate, Product as ProductSchema, ProductUpdate
 from app.utils.auth import get_current_active_user, get_current_admin_user
+from app.utils.inventory import apply_available_stock, get_available_stock, initialize_product_stock, lock_stock, record_movement
+from app.utils.stock_shards import get_hot_products, take_from_shards, return_to_shards
+from app.utils.recommendations import get_related_products
+from app.utils.rankings import RANKING_TYPES, RANKINGS_TOP_K, get_top_product_ids
+from app.utils.category_registry import update_product_counts
+from app.utils.responses import model_response
+from app.utils.fieldsets import dump_fieldset, fieldset_options, parse_fieldset
 
 router = APIRouter(
     prefix="/products",
@@ -14,7 +26,7 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[ProductSchema])
-def get_products(
+async def get_products(
     skip: int = 0, 
     limit: int = 100, 
     category_id: Optional[int] = None,
@@ -22,47 +34,96 @@ def get_products(
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
     search: Optional[str] = None,
-    db: Session = Depends(get_db)
+    fields: Optional[str] = None,
+    embed: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    # Consulta base
-    query = db.query(Product).filter(Product.is_active == True)
+    # Respuesta parcial (?fields=, ?embed=): solo se consultan las columnas y relaciones pedidas
+    fieldset = parse_fieldset(ProductSchema, Product, fields, embed)
+    
+    # Consulta base (las categorías se cargan por adelantado: en modo asíncrono no hay carga perezosa)
+    options = fieldset_options(fieldset) if fieldset else [selectinload(Product.categories)]
+    query = select(Product).options(*options).where(Product.is_active == True)
     
     # Aplicar filtros si se proporcionan
     if category_id:
-        query = query.join(Product.categories).filter(Category.id == category_id)
+        query = query.join(Product.categories).where(Category.id == category_id)
     
     if gender:
         try:
             gender_enum = GenderType(gender)
-            query = query.filter(Product.gender == gender_enum)
+            query = query.where(Product.gender == gender_enum)
         except ValueError:
             pass  # Ignorar valores de género inválidos
     
     if min_price is not None:
-        query = query.filter(Product.price >= min_price)
+        query = query.where(Product.price >= min_price)
     
     if max_price is not None:
-        query = query.filter(Product.price <= max_price)
+        query = query.where(Product.price <= max_price)
     
     if search:
-        query = query.filter(Product.name.ilike(f"%{search}%"))
+        query = query.where(Product.name.ilike(f"%{search}%"))
     
     # Aplicar paginación
-    products = query.offset(skip).limit(limit).all()
-    return products
+    products = (await db.execute(query.offset(skip).limit(limit))).scalars().all()
+    if fieldset:
+        if fieldset.includes("stock"):
+            await db.run_sync(apply_available_stock, products)
+        return ORJSONResponse([dump_fieldset(product, fieldset) for product in products])
+    return model_response(PRODUCT_LIST, await db.run_sync(apply_available_stock, products))
+
+@router.get("/top", response_model=List[ProductSchema])
+def get_top_products(
+    ranking: str = "7d",
+    category_id: Optional[int] = None,
+    gender: Optional[str] = None,
+    limit: int = 20,
+    db: Session = Depends(get_read_db)
+):
+    # Más vendidos (24h, 7d, 30d) o en tendencia, servidos desde los rankings en memoria
+    if ranking not in RANKING_TYPES:
+        raise HTTPException(status_code=400, detail=f"Ranking inválido. Valores permitidos: {', '.join(RANKING_TYPES)}")
+    
+    gender_enum = None
+    if gender:
+        try:
+            gender_enum = GenderType(gender)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Género inválido")
+    
+    product_ids = get_top_product_ids(db, ranking, category_id, gender_enum, min(limit, RANKINGS_TOP_K))
+    if not product_ids:
+        return []
+    products = {product.id: product for product in db.query(Product).filter(Product.id.in_(product_ids), Product.is_active == True).all()}
+    top_products = [products[product_id] for product_id in product_ids if product_id in products]
+    return model_response(PRODUCT_LIST, apply_available_stock(db, top_products))
 
 @router.get("/{product_id}", response_model=ProductSchema)
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    db_product = db.query(Product).filter(Product.id == product_id).first()
+async def get_product(product_id: int, fields: Optional[str] = None, embed: Optional[str] = None, db: AsyncSession = Depends(get_async_read_db)):
+    fieldset = parse_fieldset(ProductSchema, Product, fields, embed)
+    if fieldset:
+        query = select(Product).where(Product.id == product_id).options(*fieldset_options(fieldset, required=["is_active"]))
+        db_product = (await db.scalars(query)).first()
+    else:
+        db_product = (await db.scalars(PRODUCT_WITH_CATEGORIES_BY_ID, {"product_id": product_id})).first()
     if db_product is None or not db_product.is_active:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
-    return db_product
+    if fieldset is None or fieldset.includes("stock"):
+        await db.run_sync(apply_available_stock, [db_product])
+    return ORJSONResponse(dump_fieldset(db_product, fieldset)) if fieldset else db_product
+
+@router.get("/{product_id}/related", response_model=List[ProductSchema])
+def get_product_related(product_id: int, limit: int = 10, db: Session = Depends(get_read_db)):
+    # "Comprados juntos habitualmente", precalculado por build_recommendations.py
+    related = get_related_products(db, product_id, limit)
+    return model_response(PRODUCT_LIST, apply_available_stock(db, related))
 
 @router.post("/", response_model=ProductSchema, status_code=status.HTTP_201_CREATED)
 def create_product(product: ProductCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_admin_user)):
-    # Verificar que las categorías existan
+    # Verificar que las categorías existan (sin repetir: product_category tiene clave primaria)
     categories = []
-    for category_id in product.category_ids:
+    for category_id in dict.fromkeys(product.category_ids):
         category = db.query(Category).filter(Category.id == category_id).first()
         if not category:
             raise HTTPException(status_code=404, detail=f"Categoría con ID {category_id} no encontrada")
@@ -75,22 +136,30 @@ def create_product(product: ProductCreate, db: Session = Depends(get_db), curren
             raise HTTPException(status_code=400, detail="Ya existe un producto con ese SKU")
     
     # Crear producto (excluyendo category_ids)
-    product_data = product.dict(exclude={"category_ids"})
+    product_data = product.model_dump(exclude={"category_ids"})
     db_product = Product(**product_data)
     
     # Asignar categorías
     db_product.categories = categories
     
     db.add(db_product)
+    db.flush()
+    
+    # Registrar el stock inicial en el libro de inventario
+    initialize_product_stock(db, db_product)
     db.commit()
-    db.refresh(db_product)
+    
+    # Mantener al día los conteos del registro de categorías
+    if db_product.is_active:
+        update_product_counts(added=[category.id for category in categories])
     return db_product
 
 @router.put("/{product_id}", response_model=ProductSchema)
 def update_product(product_id: int, product: ProductUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_admin_user)):
-    db_product = db.query(Product).filter(Product.id == product_id).first()
+    db_product = db.scalars(PRODUCT_BY_ID, {"product_id": product_id}).first()
     if db_product is None:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
+    previous_category_ids = [category.id for category in db_product.categories] if db_product.is_active else []
     
     # Verificar si el SKU es único en caso de cambio
     if product.sku and product.sku != db_product.sku:
@@ -101,7 +170,7 @@ def update_product(product_id: int, product: ProductUpdate, db: Session = Depend
     # Actualizar categorías si se proporcionan
     if product.category_ids:
         categories = []
-        for category_id in product.category_ids:
+        for category_id in dict.fromkeys(product.category_ids):
             category = db.query(Category).filter(Category.id == category_id).first()
             if not category:
                 raise HTTPException(status_code=404, detail=f"Categoría con ID {category_id} no encontrada")
@@ -109,21 +178,45 @@ def update_product(product_id: int, product: ProductUpdate, db: Session = Depend
         db_product.categories = categories
     
     # Actualizar resto de campos si están presentes
-    update_data = product.dict(exclude={"category_ids"}, exclude_unset=True)
+    update_data = product.model_dump(exclude={"category_ids"}, exclude_unset=True)
+    
+    # El stock no se sobrescribe: se registra la diferencia como reposición en el libro
+    new_stock = update_data.pop("stock", None)
+    if new_stock is not None:
+        # Como en OrderStock: se bloquea el producto (salvo si es caliente, que va por fragmentos)
+        # y se lee sin caché, para que una venta simultánea no descuadre la diferencia
+        hot_product = get_hot_products(db, [product_id]).get(product_id)
+        if not hot_product:
+            lock_stock(db, [product_id])
+        delta = new_stock - get_available_stock(db, product_id, use_cache=False)
+        if hot_product and delta > 0:
+            return_to_shards(db, hot_product, delta)
+        elif hot_product and delta < 0 and not take_from_shards(db, hot_product, -delta):
+            raise HTTPException(status_code=400, detail="Stock insuficiente")
+        if delta:
+            record_movement(db, product_id, delta, MovementType.REPOSICION)
+    
     for key, value in update_data.items():
         setattr(db_product, key, value)
     
     db.commit()
-    db.refresh(db_product)
+    
+    # Mantener al día los conteos del registro de categorías
+    current_category_ids = [category.id for category in db_product.categories] if db_product.is_active else []
+    update_product_counts(removed=previous_category_ids, added=current_category_ids)
+    apply_available_stock(db, [db_product])
     return db_product
 
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_product(product_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_admin_user)):
-    db_product = db.query(Product).filter(Product.id == product_id).first()
+    db_product = db.scalars(PRODUCT_BY_ID, {"product_id": product_id}).first()
     if db_product is None:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
     
     # Enfoque de eliminación lógica (soft delete)
+    was_active = db_product.is_active
     db_product.is_active = False
     db.commit()
+    if was_active:
+        update_product_counts(removed=[category.id for category in db_product.categories])
     return None
\ No newline at end of file
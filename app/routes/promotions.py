@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List
+
+from app.database.database import get_db
+from app.models.models import Promotion, Category, User
+from app.schemas.schemas import PromotionCreate, Promotion as PromotionSchema, PromotionUpdate, CatalogPrice
+from app.utils.auth import get_current_admin_user
+from app.utils.pricing import invalidate_pricing_rules, price_catalog
+
+router = APIRouter(
+    prefix="/promotions",
+    tags=["promotions"],
+    responses={404: {"description": "No encontrado"}}
+)
+
+@router.get("/", response_model=List[PromotionSchema])
+def get_promotions(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(get_current_admin_user)):
+    promotions = db.query(Promotion).offset(skip).limit(limit).all()
+    return promotions
+
+@router.get("/catalog-prices", response_model=List[CatalogPrice])
+def get_catalog_prices(db: Session = Depends(get_db), current_user: User = Depends(get_current_admin_user)):
+    # Vista previa del catálogo completo con las promociones vigentes aplicadas
+    return [
+        {"product_id": product_id, "price": price, "final_price": final_price, "promotion_id": promotion_id}
+        for product_id, (price, final_price, promotion_id) in price_catalog(db).items()
+    ]
+
+@router.get("/{promotion_id}", response_model=PromotionSchema)
+def get_promotion(promotion_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_admin_user)):
+    db_promotion = db.query(Promotion).filter(Promotion.id == promotion_id).first()
+    if db_promotion is None:
+        raise HTTPException(status_code=404, detail="Promoción no encontrada")
+    return db_promotion
+
+@router.post("/", response_model=PromotionSchema, status_code=status.HTTP_201_CREATED)
+def create_promotion(promotion: PromotionCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_admin_user)):
+    # Verificar que la categoría exista
+    if promotion.category_id and db.query(Category.id).filter(Category.id == promotion.category_id).first() is None:
+        raise HTTPException(status_code=404, detail=f"Categoría con ID {promotion.category_id} no encontrada")
+
+    db_promotion = Promotion(**promotion.model_dump())
+    db.add(db_promotion)
+    db.commit()
+    invalidate_pricing_rules()
+    return db_promotion
+
+@router.put("/{promotion_id}", response_model=PromotionSchema)
+def update_promotion(promotion_id: int, promotion: PromotionUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_admin_user)):
+    db_promotion = db.query(Promotion).filter(Promotion.id == promotion_id).first()
+    if db_promotion is None:
+        raise HTTPException(status_code=404, detail="Promoción no encontrada")
+
+    if promotion.category_id and db.query(Category.id).filter(Category.id == promotion.category_id).first() is None:
+        raise HTTPException(status_code=404, detail=f"Categoría con ID {promotion.category_id} no encontrada")
+
+    # Actualizar campos si están presentes
+    for key, value in promotion.model_dump(exclude_unset=True).items():
+        setattr(db_promotion, key, value)
+
+    db.commit()
+    invalidate_pricing_rules()
+    return db_promotion
+
+@router.delete("/{promotion_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_promotion(promotion_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_admin_user)):
+    db_promotion = db.query(Promotion).filter(Promotion.id == promotion_id).first()
+    if db_promotion is None:
+        raise HTTPException(status_code=404, detail="Promoción no encontrada")
+
+    db.delete(db_promotion)
+    db.commit()
+    invalidate_pricing_rules()
+    return None
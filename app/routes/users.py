@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status, UploadFile, File
+from sqlalchemy import func, or_, select, text
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+import os
 
 from app.database.database import get_db
 from app.models.models import User, Cart
-from app.schemas.schemas import UserCreate, User as UserSchema, UserUpdate
-from app.utils.auth import get_password_hash, get_current_active_user, get_current_admin_user
+from app.schemas.schemas import UserCreate, User as UserSchema, UserUpdate, UserPage, UserImportResult
+from app.utils.auth import get_password_hash, get_current_active_user, get_current_admin_user, get_user_by_email
+from app.utils.user_import import import_users, iter_user_records, open_text_stream
 
 router = APIRouter(
     prefix="/users",
@@ -15,14 +18,15 @@ router = APIRouter(
 
 @router.post("/", response_model=UserSchema, status_code=status.HTTP_201_CREATED)
 def create_user(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = get_user_by_email(db, user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="El email ya está registrado")
     
     # Crear el usuario con contraseña hasheada
     hashed_password = get_password_hash(user.password)
+    # El email se guarda en minúsculas para que las búsquedas sin distinguir mayúsculas sean únicas
     db_user = User(
-        email=user.email,
+        email=user.email.lower(),
         password=hashed_password,
         first_name=user.first_name,
         last_name=user.last_name,
@@ -30,31 +34,48 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
         is_admin=user.is_admin
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    db.flush()
     
-    # Crear un carrito vacío para el usuario
+    # Crear un carrito vacío para el usuario (se confirma junto con el usuario)
     cart = Cart(user_id=db_user.id)
     db.add(cart)
     db.commit()
     
     return db_user
 
+# Procesos de hash que puede pedir una importación por HTTP: como mucho uno por núcleo
+MAX_IMPORT_WORKERS = os.cpu_count() or 1
+
+@router.post("/import", response_model=UserImportResult)
+def import_users_file(
+    file: UploadFile = File(...),
+    format: str = "csv",
+    workers: int = Query(1, ge=1, le=MAX_IMPORT_WORKERS),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    # Importación masiva desde CSV (email,password|password_hash,first_name,last_name,is_active) o JSON por líneas.
+    # Para millones de usuarios es preferible el script import_users.py.
+    if format not in ("csv", "jsonl"):
+        raise HTTPException(status_code=400, detail="Formato no soportado. Valores permitidos: csv, jsonl")
+    result = import_users(db, iter_user_records(open_text_stream(file.file), format), workers=workers)
+    return result.__dict__
+
 @router.get("/me", response_model=UserSchema)
 def read_users_me(current_user: User = Depends(get_current_active_user)):
     return current_user
 
 @router.put("/me", response_model=UserSchema)
 def update_user_me(user: UserUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    if user.email and user.email != current_user.email:
+    if user.email and user.email.lower() != current_user.email.lower():
         # Verificar que el nuevo email no esté en uso
-        db_user = db.query(User).filter(User.email == user.email).first()
+        db_user = get_user_by_email(db, user.email)
         if db_user:
             raise HTTPException(status_code=400, detail="El email ya está registrado")
     
     # Actualizar campos si están presentes
     if user.email:
-        current_user.email = user.email
+        current_user.email = user.email.lower()
     if user.first_name:
         current_user.first_name = user.first_name
     if user.last_name:
@@ -68,7 +89,6 @@ def update_user_me(user: UserUpdate, db: Session = Depends(get_db), current_user
             current_user.is_active = user.is_active
     
     db.commit()
-    db.refresh(current_user)
     return current_user
 
 # Rutas administrativas
@@ -77,6 +97,74 @@ def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), c
     users = db.query(User).offset(skip).limit(limit).all()
     return users
 
+# Límite del conteo exacto en las búsquedas; por encima se devuelve una estimación
+USER_COUNT_LIMIT = 10000
+
+# Estimación barata del total de usuarios sin filtros
+def estimate_user_count(db: Session) -> int:
+    if db.get_bind().dialect.name == "postgresql":
+        estimate = db.execute(text("SELECT reltuples::bigint FROM pg_class WHERE relname = 'users'")).scalar()
+        if estimate and estimate > 0:
+            return int(estimate)
+    # En SQLite el mayor id es una buena aproximación (los usuarios rara vez se eliminan)
+    return db.query(func.max(User.id)).scalar() or 0
+
+@router.get("/search", response_model=UserPage)
+def search_users(
+    q: Optional[str] = None,
+    mode: str = "prefix",
+    is_active: Optional[bool] = None,
+    is_admin: Optional[bool] = None,
+    after_id: Optional[int] = None,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    if mode not in ("prefix", "substring"):
+        raise HTTPException(status_code=400, detail="Modo de búsqueda inválido. Valores permitidos: prefix, substring")
+    limit = max(1, min(limit, 200))
+    
+    # Consulta base con los filtros de estado
+    query = db.query(User)
+    if is_active is not None:
+        query = query.filter(User.is_active == is_active)
+    if is_admin is not None:
+        query = query.filter(User.is_admin == is_admin)
+    
+    if q:
+        term = q.strip().lower()
+        columns = [func.lower(User.email), func.lower(User.first_name), func.lower(User.last_name)]
+        if mode == "prefix":
+            # Rango [term, term + U+FFFF) para que se usen los índices sobre lower(...)
+            query = query.filter(or_(*[column.between(term, term + "\uffff") for column in columns]))
+        else:
+            # La búsqueda por subcadena no puede usar índices B-tree: recorre la tabla
+            query = query.filter(or_(*[column.contains(term, autoescape=True) for column in columns]))
+    
+    # Total: estimación barata sin filtros; con filtros, conteo exacto acotado
+    filtered = q or is_active is not None or is_admin is not None
+    if filtered:
+        capped = query.with_entities(User.id).limit(USER_COUNT_LIMIT + 1).subquery()
+        approximate_total = db.execute(select(func.count()).select_from(capped)).scalar()
+        total_is_exact = approximate_total <= USER_COUNT_LIMIT
+        approximate_total = min(approximate_total, USER_COUNT_LIMIT)
+    else:
+        approximate_total = estimate_user_count(db)
+        total_is_exact = False
+    
+    # Paginación por clave: siempre ordenado por id, continuando desde after_id
+    if after_id is not None:
+        query = query.filter(User.id > after_id)
+    users = query.order_by(User.id).limit(limit + 1).all()
+    
+    next_cursor = users[limit - 1].id if len(users) > limit else None
+    return {
+        "items": users[:limit],
+        "next_cursor": next_cursor,
+        "approximate_total": approximate_total,
+        "total_is_exact": total_is_exact
+    }
+
 @router.get("/{user_id}", response_model=UserSchema)
 def read_user(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_admin_user)):
     db_user = db.query(User).filter(User.id == user_id).first()
@@ -91,14 +179,14 @@ def update_user(user_id: int, user: UserUpdate, db: Session = Depends(get_db), c
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
     # Verificar que el nuevo email no esté en uso
-    if user.email and user.email != db_user.email:
-        existing_user = db.query(User).filter(User.email == user.email).first()
+    if user.email and user.email.lower() != db_user.email.lower():
+        existing_user = get_user_by_email(db, user.email)
         if existing_user:
             raise HTTPException(status_code=400, detail="El email ya está registrado")
     
     # Actualizar campos si están presentes
     if user.email:
-        db_user.email = user.email
+        db_user.email = user.email.lower()
     if user.first_name:
         db_user.first_name = user.first_name
     if user.last_name:
@@ -111,7 +199,6 @@ def update_user(user_id: int, user: UserUpdate, db: Session = Depends(get_db), c
         db_user.password = get_password_hash(user.password)
     
     db.commit()
-    db.refresh(db_user)
     return db_user
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -1,13 +1,14 @@
-from pydantic import BaseModel, Field, validator
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, field_validator
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 from enum import Enum
 import re
 
-# Función para validar formato de email
+# Función para validar formato de email (expresión compilada una sola vez)
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$')
+
 def validate_email(email: str) -> str:
-    pattern = r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$'
-    if not re.match(pattern, email):
+    if not EMAIL_PATTERN.match(email):
         raise ValueError('Email inválido')
     return email
 
@@ -41,8 +42,10 @@ class Category(CategoryBase):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+class CategoryWithCount(Category):
+    product_count: int
 
 # Esquemas para Producto
 class ProductBase(BaseModel):
@@ -75,8 +78,16 @@ class Product(ProductBase):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+# Página de productos con paginación por clave
+class ProductPage(BaseModel):
+    items: List[Product]
+    next_cursor: Optional[str] = None
+
+# Validadores de las respuestas grandes del catálogo, construidos una sola vez (ver app/utils/responses.py)
+PRODUCT_LIST = TypeAdapter(List[Product])
+PRODUCT_PAGE = TypeAdapter(ProductPage)
 
 # Esquemas para Usuario
 class UserBase(BaseModel):
@@ -87,7 +98,8 @@ class UserBase(BaseModel):
     is_admin: bool = False
     
     # Validador de email
-    @validator('email')
+    @field_validator('email')
+    @classmethod
     def email_must_be_valid(cls, v):
         return validate_email(v)
 
@@ -102,7 +114,8 @@ class UserUpdate(BaseModel):
     password: Optional[str] = None
     
     # Validador de email
-    @validator('email')
+    @field_validator('email')
+    @classmethod
     def email_must_be_valid(cls, v):
         if v is None:
             return v
@@ -113,8 +126,21 @@ class User(UserBase):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+# Página del directorio de usuarios (paginación por clave)
+class UserPage(BaseModel):
+    items: List[User]
+    next_cursor: Optional[int] = None
+    approximate_total: int
+    total_is_exact: bool
+
+# Resultado de la importación masiva de usuarios
+class UserImportResult(BaseModel):
+    created: int
+    duplicates: int
+    invalid: int
+    errors: List[str] = []
 
 # Esquemas para Dirección
 class AddressBase(BaseModel):
@@ -142,8 +168,7 @@ class Address(AddressBase):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Esquemas para Ítem de Carrito
 class CartItemBase(BaseModel):
@@ -163,8 +188,7 @@ class CartItem(CartItemBase):
     updated_at: datetime
     product: Product
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Esquemas para Carrito
 class CartBase(BaseModel):
@@ -180,8 +204,7 @@ class Cart(CartBase):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Esquemas para Ítem de Orden
 class OrderItemBase(BaseModel):
@@ -189,8 +212,10 @@ class OrderItemBase(BaseModel):
     quantity: int = Field(ge=1)
     price: float = Field(gt=0)
 
-class OrderItemCreate(OrderItemBase):
-    pass
+class OrderItemCreate(BaseModel):
+    product_id: int
+    quantity: int = Field(ge=1)
+    price: Optional[float] = None  # Ignorado: el precio se calcula en el servidor
 
 class OrderItem(OrderItemBase):
     id: int
@@ -199,8 +224,7 @@ class OrderItem(OrderItemBase):
     updated_at: datetime
     product: Product
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Esquemas para Orden
 class OrderBase(BaseModel):
@@ -210,7 +234,7 @@ class OrderBase(BaseModel):
 class OrderCreate(OrderBase):
     user_id: int
     items: List[OrderItemCreate]
-    total_amount: float = Field(gt=0)
+    total_amount: Optional[float] = None  # Ignorado: el total se calcula en el servidor
 
 class OrderUpdate(BaseModel):
     status: Optional[OrderStatus] = None
@@ -224,8 +248,7 @@ class Order(OrderBase):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Esquemas para autenticación
 class Token(BaseModel):
@@ -240,6 +263,155 @@ class Login(BaseModel):
     password: str
     
     # Validador de email
-    @validator('email')
+    @field_validator('email')
+    @classmethod
     def email_must_be_valid(cls, v):
-        return validate_email(v)
\ No newline at end of file
+        return validate_email(v)
+
+# Enum para los movimientos de inventario
+class MovementType(str, Enum):
+    RESERVA = "reserva"
+    VENTA = "venta"
+    CANCELACION = "cancelacion"
+    REPOSICION = "reposicion"
+
+# Esquemas para inventario
+class InventoryMovement(BaseModel):
+    id: int
+    product_id: int
+    order_id: Optional[int] = None
+    quantity: int
+    movement_type: MovementType
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class InventoryStock(BaseModel):
+    product_id: int
+    available: int
+
+class InventoryDiscrepancy(BaseModel):
+    product_id: int
+    stock: int
+    balance: int
+    available: int
+
+class InventoryCompaction(BaseModel):
+    compacted_products: int
+
+class HotProductCreate(BaseModel):
+    shard_count: int = Field(ge=2, le=64)
+    hot_until: datetime
+
+class HotProduct(BaseModel):
+    product_id: int
+    shard_count: int
+    hot_until: datetime
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+# Enum para el tipo de descuento
+class DiscountType(str, Enum):
+    PORCENTAJE = "porcentaje"
+    FIJO = "fijo"
+
+# Esquemas para Promoción
+class PromotionBase(BaseModel):
+    name: str
+    discount_type: DiscountType
+    value: float = Field(gt=0)
+    min_quantity: int = Field(1, ge=1)
+    is_active: bool = True
+    starts_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
+    category_id: Optional[int] = None
+    gender: Optional[GenderType] = None
+
+class PromotionCreate(PromotionBase):
+    pass
+
+class PromotionUpdate(BaseModel):
+    name: Optional[str] = None
+    discount_type: Optional[DiscountType] = None
+    value: Optional[float] = Field(None, gt=0)
+    min_quantity: Optional[int] = Field(None, ge=1)
+    is_active: Optional[bool] = None
+    starts_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
+    category_id: Optional[int] = None
+    gender: Optional[GenderType] = None
+
+class Promotion(PromotionBase):
+    id: int
+    created_at: datetime
+    updated_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class CatalogPrice(BaseModel):
+    product_id: int
+    price: float
+    final_price: float
+    promotion_id: Optional[int] = None
+
+# Esquemas para las estadísticas del pool de conexiones
+class ReplicaStatus(BaseModel):
+    url: str
+    healthy: bool
+
+class PoolStatus(BaseModel):
+    pool_class: str
+    size: Optional[int] = None
+    checked_in: Optional[int] = None
+    checked_out: Optional[int] = None
+    overflow: Optional[int] = None
+    max_overflow: Optional[int] = None
+    timeout: Optional[float] = None
+    checkouts: Optional[int] = None
+    timeouts: Optional[int] = None
+    wait_total_seconds: Optional[float] = None
+    wait_avg_seconds: Optional[float] = None
+    wait_max_seconds: Optional[float] = None
+    replicas: Optional[List[ReplicaStatus]] = None
+
+# Esquema del registro de consultas lentas
+class SlowQuery(BaseModel):
+    id: str
+    fingerprint: str
+    statement: str
+    parameters: Any = None
+    count: int
+    total_ms: float
+    avg_ms: float
+    max_ms: float
+    routes: Dict[str, int]
+    last_seen: datetime
+    plan: Optional[List[str]] = None
+    plan_error: Optional[str] = None
+
+# Esquemas de los perfiles de peticiones
+class ProfileSummary(BaseModel):
+    id: str
+    method: str
+    path: str
+    status: Optional[int] = None
+    trigger: str
+    created_at: datetime
+    duration_ms: float
+    samples: int
+    queries: int
+
+class ProfileFrame(BaseModel):
+    frame: str
+    samples: int
+
+class ProfileQuery(BaseModel):
+    start_ms: float
+    duration_ms: float
+    statement: str
+
+class ProfileDetail(ProfileSummary):
+    interval_ms: float
+    top_frames: List[ProfileFrame]
+    sql: List[ProfileQuery]
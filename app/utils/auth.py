@@ -4,16 +4,16 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 import os
-from dotenv import load_dotenv
 
 from app.database.database import get_db
+from app.database.async_database import get_async_db
+from app.database.statements import USER_BY_EMAIL
 from app.models.models import User
 from app.schemas.schemas import TokenData
 
-load_dotenv()
-
 # Configuración de seguridad
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
@@ -31,9 +31,22 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+# Los emails nuevos se guardan en minúsculas, pero pueden quedar cuentas antiguas que solo se
+# distinguen por mayúsculas: entonces gana la que coincide exactamente (la del token, que
+# guarda el email tal como está almacenado) y, si ninguna coincide, la más antigua
+def _pick_user(candidates, email: str):
+    if len(candidates) <= 1:
+        return candidates[0] if candidates else None
+    exact = [user for user in candidates if user.email == email]
+    return min(exact or candidates, key=lambda user: user.id)
+
+# Buscar usuario por email sin distinguir mayúsculas (usa el índice ix_users_email_lower)
+def get_user_by_email(db: Session, email: str):
+    return _pick_user(db.scalars(USER_BY_EMAIL, {"email": email.lower()}).all(), email)
+
 # Autenticar usuario
 def authenticate_user(db: Session, email: str, password: str):
-    user = db.query(User).filter(User.email == email).first()
+    user = get_user_by_email(db, email)
     if not user:
         return False
     if not verify_password(password, user.password):
@@ -51,24 +64,38 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-# Obtener usuario actual
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Credenciales inválidas",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+# Extraer el email del token JWT
+def _decode_token(token: str) -> TokenData:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
-            raise credentials_exception
-        token_data = TokenData(email=email)
+            raise _credentials_exception()
+        return TokenData(email=email)
     except JWTError:
-        raise credentials_exception
-    user = db.query(User).filter(User.email == token_data.email).first()
+        raise _credentials_exception()
+
+# Obtener usuario actual (síncrona: la consulta con Session se ejecuta en el threadpool, no en el bucle de eventos)
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    token_data = _decode_token(token)
+    user = get_user_by_email(db, token_data.email)
+    if user is None:
+        raise _credentials_exception()
+    return user
+
+# Versión asíncrona para las rutas que usan AsyncSession
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    token_data = _decode_token(token)
+    user = _pick_user((await db.scalars(USER_BY_EMAIL, {"email": token_data.email.lower()})).all(), token_data.email)
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     return user
 
 # Obtener usuario actual activo
@@ -77,6 +104,11 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
         raise HTTPException(status_code=400, detail="Usuario inactivo")
     return current_user
 
+async def get_current_active_user_async(current_user: User = Depends(get_current_user_async)):
+    if not current_user.is_active:
+        raise HTTPException(status_code=400, detail="Usuario inactivo")
+    return current_user
+
 # Verificar si el usuario es administrador
 async def get_current_admin_user(current_user: User = Depends(get_current_user)):
     if not current_user.is_admin:
@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database.database import SessionLocal
+from app.models.models import Category, Product, product_category
+
+# Registro en memoria de categorías con el número de productos activos de cada una.
+# Se carga al arrancar, se recarga tras escribir categorías y los conteos se ajustan
+# en cada escritura de productos. Las lecturas no usan la sesión de la petición: el registro
+# abre la suya cuando tiene que comprobar o recargar.
+#
+# Cambios hechos por otros procesos (otros workers, init_data.py):
+# - categorías creadas, renombradas o eliminadas: como mucho cada CATEGORY_VERSION_INTERVAL
+#   segundos se comparan los id, nombres y descripciones de la tabla (pocas filas, sin los
+#   conteos) con los del registro y se recarga si han cambiado; una categoría desconocida o
+#   un registro vacío fuerzan la comprobación (la consulta que haría la petición para un 404);
+# - conteos de productos: se recalculan con la recarga completa cada CATEGORY_CACHE_TTL.
+CATEGORY_CACHE_TTL = float(os.getenv("CATEGORY_CACHE_TTL", 300))
+CATEGORY_VERSION_INTERVAL = float(os.getenv("CATEGORY_VERSION_INTERVAL", 5))
+
+_categories: Dict[int, dict] = {}
+_version: Optional[tuple] = None
+_loaded_at: Optional[float] = None
+_checked_at: Optional[float] = None
+_lock = threading.Lock()
+
+def _table_version(db: Session) -> tuple:
+    return tuple(tuple(row) for row in db.query(Category.id, Category.name, Category.description).order_by(Category.id))
+
+def load_categories(db: Session) -> None:
+    global _categories, _version, _loaded_at, _checked_at
+    counts = dict(
+        db.query(product_category.c.category_id, func.count(Product.id))
+        .join(Product, Product.id == product_category.c.product_id)
+        .filter(Product.is_active == True)
+        .group_by(product_category.c.category_id)
+        .all()
+    )
+    categories = {
+        category.id: {
+            "id": category.id,
+            "name": category.name,
+            "description": category.description,
+            "created_at": category.created_at,
+            "updated_at": category.updated_at,
+            "product_count": counts.get(category.id, 0)
+        }
+        for category in db.query(Category).order_by(Category.id).all()
+    }
+    version = tuple((category["id"], category["name"], category["description"]) for category in categories.values())
+    now = time.monotonic()
+    with _lock:
+        _categories = categories
+        _version = version
+        _loaded_at = _checked_at = now
+
+def _refresh(db: Session) -> None:
+    global _checked_at
+    now = time.monotonic()
+    if _loaded_at is None or now - _loaded_at > CATEGORY_CACHE_TTL or _table_version(db) != _version:
+        load_categories(db)
+    else:
+        _checked_at = now
+
+def _ensure_fresh(force: bool = False) -> None:
+    now = time.monotonic()
+    if not force and _loaded_at is not None and now - _loaded_at <= CATEGORY_CACHE_TTL and now - _checked_at <= CATEGORY_VERSION_INTERVAL:
+        return
+    db = SessionLocal()
+    try:
+        _refresh(db)
+    finally:
+        db.close()
+
+def get_cached_categories() -> List[dict]:
+    _ensure_fresh()
+    if not _categories:
+        _ensure_fresh(force=True)
+    return list(_categories.values())
+
+def get_cached_category(category_id: int) -> Optional[dict]:
+    _ensure_fresh()
+    if category_id not in _categories:
+        _ensure_fresh(force=True)
+    return _categories.get(category_id)
+
+# Ajustar los conteos tras crear, modificar o desactivar un producto
+def update_product_counts(removed: Iterable[int] = (), added: Iterable[int] = ()) -> None:
+    with _lock:
+        for category_id in removed:
+            if category_id in _categories:
+                _categories[category_id]["product_count"] = max(_categories[category_id]["product_count"] - 1, 0)
+        for category_id in added:
+            if category_id in _categories:
+                _categories[category_id]["product_count"] += 1
+
+# Carga inicial al arrancar la aplicación
+def warm_category_registry() -> None:
+    db = SessionLocal()
+    try:
+        load_categories(db)
+    finally:
+        db.close()
@@ -0,0 +1,159 @@
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import anyio
+from fastapi import Request
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se ofrece gzip
+    brotli = None
+
+# Configuración de la compresión de respuestas
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 5))
+COMPRESSION_CACHE_MAX_BYTES = int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+# Codificaciones disponibles, en orden de preferencia del servidor
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# Solo se comprime texto; las imágenes y los binarios ya vienen comprimidos
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml")
+
+# Por encima de este tamaño la compresión sale del bucle de eventos a un hilo
+THREAD_THRESHOLD = 64 * 1024
+
+# Elegir la codificación según Accept-Encoding (mayor q; a igualdad, la preferida por el servidor)
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+class CompressedCache:
+    """LRU de cuerpos ya comprimidos, por codificación y resumen del cuerpo original.
+
+    Las respuestas que se repiten byte a byte (categorías, rankings, OpenAPI, páginas
+    del catálogo muy visitadas) se sirven sin volver a comprimir.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[Tuple[str, bytes], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, bytes]) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Tuple[str, bytes], value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+compressed_cache = CompressedCache(COMPRESSION_CACHE_MAX_BYTES)
+
+def compress(body: bytes, encoding: str) -> bytes:
+    key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+    compressed = compressed_cache.get(key)
+    if compressed is None:
+        if encoding == "br":
+            compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+        else:
+            # mtime=0: la misma entrada produce siempre los mismos bytes
+            compressed = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+        compressed_cache.put(key, compressed)
+    return compressed
+
+# Dependencia para desactivar la compresión en una ruta: dependencies=[Depends(skip_compression)]
+async def skip_compression(request: Request) -> None:
+    request.state.compress = False
+
+class CompressionMiddleware:
+    """Comprime con gzip (o brotli si está instalado) las respuestas de texto a partir de
+    minimum_size bytes. Las respuestas en streaming y las ya codificadas pasan tal cual."""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        start_message = None
+        chunks = []
+        streaming = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, streaming
+            if streaming or message["type"] not in ("http.response.start", "http.response.body"):
+                await send(message)
+            elif message["type"] == "http.response.start":
+                start_message = message
+            elif message.get("more_body", False):
+                # Streaming: se envía lo acumulado sin comprimir y el resto según llega
+                streaming = True
+                await send(start_message)
+                await send({**message, "body": b"".join(chunks) + message.get("body", b"")})
+            else:
+                chunks.append(message.get("body", b""))
+                await self._send_response(scope, start_message, b"".join(chunks), encoding, send)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _send_response(self, scope, start_message, body: bytes, encoding: Optional[str], send) -> None:
+        headers = MutableHeaders(raw=list(start_message["headers"]))
+        compressible = (
+            len(body) >= self.minimum_size
+            and "content-encoding" not in headers
+            and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            and scope.get("state", {}).get("compress", True)
+        )
+        if compressible:
+            headers.add_vary_header("Accept-Encoding")
+            if encoding is not None:
+                if len(body) > THREAD_THRESHOLD:
+                    compressed = await anyio.to_thread.run_sync(compress, body, encoding)
+                else:
+                    compressed = compress(body, encoding)
+                if len(compressed) < len(body):
+                    body = compressed
+                    headers["Content-Encoding"] = encoding
+                    headers["Content-Length"] = str(len(body))
+        await send({**start_message, "headers": headers.raw})
+        await send({"type": "http.response.body", "body": body})
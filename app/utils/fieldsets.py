@@ -0,0 +1,129 @@
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Type, get_args
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy.orm import load_only, selectinload
+from sqlalchemy.orm.interfaces import MANYTOONE
+
+# Respuestas parciales con ?fields= y ?embed=
+#
+#   fields: columnas a devolver, separadas por comas; las de los objetos anidados con
+#           prefijo (items.quantity, items.product.price). "id" se incluye siempre.
+#   embed:  relaciones a cargar y anidar (items, items.product, items.product.categories).
+#           Un campo con prefijo anida también su relación. Sin embed, los niveles sin fields
+#           propios anidan todas sus relaciones, como la respuesta completa; embed= vacío no
+#           anida ninguna.
+#
+# El mismo FieldSet decide las columnas y relaciones que se consultan (load_only/selectinload)
+# y la forma del JSON, de modo que no se carga nada que no se vaya a devolver.
+
+class FieldSet(NamedTuple):
+    model: type  # Modelo SQLAlchemy
+    columns: List[str]  # Columnas a devolver, en el orden del esquema
+    all_columns: bool  # Sin restricción de columnas en este nivel
+    embeds: Dict[str, "FieldSet"]
+
+    def includes(self, name: str) -> bool:
+        return name in self.columns
+
+def _split(value: Optional[str]) -> List[str]:
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+def _nested_schema(annotation: Any) -> Optional[Type[BaseModel]]:
+    # Product, Optional[Product] o List[Product] -> Product
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in get_args(annotation):
+        nested = _nested_schema(arg)
+        if nested is not None:
+            return nested
+    return None
+
+@lru_cache(maxsize=None)
+def _schema_shape(schema: Type[BaseModel]) -> Tuple[Tuple[str, ...], Dict[str, Type[BaseModel]]]:
+    columns, relations = [], {}
+    for name, field in schema.model_fields.items():
+        nested = _nested_schema(field.annotation)
+        if nested is None:
+            columns.append(name)
+        else:
+            relations[name] = nested
+    return tuple(columns), relations
+
+@lru_cache(maxsize=None)
+def _valid_paths(schema: Type[BaseModel]) -> Tuple[Set[str], Set[str]]:
+    # Rutas válidas de columnas y de relaciones, con su prefijo
+    columns, relations = _schema_shape(schema)
+    column_paths, relation_paths = set(columns), set()
+    for name, nested in relations.items():
+        relation_paths.add(name)
+        nested_columns, nested_relations = _valid_paths(nested)
+        column_paths.update(f"{name}.{path}" for path in nested_columns)
+        relation_paths.update(f"{name}.{path}" for path in nested_relations)
+    return column_paths, relation_paths
+
+def _build(schema: Type[BaseModel], model: type, field_paths: List[str], embed_paths: Optional[List[str]]) -> FieldSet:
+    columns, relations = _schema_shape(schema)
+    own = {path for path in field_paths if "." not in path}
+
+    embeds = {}
+    for name, nested in relations.items():
+        prefix = f"{name}."
+        nested_fields = [path[len(prefix):] for path in field_paths if path.startswith(prefix)]
+        if embed_paths is None:
+            nested_embeds, embedded = None, not own
+        else:
+            nested_embeds = [path[len(prefix):] for path in embed_paths if path.startswith(prefix)]
+            embedded = name in embed_paths or bool(nested_embeds)
+        if embedded or nested_fields:
+            relationship = getattr(model, name).property
+            embeds[name] = _build(nested, relationship.mapper.class_, nested_fields, nested_embeds)
+
+    if own:
+        return FieldSet(model, [name for name in columns if name in own or name == "id"], False, embeds)
+    return FieldSet(model, list(columns), True, embeds)
+
+# Interpretar ?fields= y ?embed= para un esquema de respuesta; None si no se pidió ninguno
+def parse_fieldset(schema: Type[BaseModel], model: type, fields: Optional[str], embed: Optional[str]) -> Optional[FieldSet]:
+    if fields is None and embed is None:
+        return None
+    field_paths = _split(fields)
+    embed_paths = _split(embed) if embed is not None else None
+
+    column_paths, relation_paths = _valid_paths(schema)
+    unknown_fields = [path for path in field_paths if path not in column_paths]
+    if unknown_fields:
+        raise HTTPException(status_code=400, detail=f"Campos desconocidos en fields: {', '.join(unknown_fields)}")
+    unknown_embeds = [path for path in embed_paths or [] if path not in relation_paths]
+    if unknown_embeds:
+        raise HTTPException(status_code=400, detail=f"Relaciones desconocidas en embed: {', '.join(unknown_embeds)}")
+    return _build(schema, model, field_paths, embed_paths)
+
+# Opciones de carga: solo las columnas pedidas y las relaciones anidadas
+def fieldset_options(fieldset: FieldSet, required: Iterable[str] = ()) -> list:
+    options = []
+    if not fieldset.all_columns:
+        columns = set(fieldset.columns) | set(required)
+        # Las relaciones muchos-a-uno necesitan su clave foránea para cargarse
+        for name in fieldset.embeds:
+            relationship = getattr(fieldset.model, name).property
+            if relationship.direction is MANYTOONE:
+                columns.update(column.key for column in relationship.local_columns)
+        options.append(load_only(*[getattr(fieldset.model, name) for name in sorted(columns)]))
+    for name, nested in fieldset.embeds.items():
+        options.append(selectinload(getattr(fieldset.model, name)).options(*fieldset_options(nested)))
+    return options
+
+# Convertir un objeto ORM en un dict con la forma pedida (listo para ORJSONResponse)
+def dump_fieldset(obj: Any, fieldset: FieldSet) -> dict:
+    data = {name: getattr(obj, name) for name in fieldset.columns}
+    for name, nested in fieldset.embeds.items():
+        value = getattr(obj, name)
+        if value is None:
+            data[name] = None
+        elif isinstance(value, list):
+            data[name] = [dump_fieldset(item, nested) for item in value]
+        else:
+            data[name] = dump_fieldset(value, nested)
+    return data
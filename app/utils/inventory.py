@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.database.database import SessionLocal
+from app.models.models import InventoryBalance, InventoryMovement, MovementType, Product
+from app.utils.leader import is_background_leader
+from app.utils.stock_shards import get_hot_products, get_sharded_stock_bulk, merge_expired_shards, take_from_shards
+
+# Configuración del libro de inventario
+INVENTORY_CACHE_TTL = float(os.getenv("INVENTORY_CACHE_TTL", 60))
+INVENTORY_COMPACTION_INTERVAL = float(os.getenv("INVENTORY_COMPACTION_INTERVAL", 30))
+
+logger = logging.getLogger(__name__)
+
+# Caché en memoria de saldos compactados: product_id -> (cantidad, last_movement_id, instante de carga).
+# Como el libro nunca se borra, cualquier par (cantidad, last_movement_id) sigue siendo una
+# instantánea válida; el TTL solo acota cuántos movimientos pendientes hay que sumar.
+_balance_cache: Dict[int, Tuple[int, int, float]] = {}
+_cache_lock = threading.Lock()
+
+# Registrar un movimiento en el libro (no modifica Product.stock)
+def record_movement(
+    db: Session,
+    product_id: int,
+    quantity: int,
+    movement_type: MovementType,
+    order_id: Optional[int] = None
+) -> InventoryMovement:
+    movement = InventoryMovement(
+        product_id=product_id,
+        quantity=quantity,
+        movement_type=movement_type,
+        order_id=order_id
+    )
+    db.add(movement)
+    return movement
+
+# Serializar las reservas de stock de estos productos hasta el commit, para que dos compras
+# simultáneas no validen el mismo saldo antes de que ninguna haya registrado su salida.
+# Se llama antes de leer el stock disponible. PostgreSQL bloquea las filas de los productos
+# (en orden de id, para no provocar interbloqueos); SQLite no tiene bloqueos por fila y toma el
+# bloqueo de escritura de la base (BEGIN IMMEDIATE), con lo que además las lecturas siguientes
+# ocurren dentro de la misma transacción y ven las salidas ya confirmadas.
+def lock_stock(db: Session, product_ids: Iterable[int]) -> None:
+    product_ids = set(product_ids)
+    if not product_ids:
+        return
+    connection = db.connection()
+    if connection.dialect.name == "sqlite":
+        if not connection.connection.driver_connection.in_transaction:
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+        return
+    db.query(Product.id).filter(Product.id.in_(sorted(product_ids))).order_by(Product.id).with_for_update().all()
+
+# Registrar el stock inicial de un producto recién creado
+def initialize_product_stock(db: Session, product: Product) -> None:
+    movement = record_movement(db, product.id, product.stock or 0, MovementType.REPOSICION)
+    db.flush()
+    db.add(InventoryBalance(product_id=product.id, quantity=product.stock or 0, last_movement_id=movement.id))
+
+# Obtener los saldos compactados, usando la caché cuando es posible (use_cache=False los lee
+# siempre de la base, p. ej. con el stock ya bloqueado por lock_stock)
+def _get_balances(db: Session, product_ids: Iterable[int], use_cache: bool = True) -> Dict[int, Tuple[int, int]]:
+    now = time.monotonic()
+    balances = {}
+    missing = []
+    with _cache_lock:
+        for product_id in product_ids:
+            cached = _balance_cache.get(product_id) if use_cache else None
+            if cached and now - cached[2] < INVENTORY_CACHE_TTL:
+                balances[product_id] = (cached[0], cached[1])
+            else:
+                missing.append(product_id)
+
+    if missing:
+        rows = db.query(InventoryBalance.product_id, InventoryBalance.quantity, InventoryBalance.last_movement_id).filter(
+            InventoryBalance.product_id.in_(missing)
+        ).all()
+        loaded = {row.product_id: (row.quantity, row.last_movement_id) for row in rows}
+
+        # Productos anteriores al libro: su saldo de partida es Product.stock
+        legacy = [product_id for product_id in missing if product_id not in loaded]
+        if legacy:
+            for product_id, stock in db.query(Product.id, Product.stock).filter(Product.id.in_(legacy)).all():
+                loaded[product_id] = (stock or 0, 0)
+
+        with _cache_lock:
+            for product_id, balance in loaded.items():
+                _balance_cache[product_id] = (balance[0], balance[1], now)
+        balances.update(loaded)
+    return balances
+
+# Calcular el stock disponible: saldo compactado + movimientos pendientes de compactar
+def get_available_stock_bulk(db: Session, product_ids: Iterable[int], use_cache: bool = True) -> Dict[int, int]:
+    product_ids = set(product_ids)
+    if not product_ids:
+        return {}
+    balances = _get_balances(db, product_ids, use_cache)
+    if not balances:
+        return {}
+
+    # Una sola consulta agregada para todos los productos, usando el índice (product_id, id)
+    min_movement_id = min(last_id for _, last_id in balances.values())
+    rows = db.query(InventoryMovement.product_id, InventoryMovement.id, InventoryMovement.quantity).filter(
+        InventoryMovement.product_id.in_(list(balances)),
+        InventoryMovement.id > min_movement_id
+    ).all()
+
+    available = {product_id: quantity for product_id, (quantity, _) in balances.items()}
+    for row in rows:
+        if row.id > balances[row.product_id][1]:
+            available[row.product_id] += row.quantity
+
+    # Los productos calientes se sirven desde la suma de sus fragmentos
+    available.update(get_sharded_stock_bulk(db, balances))
+    return available
+
+def get_available_stock(db: Session, product_id: int, use_cache: bool = True) -> int:
+    return get_available_stock_bulk(db, [product_id], use_cache).get(product_id, 0)
+
+class OrderStock:
+    """Stock de los productos de un pedido, bloqueado hasta el commit. Es la única comprobación
+    de stock de POST /orders/ y del checkout."""
+
+    def __init__(self, db: Session, product_ids: Iterable[int]):
+        product_ids = set(product_ids)
+        self.db = db
+        # Solo se bloquean los productos normales: los calientes descuentan de sus fragmentos con
+        # un UPDATE condicionado y no deben volver a encolarse sobre la fila del producto
+        self.hot_products = get_hot_products(db, product_ids)
+        lock_stock(db, product_ids - set(self.hot_products))
+        self.available = get_available_stock_bulk(db, product_ids, use_cache=False)
+
+    # Apartar stock para una línea; devuelve False (sin apartar nada) si no alcanza.
+    # Los productos calientes descuentan de sus fragmentos; el resto, del saldo del libro.
+    def take(self, product_id: int, quantity: int) -> bool:
+        hot_product = self.hot_products.get(product_id)
+        if hot_product is not None:
+            if not take_from_shards(self.db, hot_product, quantity):
+                return False
+        elif self.available.get(product_id, 0) < quantity:
+            return False
+        # Varias líneas del mismo producto comparten el disponible
+        self.available[product_id] = self.available.get(product_id, 0) - quantity
+        return True
+
+# Reflejar el stock disponible en los productos sin marcarlos como modificados
+def apply_available_stock(db: Session, products: List[Product]) -> List[Product]:
+    available = get_available_stock_bulk(db, [product.id for product in products])
+    for product in products:
+        if product.id in available:
+            set_committed_value(product, "stock", available[product.id])
+    return products
+
+# Compactar los movimientos pendientes en los saldos y sincronizar Product.stock.
+# Con varios workers la compactación corre en todos: cada saldo se actualiza solo si nadie lo
+# ha movido desde que se leyó (last_movement_id), para no aplicar dos veces los mismos movimientos.
+def compact_inventory(db: Session) -> int:
+    pending = db.query(
+        InventoryMovement.product_id,
+        func.sum(InventoryMovement.quantity).label("delta"),
+        func.max(InventoryMovement.id).label("last_id"),
+        InventoryBalance.quantity.label("balance"),
+        InventoryBalance.last_movement_id.label("balance_last_id")
+    ).outerjoin(
+        InventoryBalance, InventoryBalance.product_id == InventoryMovement.product_id
+    ).filter(
+        InventoryMovement.id > func.coalesce(InventoryBalance.last_movement_id, 0)
+    ).group_by(InventoryMovement.product_id, InventoryBalance.quantity, InventoryBalance.last_movement_id).all()
+
+    if not pending:
+        return 0
+
+    product_ids = [row.product_id for row in pending]
+    products = {product.id: product for product in db.query(Product).filter(Product.id.in_(product_ids)).all()}
+
+    compacted = {}
+    for row in pending:
+        if row.balance_last_id is None:
+            product = products.get(row.product_id)
+            quantity = ((product.stock or 0) if product else 0) + row.delta
+            db.add(InventoryBalance(product_id=row.product_id, quantity=quantity, last_movement_id=row.last_id))
+        else:
+            quantity = row.balance + row.delta
+            updated = db.query(InventoryBalance).filter(
+                InventoryBalance.product_id == row.product_id,
+                InventoryBalance.last_movement_id == row.balance_last_id
+            ).update({InventoryBalance.quantity: quantity, InventoryBalance.last_movement_id: row.last_id}, synchronize_session=False)
+            if not updated:
+                continue  # Otro proceso lo ha compactado entretanto
+        compacted[row.product_id] = (quantity, row.last_id)
+        if row.product_id in products:
+            products[row.product_id].stock = quantity
+
+    db.commit()
+
+    now = time.monotonic()
+    with _cache_lock:
+        for product_id, (quantity, last_id) in compacted.items():
+            _balance_cache[product_id] = (quantity, last_id, now)
+    return len(compacted)
+
+# Comparar los saldos compactados con Product.stock
+def check_inventory_consistency(db: Session) -> List[dict]:
+    rows = db.query(Product.id, Product.stock, InventoryBalance.quantity, InventoryBalance.last_movement_id).outerjoin(
+        InventoryBalance, InventoryBalance.product_id == Product.id
+    ).all()
+    available = get_available_stock_bulk(db, [row.id for row in rows])
+
+    discrepancies = []
+    for row in rows:
+        balance = row.quantity if row.quantity is not None else row.stock or 0
+        if (row.quantity is not None and (row.stock or 0) != row.quantity) or available.get(row.id, 0) < 0:
+            discrepancies.append({
+                "product_id": row.id,
+                "stock": row.stock or 0,
+                "balance": balance,
+                "available": available.get(row.id, 0)
+            })
+    return discrepancies
+
+def clear_inventory_cache() -> None:
+    with _cache_lock:
+        _balance_cache.clear()
+
+# Tarea periódica de compactación (se ejecuta en un hilo para no bloquear el bucle de eventos)
+def _compact_with_new_session() -> int:
+    db = SessionLocal()
+    try:
+        merge_expired_shards(db)
+        return compact_inventory(db)
+    finally:
+        db.close()
+
+async def run_compaction_loop(interval: float = INVENTORY_COMPACTION_INTERVAL) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        # Solo compacta el proceso que tiene el cerrojo de tareas en segundo plano
+        if not is_background_leader():
+            continue
+        try:
+            await asyncio.to_thread(_compact_with_new_session)
+        except Exception:
+            logger.exception("Error al compactar el inventario")
@@ -0,0 +1,42 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin cerrojo, cada proceso ejecuta las tareas como antes
+    fcntl = None
+
+from app.database.database import DATABASE_URL
+
+# Tareas periódicas de un solo proceso por máquina. Con varios workers (y durante un reinicio,
+# con dos maestros a la vez) solo el proceso que tiene el cerrojo de BACKGROUND_LOCK_PATH
+# compacta el inventario e incorpora las ventas a los contadores; los demás lo intentan en cada
+# pasada y lo heredan cuando su dueño termina, porque el sistema libera el cerrojo al morir el
+# proceso. Por defecto el fichero depende de DATABASE_URL, para que dos instalaciones en la
+# misma máquina no se bloqueen entre sí.
+_DATABASE_KEY = hashlib.sha1((DATABASE_URL or "").encode()).hexdigest()[:12]
+BACKGROUND_LOCK_PATH = os.getenv("BACKGROUND_LOCK_PATH", os.path.join(tempfile.gettempdir(), f"tiendaf-{_DATABASE_KEY}.lock"))
+
+_lock_file = None
+_lock_pid = None
+_lock = threading.Lock()
+
+# True si este proceso tiene el cerrojo (lo intenta tomar sin esperar si aún no lo tiene)
+def is_background_leader() -> bool:
+    global _lock_file, _lock_pid
+    if fcntl is None:
+        return True
+    with _lock:
+        # lockf no se hereda al hacer fork: un hijo nunca se cree dueño por el cerrojo del padre
+        if _lock_file is not None and _lock_pid == os.getpid():
+            return True
+        lock_file = open(BACKGROUND_LOCK_PATH, "a")
+        try:
+            fcntl.lockf(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        _lock_file, _lock_pid = lock_file, os.getpid()
+        return True
@@ -0,0 +1,217 @@
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+from app.database.database import engine, get_pool_status, replicas
+from app.database.async_database import async_engine, async_replicas
+from app.utils.slow_queries import SLOW_QUERY_THRESHOLD, record_slow_query
+
+# Métricas por ruta en formato de texto de Prometheus, sin dependencias externas.
+# Todas las actualizaciones se hacen desde el bucle de eventos (middleware y /metrics
+# son asíncronos), así que no hace falta bloquear; las consultas SQL de los handlers
+# síncronos se acumulan en el RequestStats de su petición, que el contexto comparte
+# con el hilo del threadpool.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+DB_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+class RequestStats:
+    __slots__ = ("scope", "queries", "db_time")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = 0
+        self.db_time = 0.0
+
+# Estadísticas de la petición en curso (None fuera de una petición, p. ej. tareas en segundo plano)
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        index = bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+
+class RouteMetrics:
+    __slots__ = ("latency", "queries", "db_time", "responses", "errors")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.db_time = Histogram(DB_TIME_BUCKETS)
+        self.responses: Dict[int, int] = {}
+        self.errors = 0
+
+# Claves de get_pool_status() que se exponen como métricas
+POOL_METRICS = (
+    ("size", "tiendaf_db_pool_size", "gauge"),
+    ("checked_out", "tiendaf_db_pool_checked_out", "gauge"),
+    ("overflow", "tiendaf_db_pool_overflow", "gauge"),
+    ("checkouts", "tiendaf_db_pool_checkouts_total", "counter"),
+    ("timeouts", "tiendaf_db_pool_timeouts_total", "counter"),
+    ("wait_total_seconds", "tiendaf_db_pool_wait_seconds_total", "counter"),
+)
+
+_routes: Dict[Tuple[str, str], RouteMetrics] = {}
+_in_flight = 0
+
+# Tiempo de cada sentencia SQL en todos los motores (síncronos y asíncronos): se acumula en
+# la petición en curso y las que superan el umbral pasan al registro de consultas lentas.
+# Se mide en los eventos do_execute del dialecto, que envuelven la llamada al driver: el
+# tiempo queda en variables locales (también cuando la sentencia falla) y el motor no
+# necesita listeners de conexión, cuyo mero despacho encarece cada sentencia y transacción.
+def _timed(execute, statement, parameters, context, executemany):
+    start = time.perf_counter()
+    try:
+        execute()
+    finally:
+        elapsed = time.perf_counter() - start
+        stats = current_request.get()
+        if stats is not None:
+            stats.db_time += elapsed
+            stats.queries += 1
+        if elapsed >= SLOW_QUERY_THRESHOLD:
+            record_slow_query(
+                context.root_connection.engine, statement, parameters, executemany, elapsed,
+                _route_template(stats.scope) if stats is not None else None
+            )
+    # Sentencia ya ejecutada: el dialecto no vuelve a ejecutarla
+    return True
+
+def instrument_engine(target) -> None:
+    target = getattr(target, "sync_engine", target)
+    dialect = target.dialect
+
+    def do_execute(cursor, statement, parameters, context):
+        return _timed(lambda: dialect.do_execute(cursor, statement, parameters, context), statement, parameters, context, False)
+
+    def do_executemany(cursor, statement, parameters, context):
+        return _timed(lambda: dialect.do_executemany(cursor, statement, parameters, context), statement, parameters, context, True)
+
+    def do_execute_no_params(cursor, statement, context):
+        return _timed(lambda: dialect.do_execute_no_params(cursor, statement, context), statement, None, context, False)
+
+    event.listen(target, "do_execute", do_execute)
+    event.listen(target, "do_executemany", do_executemany)
+    event.listen(target, "do_execute_no_params", do_execute_no_params)
+
+for _engine in [engine, *replicas.engines, async_engine, *async_replicas.engines]:
+    instrument_engine(_engine)
+
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<sin ruta>"
+
+def _record(scope, status: int, duration: float, stats: RequestStats) -> None:
+    key = (scope["method"], _route_template(scope))
+    metrics = _routes.get(key)
+    if metrics is None:
+        metrics = _routes[key] = RouteMetrics()
+    metrics.latency.observe(duration)
+    metrics.queries.observe(stats.queries)
+    metrics.db_time.observe(stats.db_time)
+    metrics.responses[status] = metrics.responses.get(status, 0) + 1
+    if status >= 500:
+        metrics.errors += 1
+
+def server_timing(duration: float, stats: RequestStats) -> str:
+    return f'app;dur={duration * 1000:.1f}, db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"'
+
+class MetricsMiddleware:
+    """Latencia, consultas SQL y tiempo de base de datos por ruta, peticiones en curso y
+    errores; añade la cabecera Server-Timing a cada respuesta."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _in_flight
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(time.perf_counter() - start, stats).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        _in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _in_flight -= 1
+            current_request.reset(token)
+            _record(scope, status, time.perf_counter() - start, stats)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _histogram_lines(name: str, labels: str, histogram: Histogram) -> List[str]:
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+# Exposición en formato de texto de Prometheus (versión 0.0.4). Cada worker expone solo sus
+# propios datos, etiquetados con worker="<pid>"; se agregan en Prometheus (sum without (worker)).
+def render_metrics() -> str:
+    worker = f'worker="{os.getpid()}"'
+    sections = {
+        "tiendaf_http_requests_total": ("counter", "Respuestas por ruta y código de estado", []),
+        "tiendaf_http_request_errors_total": ("counter", "Respuestas 5xx y excepciones por ruta", []),
+        "tiendaf_http_request_duration_seconds": ("histogram", "Latencia de las peticiones por ruta", []),
+        "tiendaf_db_queries_per_request": ("histogram", "Sentencias SQL por petición", []),
+        "tiendaf_db_seconds_per_request": ("histogram", "Tiempo acumulado en la base de datos por petición", []),
+    }
+    for (method, route), metrics in sorted(_routes.items()):
+        labels = f'{worker},method="{method}",route="{_escape(route)}"'
+        for status, count in sorted(metrics.responses.items()):
+            sections["tiendaf_http_requests_total"][2].append(f'tiendaf_http_requests_total{{{labels},status="{status}"}} {count}')
+        sections["tiendaf_http_request_errors_total"][2].append(f"tiendaf_http_request_errors_total{{{labels}}} {metrics.errors}")
+        sections["tiendaf_http_request_duration_seconds"][2].extend(_histogram_lines("tiendaf_http_request_duration_seconds", labels, metrics.latency))
+        sections["tiendaf_db_queries_per_request"][2].extend(_histogram_lines("tiendaf_db_queries_per_request", labels, metrics.queries))
+        sections["tiendaf_db_seconds_per_request"][2].extend(_histogram_lines("tiendaf_db_seconds_per_request", labels, metrics.db_time))
+
+    lines = [
+        "# HELP tiendaf_http_requests_in_flight Peticiones en curso",
+        "# TYPE tiendaf_http_requests_in_flight gauge",
+        f"tiendaf_http_requests_in_flight{{{worker}}} {_in_flight}",
+    ]
+    for name, (kind, help_text, samples) in sections.items():
+        lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", *samples])
+
+    # Estado del pool del primario (mismos datos que GET /admin/pool)
+    pool = get_pool_status()
+    for key, name, kind in POOL_METRICS:
+        if key in pool:
+            lines.extend([f"# TYPE {name} {kind}", f"{name}{{{worker}}} {pool[key]}"])
+    return "\n".join(lines) + "\n"
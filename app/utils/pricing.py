@@ -0,0 +1,200 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.database.database import SessionLocal
+from app.models.models import DiscountType, GenderType, Product, Promotion, product_category
+
+# Tiempo máximo que un proceso reutiliza las reglas compiladas sin recargarlas
+PRICING_RULES_TTL = float(os.getenv("PRICING_RULES_TTL", 60))
+
+# Regla de promoción compilada: solo los datos necesarios para evaluar un carrito
+class CompiledRule(NamedTuple):
+    id: int
+    discount_type: DiscountType
+    value: float
+    min_quantity: int
+    category_id: Optional[int]
+    gender: Optional[GenderType]
+    starts_at: Optional[datetime]
+    ends_at: Optional[datetime]
+
+    def is_current(self, now: datetime) -> bool:
+        return (self.starts_at is None or self.starts_at <= now) and (self.ends_at is None or self.ends_at > now)
+
+    def matches(self, gender: GenderType, category_ids: Set[int]) -> bool:
+        return (self.gender is None or self.gender == gender) and (self.category_id is None or self.category_id in category_ids)
+
+    def unit_discount(self, price: float) -> float:
+        if self.discount_type == DiscountType.PORCENTAJE:
+            return price * min(self.value, 100) / 100
+        return min(self.value, price)
+
+class PricedLine(NamedTuple):
+    product_id: int
+    quantity: int
+    unit_price: float  # Precio unitario final, ya descontado
+    discount: float  # Descuento total de la línea
+    promotion_id: Optional[int]
+
+class PricedCart(NamedTuple):
+    lines: List[PricedLine]
+    subtotal: float
+    discount: float
+    total: float
+
+_rules_cache: Optional[Tuple[float, List[CompiledRule]]] = None
+_rules_lock = threading.Lock()
+# Se incrementa en cada invalidación: una carga que empezó antes no llega a guardarse
+_rules_generation = 0
+
+# Compilar las promociones activas (se cachean en memoria)
+def get_compiled_rules(db: Session) -> List[CompiledRule]:
+    global _rules_cache
+    cached = _rules_cache
+    if cached is not None and time.monotonic() - cached[0] < PRICING_RULES_TTL:
+        return cached[1]
+
+    generation = _rules_generation
+    rows = db.query(
+        Promotion.id, Promotion.discount_type, Promotion.value, Promotion.min_quantity,
+        Promotion.category_id, Promotion.gender, Promotion.starts_at, Promotion.ends_at
+    ).filter(Promotion.is_active == True).all()
+    rules = [
+        CompiledRule(
+            id=row.id,
+            discount_type=row.discount_type,
+            value=row.value,
+            min_quantity=row.min_quantity or 1,
+            category_id=row.category_id,
+            gender=row.gender,
+            starts_at=_naive(row.starts_at),
+            ends_at=_naive(row.ends_at)
+        )
+        for row in rows
+    ]
+    # Si las promociones cambiaron durante la carga, estas reglas pueden ser anteriores al
+    # cambio: sirven para esta llamada, pero no se guardan
+    with _rules_lock:
+        if generation == _rules_generation:
+            _rules_cache = (time.monotonic(), rules)
+    return rules
+
+# Invalidar las reglas compiladas tras modificar promociones
+def invalidate_pricing_rules() -> None:
+    global _rules_cache, _rules_generation
+    with _rules_lock:
+        _rules_generation += 1
+        _rules_cache = None
+
+# Carga inicial al arrancar la aplicación
+def warm_pricing_rules() -> None:
+    db = SessionLocal()
+    try:
+        get_compiled_rules(db)
+    finally:
+        db.close()
+
+def _naive(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is not None:
+        return value.replace(tzinfo=None) - value.utcoffset()
+    return value
+
+# Categorías de varios productos con una sola consulta
+def get_product_category_ids(db: Session, product_ids: Sequence[int]) -> Dict[int, Set[int]]:
+    category_ids = defaultdict(set)
+    if product_ids:
+        rows = db.query(product_category.c.product_id, product_category.c.category_id).filter(
+            product_category.c.product_id.in_(list(product_ids))
+        ).all()
+        for product_id, category_id in rows:
+            category_ids[product_id].add(category_id)
+    return category_ids
+
+# Evaluar un carrito completo en una pasada: [(producto, cantidad)] -> PricedCart
+def price_cart(db: Session, lines: Sequence[Tuple[Product, int]]) -> PricedCart:
+    now = datetime.utcnow()
+    rules = [rule for rule in get_compiled_rules(db) if rule.is_current(now)]
+    category_ids = get_product_category_ids(db, [product.id for product, _ in lines]) if rules else {}
+
+    # Reglas aplicables a cada línea y unidades del carrito dentro del alcance de cada regla
+    applicable = []
+    units_in_scope = defaultdict(int)
+    for product, quantity in lines:
+        matching = [rule for rule in rules if rule.matches(product.gender, category_ids.get(product.id, set()))]
+        for rule in matching:
+            units_in_scope[rule.id] += quantity
+        applicable.append(matching)
+
+    priced_lines = []
+    subtotal = 0.0
+    total_discount = 0.0
+    for (product, quantity), matching in zip(lines, applicable):
+        # Las promociones no se acumulan: se aplica la de mayor descuento
+        best_rule = None
+        best_discount = 0.0
+        for rule in matching:
+            if units_in_scope[rule.id] < rule.min_quantity:
+                continue
+            discount = rule.unit_discount(product.price)
+            if discount > best_discount:
+                best_rule, best_discount = rule, discount
+
+        unit_price = round(product.price - best_discount, 2)
+        line_discount = round((product.price - unit_price) * quantity, 2)
+        subtotal += product.price * quantity
+        total_discount += line_discount
+        priced_lines.append(PricedLine(
+            product_id=product.id,
+            quantity=quantity,
+            unit_price=unit_price,
+            discount=line_discount,
+            promotion_id=best_rule.id if best_rule else None
+        ))
+
+    subtotal = round(subtotal, 2)
+    total_discount = round(total_discount, 2)
+    return PricedCart(lines=priced_lines, subtotal=subtotal, discount=total_discount, total=round(subtotal - total_discount, 2))
+
+# Recalcular el precio unitario de todo el catálogo (sin reglas de paquete).
+# En lugar de evaluar cada regla contra cada producto, se indexan los productos por
+# género y categoría y cada regla se aplica sobre el conjunto que le corresponde.
+def price_catalog(db: Session) -> Dict[int, Tuple[float, float, Optional[int]]]:
+    now = datetime.utcnow()
+    rules = [rule for rule in get_compiled_rules(db) if rule.is_current(now) and rule.min_quantity <= 1]
+
+    prices = {}
+    by_gender = defaultdict(set)
+    for product_id, price, gender in db.query(Product.id, Product.price, Product.gender).filter(Product.is_active == True):
+        prices[product_id] = price
+        by_gender[gender].add(product_id)
+
+    by_category = defaultdict(set)
+    if any(rule.category_id is not None for rule in rules):
+        for product_id, category_id in db.query(product_category.c.product_id, product_category.c.category_id):
+            if product_id in prices:
+                by_category[category_id].add(product_id)
+
+    all_products = set(prices)
+    best = {}
+    for rule in rules:
+        scope = all_products
+        if rule.gender is not None:
+            scope = by_gender.get(rule.gender, set())
+        if rule.category_id is not None:
+            scope = scope & by_category.get(rule.category_id, set())
+        for product_id in scope:
+            discount = rule.unit_discount(prices[product_id])
+            if discount > best.get(product_id, (0.0, None))[0]:
+                best[product_id] = (discount, rule.id)
+
+    result = {}
+    for product_id, price in prices.items():
+        discount, rule_id = best.get(product_id, (0.0, None))
+        result[product_id] = (price, round(price - discount, 2), rule_id)
+    return result
@@ -0,0 +1,310 @@
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import anyio
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import event
+from starlette.datastructures import Headers
+
+from app.database.database import SessionLocal, engine, replicas
+from app.database.async_database import async_engine, async_replicas
+from app.utils.auth import get_current_admin_user, get_current_user
+from app.utils.slow_queries import fingerprint
+
+try:
+    from anyio._backends._asyncio import WorkerThread
+    _WORKER_RUN_CODE = WorkerThread.run.__code__
+except (ImportError, AttributeError):  # Otra versión de anyio: solo se muestrea el bucle de eventos
+    _WORKER_RUN_CODE = None
+
+# Perfilado bajo demanda de peticiones concretas. Desactivado por defecto: sin PROFILING_ENABLED
+# ni PROFILING_SAMPLE_RATE no se instala el middleware ni los listeners y no cuesta nada.
+#
+# - Cabecera "X-Profile: 1" con un token de administrador: se perfila esa petición.
+# - PROFILING_SAMPLE_RATE: fracción de peticiones perfiladas al azar, sin cabecera.
+#
+# Un hilo muestrea cada PROFILING_INTERVAL_MS las pilas de los hilos que trabajan para la
+# petición (el bucle de eventos cuando ejecuta su tarea y los hilos del threadpool que ejecutan
+# su código síncrono). Mientras la petición espera, la muestra se anota como espera, de modo que
+# el perfil suma el tiempo de reloj. La sentencia SQL en curso se añade como hoja de la pila.
+# El resultado está en formato "folded" (flamegraph.pl, speedscope, inferno) y se consulta en
+# GET /admin/profiles; la respuesta perfilada lleva la cabecera X-Profile-Id.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0))
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", 5))
+PROFILING_MAX_STORED = int(os.getenv("PROFILING_MAX_STORED", 50))
+PROFILING_OUTPUT_DIR = os.getenv("PROFILING_OUTPUT_DIR", "")
+
+PROFILE_HEADER = "x-profile"
+MAX_STACK_DEPTH = 128
+_IDLE_FRAMES = {"get", "wait", "call_soon_threadsafe", "task_done"}
+_ASYNCIO_DIR = os.path.dirname(asyncio.__file__)
+
+class RequestProfile:
+    def __init__(self, scope, trigger: str):
+        self.id = f"{os.getpid()}-{next(_ids)}"
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.trigger = trigger
+        self.created_at = datetime.utcnow()
+        self.status: Optional[int] = None
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.samples: Counter = Counter()
+        self.queries: List[dict] = []
+        self.active_sql: Dict[int, str] = {}  # hilo -> sentencia en curso
+        self.loop_thread = threading.get_ident()
+        self.task = asyncio.current_task()
+        self.root_frame = sys._getframe(1)
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "trigger": self.trigger,
+            "created_at": self.created_at,
+            "duration_ms": round(self.duration * 1000, 3),
+            "samples": sum(self.samples.values()),
+            "queries": len(self.queries),
+        }
+
+    def detail(self) -> dict:
+        # Funciones con más muestras propias (la hoja de cada pila)
+        leaves = Counter()
+        for stack, count in self.samples.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return {
+            **self.summary(),
+            "interval_ms": PROFILING_INTERVAL_MS,
+            "top_frames": [{"frame": frame, "samples": count} for frame, count in leaves.most_common(20)],
+            # La huella se calcula aquí y no al ejecutar cada sentencia
+            "sql": [{**query, "statement": fingerprint(query["statement"])} for query in self.queries],
+        }
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+_ids = itertools.count(1)
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+_active: List[RequestProfile] = []
+_stored: "OrderedDict[str, RequestProfile]" = OrderedDict()
+_lock = threading.Lock()
+_wake = threading.Event()
+_sampler: Optional[threading.Thread] = None
+
+def _label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _loop_stack(frame, profile: RequestProfile) -> List[str]:
+    # Pila de la tarea hasta el middleware (o hasta el bucle, si el código corre en un greenlet)
+    labels = []
+    while frame is not None and frame is not profile.root_frame and len(labels) < MAX_STACK_DEPTH:
+        if frame.f_code.co_filename.startswith(_ASYNCIO_DIR):
+            break
+        labels.append(_label(frame))
+        frame = frame.f_back
+    return labels
+
+def _worker_stack(frame, profile: RequestProfile) -> Optional[List[str]]:
+    # Pila de un hilo del threadpool, si está ejecutando código de esta petición
+    labels, child = [], None
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        if frame.f_code is _WORKER_RUN_CODE:
+            context = frame.f_locals.get("context")
+            if child is None or child.f_code.co_name in _IDLE_FRAMES or context is None or context.get(current_profile) is not profile:
+                return None
+            return labels
+        labels.append(_label(frame))
+        child, frame = frame, frame.f_back
+    return None
+
+def _take_samples() -> None:
+    frames = sys._current_frames()
+    sampler = threading.get_ident()
+    with _lock:
+        profiles = list(_active)
+    for profile in profiles:
+        stacks = []
+        loop = profile.task.get_loop() if profile.task else None
+        if loop is not None and asyncio.current_task(loop) is profile.task and profile.loop_thread in frames:
+            stacks.append(("bucle de eventos", profile.loop_thread, _loop_stack(frames[profile.loop_thread], profile)))
+        if _WORKER_RUN_CODE is not None:
+            for thread_id, frame in frames.items():
+                if thread_id in (sampler, profile.loop_thread):
+                    continue
+                labels = _worker_stack(frame, profile)
+                if labels is not None:
+                    stacks.append(("threadpool", thread_id, labels))
+        if not stacks:
+            stacks.append(("espera", profile.loop_thread, []))
+
+        folded = []
+        for root, thread_id, labels in stacks:
+            stack = [root, *reversed(labels)]
+            sql = profile.active_sql.get(thread_id)
+            if sql is not None:
+                stack.append(f"SQL {fingerprint(sql)[:160]}")
+            folded.append(";".join(label.replace(";", ",") for label in stack))
+        with _lock:
+            # Una petición ya terminada no recibe más muestras
+            if profile in _active:
+                profile.samples.update(folded)
+
+def _sample_loop() -> None:
+    interval = PROFILING_INTERVAL_MS / 1000
+    while True:
+        _wake.wait()
+        while _active:
+            _take_samples()
+            time.sleep(interval)
+        _wake.clear()
+        if _active:
+            _wake.set()
+
+def _start(profile: RequestProfile) -> None:
+    global _sampler
+    with _lock:
+        _active.append(profile)
+        if _sampler is None:
+            _sampler = threading.Thread(target=_sample_loop, name="request-profiler", daemon=True)
+            _sampler.start()
+    _wake.set()
+
+def _finish(profile: RequestProfile) -> None:
+    profile.duration = time.perf_counter() - profile.start
+    with _lock:
+        _active.remove(profile)
+        _stored[profile.id] = profile
+        while len(_stored) > PROFILING_MAX_STORED:
+            _stored.popitem(last=False)
+
+def _write_files(profile: RequestProfile) -> None:
+    # Copia en disco: cada worker guarda sus perfiles en el mismo directorio
+    with open(os.path.join(PROFILING_OUTPUT_DIR, f"{profile.id}.folded"), "w", encoding="utf-8") as f:
+        f.write(profile.folded())
+    with open(os.path.join(PROFILING_OUTPUT_DIR, f"{profile.id}.json"), "w", encoding="utf-8") as f:
+        json.dump(profile.detail(), f, default=str, ensure_ascii=False, indent=2)
+
+# Sentencias SQL de la petición perfilada, con su inicio relativo y su duración
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile.get()
+    if profile is not None:
+        profile.active_sql[threading.get_ident()] = statement
+        conn.info.setdefault("profile_query_start", []).append((context, time.perf_counter()))
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile.get()
+    starts = conn.info.get("profile_query_start")
+    if profile is None or not starts:
+        return
+    _, start = starts.pop()
+    profile.active_sql.pop(threading.get_ident(), None)
+    profile.queries.append({
+        "start_ms": round((start - profile.start) * 1000, 3),
+        "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+        "statement": statement,
+    })
+
+# Una sentencia que falla no llega a after_cursor_execute: se retira su inicio igualmente
+def _handle_error(context):
+    profile = current_profile.get()
+    starts = context.connection.info.get("profile_query_start") if context.connection is not None else None
+    if profile is None or not starts or starts[-1][0] is not context.execution_context:
+        return
+    starts.pop()
+    profile.active_sql.pop(threading.get_ident(), None)
+
+def install_profiling() -> None:
+    for target in [engine, *replicas.engines, async_engine, *async_replicas.engines]:
+        target = getattr(target, "sync_engine", target)
+        event.listen(target, "before_cursor_execute", _before_cursor_execute)
+        event.listen(target, "after_cursor_execute", _after_cursor_execute)
+        event.listen(target, "handle_error", _handle_error)
+    if PROFILING_OUTPUT_DIR:
+        os.makedirs(PROFILING_OUTPUT_DIR, exist_ok=True)
+
+def _user_from_token(token: str):
+    db = SessionLocal()
+    try:
+        return get_current_user(token, db)
+    finally:
+        db.close()
+
+async def _authorize(headers: Headers) -> None:
+    # La misma comprobación que las rutas de administración (get_current_admin_user)
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Perfilar una petición requiere un token de administrador")
+    user = await anyio.to_thread.run_sync(_user_from_token, token)
+    await get_current_admin_user(user)
+
+class ProfilingMiddleware:
+    """Perfila las peticiones con la cabecera X-Profile (solo administradores) y una fracción
+    PROFILING_SAMPLE_RATE de las demás. Se añade el primero, para quedar junto al router."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        if PROFILING_ENABLED and headers.get(PROFILE_HEADER, "") not in ("", "0"):
+            try:
+                await _authorize(headers)
+            except HTTPException as e:
+                response = ORJSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)
+                await response(scope, receive, send)
+                return
+            trigger = "cabecera"
+        elif PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE:
+            trigger = "muestreo"
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        await self._profile(scope, receive, send, trigger)
+
+    async def _profile(self, scope, receive, send, trigger: str) -> None:
+        profile = RequestProfile(scope, trigger)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile.id.encode())]}
+            await send(message)
+
+        token = current_profile.set(profile)
+        _start(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profile.reset(token)
+            _finish(profile)
+        if PROFILING_OUTPUT_DIR:
+            await anyio.to_thread.run_sync(_write_files, profile)
+
+def list_profiles() -> List[dict]:
+    with _lock:
+        return [profile.summary() for profile in reversed(_stored.values())]
+
+def get_profile(profile_id: str) -> Optional[RequestProfile]:
+    with _lock:
+        return _stored.get(profile_id)
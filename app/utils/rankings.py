@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import math
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database.database import SessionLocal
+from app.utils.leader import is_background_leader
+from app.models.models import GenderType, InventoryMovement, MovementType, Product, ProductSalesCounter, product_category
+
+# Configuración de los rankings de más vendidos
+RANKINGS_REFRESH_INTERVAL = float(os.getenv("RANKINGS_REFRESH_INTERVAL", 60))
+RANKINGS_TOP_K = int(os.getenv("RANKINGS_TOP_K", 100))
+RANKINGS_FOLD_DELAY = float(os.getenv("RANKINGS_FOLD_DELAY", 5))
+
+logger = logging.getLogger(__name__)
+
+# Constantes de tiempo (en segundos) del decaimiento exponencial de cada ventana
+WINDOWS = {
+    "24h": 24 * 3600,
+    "7d": 7 * 24 * 3600,
+    "30d": 30 * 24 * 3600,
+}
+RANKING_TYPES = list(WINDOWS) + ["trending"]
+
+# Los movimientos de salida cuentan como venta; las cancelaciones la descuentan
+_SALE_MOVEMENTS = [MovementType.RESERVA, MovementType.VENTA, MovementType.CANCELACION]
+
+# Rankings en memoria: (tipo, category_id, gender) -> product_ids ordenados
+_rankings: Dict[Tuple[str, Optional[int], Optional[GenderType]], List[int]] = {}
+_rankings_lock = threading.Lock()
+_rankings_loaded = False
+
+class _ConcurrentFold(Exception):
+    pass
+
+def _utc_naive(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _decay(value: float, seconds: float, window: str) -> float:
+    return value * math.exp(-max(seconds, 0) / WINDOWS[window])
+
+# Incorporar a los contadores los movimientos de venta posteriores al last_movement_id de cada
+# producto (como compact_inventory). No sirve una marca de agua global: en PostgreSQL el id se
+# asigna al insertar y no al confirmar, así que un movimiento de id menor que confirme después de
+# uno mayor ya incorporado quedaría fuera para siempre. Dentro de un producto, lock_stock ordena
+# las reservas; para las rutas sin cerrojo (productos calientes, cancelaciones) solo se incorporan
+# los movimientos con más de RANKINGS_FOLD_DELAY segundos, cuando su transacción ya terminó.
+def fold_sales_movements(db: Session) -> int:
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=RANKINGS_FOLD_DELAY)
+    movements = db.query(
+        InventoryMovement.id, InventoryMovement.product_id, InventoryMovement.quantity, InventoryMovement.created_at
+    ).outerjoin(
+        ProductSalesCounter, ProductSalesCounter.product_id == InventoryMovement.product_id
+    ).filter(
+        InventoryMovement.id > func.coalesce(ProductSalesCounter.last_movement_id, 0),
+        InventoryMovement.movement_type.in_(_SALE_MOVEMENTS),
+        InventoryMovement.created_at <= cutoff
+    ).order_by(InventoryMovement.id).all()
+    if not movements:
+        return 0
+
+    pending = defaultdict(list)
+    for movement in movements:
+        pending[movement.product_id].append(movement)
+
+    counters = {
+        counter.product_id: counter
+        for counter in db.query(ProductSalesCounter).filter(ProductSalesCounter.product_id.in_(list(pending))).all()
+    }
+
+    now = datetime.utcnow()
+    try:
+        for product_id, product_movements in pending.items():
+            counter = counters.get(product_id)
+            previous_movement_id = counter.last_movement_id if counter else None
+            elapsed = (now - _utc_naive(counter.decayed_at)).total_seconds() if counter else 0
+            values = {
+                window: _decay(getattr(counter, f"units_{window}"), elapsed, window) if counter else 0.0
+                for window in WINDOWS
+            }
+            total = counter.units_total if counter else 0
+
+            for movement in product_movements:
+                # Salidas negativas = unidades vendidas; cancelaciones positivas = unidades devueltas
+                sold = -movement.quantity
+                age = (now - _utc_naive(movement.created_at)).total_seconds() if movement.created_at else 0
+                for window in WINDOWS:
+                    values[window] = max(values[window] + _decay(sold, age, window), 0.0)
+                total = max(total + sold, 0)
+
+            data = {f"units_{window}": value for window, value in values.items()}
+            data.update(units_total=total, last_movement_id=product_movements[-1].id, decayed_at=now)
+            if counter is None:
+                db.add(ProductSalesCounter(product_id=product_id, **data))
+            else:
+                # Concurrencia optimista: si otro proceso ya incorporó estos movimientos, se descarta
+                result = db.execute(
+                    update(ProductSalesCounter)
+                    .where(
+                        ProductSalesCounter.product_id == product_id,
+                        ProductSalesCounter.last_movement_id == previous_movement_id
+                    )
+                    .values(**data)
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount != 1:
+                    raise _ConcurrentFold()
+        db.commit()
+    except (_ConcurrentFold, IntegrityError):
+        db.rollback()
+        return 0
+    return len(pending)
+
+# Reconstruir los rankings en memoria a partir de los contadores
+def refresh_rankings(db: Session) -> None:
+    global _rankings, _rankings_loaded
+    now = datetime.utcnow()
+    rows = db.query(
+        ProductSalesCounter.product_id, ProductSalesCounter.units_24h, ProductSalesCounter.units_7d,
+        ProductSalesCounter.units_30d, ProductSalesCounter.decayed_at, Product.gender
+    ).join(Product, Product.id == ProductSalesCounter.product_id).filter(Product.is_active == True).all()
+
+    categories = defaultdict(list)
+    product_ids = [row.product_id for row in rows]
+    for start in range(0, len(product_ids), 500):
+        for product_id, category_id in db.query(product_category.c.product_id, product_category.c.category_id).filter(
+            product_category.c.product_id.in_(product_ids[start:start + 500])
+        ):
+            categories[product_id].append(category_id)
+
+    # Puntuación de cada producto por tipo de ranking, referida al instante actual
+    scores = {ranking: [] for ranking in RANKING_TYPES}
+    for row in rows:
+        elapsed = (now - _utc_naive(row.decayed_at)).total_seconds()
+        units = {window: _decay(getattr(row, f"units_{window}"), elapsed, window) for window in WINDOWS}
+        for window in WINDOWS:
+            if units[window] > 0.01:
+                scores[window].append((units[window], row))
+        # Tendencia: ritmo de las últimas 24h frente al ritmo medio diario de los 7 días
+        trend = units["24h"] - units["7d"] / 7
+        if trend > 0.01:
+            scores["trending"].append((trend, row))
+
+    rankings = {}
+    for ranking, scored in scores.items():
+        scored.sort(key=lambda item: item[0], reverse=True)
+        buckets = defaultdict(list)
+        for _, row in scored:
+            keys = [(None, None), (None, row.gender)]
+            for category_id in categories.get(row.product_id, []):
+                keys.extend([(category_id, None), (category_id, row.gender)])
+            for category_id, gender in keys:
+                bucket = buckets[(category_id, gender)]
+                if len(bucket) < RANKINGS_TOP_K:
+                    bucket.append(row.product_id)
+        for (category_id, gender), bucket in buckets.items():
+            rankings[(ranking, category_id, gender)] = bucket
+
+    # Se sustituye la referencia completa para que los lectores nunca vean un ranking a medias
+    with _rankings_lock:
+        _rankings = rankings
+        _rankings_loaded = True
+
+# Consultar un ranking en memoria (sin tocar los contadores)
+def get_top_product_ids(db: Session, ranking: str, category_id: Optional[int] = None, gender: Optional[GenderType] = None, limit: int = 20) -> List[int]:
+    if not _rankings_loaded:
+        refresh_rankings(db)
+    return _rankings.get((ranking, category_id, gender), [])[:limit]
+
+def _refresh_with_new_session() -> None:
+    db = SessionLocal()
+    try:
+        # Los contadores se comparten: los actualiza un solo proceso. Los rankings están en la
+        # memoria de cada worker, así que todos los reconstruyen.
+        if is_background_leader():
+            fold_sales_movements(db)
+        refresh_rankings(db)
+    finally:
+        db.close()
+
+# Tarea periódica: incorporar ventas nuevas y reconstruir los rankings
+async def run_rankings_loop(interval: float = RANKINGS_REFRESH_INTERVAL) -> None:
+    while True:
+        try:
+            await asyncio.to_thread(_refresh_with_new_session)
+        except Exception:
+            logger.exception("Error al actualizar los rankings")
+        await asyncio.sleep(interval)
@@ -0,0 +1,153 @@
+import heapq
+import math
+from collections import Counter
+from itertools import groupby
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.models.models import (
+    Order, OrderItem, OrderStatus, Product, ProductCooccurrence, ProductRecommendation, RecommendationRun
+)
+
+# "Comprados juntos habitualmente": trabajo fuera de línea que construye la matriz dispersa de
+# co-ocurrencias a partir de order_items, por tramos de órdenes para acotar la memoria, y guarda
+# el top-K de cada producto en product_recommendations para servirlo con una búsqueda por clave.
+
+DEFAULT_TOP_K = 10
+DEFAULT_CHUNK_SIZE = 10000
+# Las órdenes con muchísimos productos distintos generan O(n²) pares y aportan poca señal
+MAX_BASKET_SIZE = 50
+
+def _upsert_counts(db: Session, counts: Dict[Tuple[int, int], int]) -> None:
+    if not counts:
+        return
+    rows = [{"product_id": a, "other_product_id": b, "count": n} for (a, b), n in counts.items()]
+    insert = postgresql_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(ProductCooccurrence)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["product_id", "other_product_id"],
+        set_={"count": ProductCooccurrence.count + stmt.excluded.count}
+    )
+    db.execute(stmt, rows)
+
+# Sumar a la matriz las órdenes posteriores a run.last_order_id; devuelve los productos afectados
+def accumulate_orders(db: Session, run: RecommendationRun, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Set[int]:
+    touched = set()
+    max_order_id = db.query(func.max(Order.id)).scalar() or 0
+
+    for low in range(run.last_order_id + 1, max_order_id + 1, chunk_size):
+        high = min(low + chunk_size - 1, max_order_id)
+        rows = db.execute(
+            select(OrderItem.order_id, OrderItem.product_id)
+            .join(Order, Order.id == OrderItem.order_id)
+            .where(Order.id.between(low, high), Order.status != OrderStatus.CANCELADO)
+            .order_by(OrderItem.order_id)
+        )
+
+        counts = Counter()
+        orders = 0
+        for _, items in groupby(rows, key=lambda row: row.order_id):
+            basket = sorted({row.product_id for row in items})
+            orders += 1
+            touched.update(basket)
+            for product_id in basket:
+                counts[(product_id, product_id)] += 1
+            if len(basket) > MAX_BASKET_SIZE:
+                continue
+            for i, a in enumerate(basket):
+                for b in basket[i + 1:]:
+                    counts[(a, b)] += 1
+                    counts[(b, a)] += 1
+
+        # Los conteos del tramo y la marca de agua se confirman juntos
+        _upsert_counts(db, counts)
+        run.last_order_id = high
+        run.orders_processed += orders
+        db.commit()
+    return touched
+
+# Recalcular el top-K de los productos indicados (todos si product_ids es None).
+# En modo incremental solo se recalculan los productos con órdenes nuevas; el resto
+# se corrige en la siguiente reconstrucción completa. Con product_ids None la tabla se
+# sustituye entera en una sola transacción: hasta el commit las lecturas siguen viendo las
+# recomendaciones anteriores y nunca una tabla vacía o a medias.
+def rebuild_recommendations(db: Session, product_ids: Optional[Iterable[int]] = None, top_k: int = DEFAULT_TOP_K, batch_size: int = 500) -> int:
+    # Diagonal: número de órdenes de cada producto
+    order_counts = dict(
+        db.query(ProductCooccurrence.product_id, ProductCooccurrence.count).filter(
+            ProductCooccurrence.product_id == ProductCooccurrence.other_product_id
+        ).all()
+    )
+    full = product_ids is None
+    targets = sorted(order_counts if full else set(product_ids) & set(order_counts))
+    if full:
+        db.query(ProductRecommendation).delete(synchronize_session=False)
+
+    updated = 0
+    for start in range(0, len(targets), batch_size):
+        batch = targets[start:start + batch_size]
+        rows = db.execute(
+            select(ProductCooccurrence.product_id, ProductCooccurrence.other_product_id, ProductCooccurrence.count)
+            .where(
+                ProductCooccurrence.product_id.in_(batch),
+                ProductCooccurrence.product_id != ProductCooccurrence.other_product_id
+            )
+            .order_by(ProductCooccurrence.product_id)
+        )
+
+        recommendations = []
+        for product_id, neighbours in groupby(rows, key=lambda row: row.product_id):
+            # Similitud coseno entre las órdenes de ambos productos
+            scored = (
+                (row.count / math.sqrt(order_counts[product_id] * order_counts.get(row.other_product_id, row.count)), row.count, row.other_product_id)
+                for row in neighbours
+            )
+            for rank, (score, _, other_product_id) in enumerate(heapq.nlargest(top_k, scored), start=1):
+                recommendations.append({
+                    "product_id": product_id,
+                    "rank": rank,
+                    "related_product_id": other_product_id,
+                    "score": round(score, 6)
+                })
+
+        if not full:
+            db.query(ProductRecommendation).filter(ProductRecommendation.product_id.in_(batch)).delete(synchronize_session=False)
+        if recommendations:
+            db.bulk_insert_mappings(ProductRecommendation, recommendations)
+        if not full:
+            db.commit()
+        updated += len(batch)
+    db.commit()
+    return updated
+
+# Ejecutar el trabajo completo o incremental desde la última ejecución.
+# La reconstrucción completa vacía solo la matriz de co-ocurrencias (que no se sirve); las
+# recomendaciones publicadas se sustituyen al final, de una vez, en rebuild_recommendations.
+# El modo incremental solo suma órdenes nuevas: una orden cancelada después de contarse sigue
+# en la matriz hasta la siguiente ejecución con --full.
+def run_recommendation_job(db: Session, full: bool = False, top_k: int = DEFAULT_TOP_K, chunk_size: int = DEFAULT_CHUNK_SIZE) -> RecommendationRun:
+    last_run = None if full else db.query(RecommendationRun).order_by(RecommendationRun.id.desc()).first()
+    if full:
+        db.query(ProductCooccurrence).delete(synchronize_session=False)
+
+    run = RecommendationRun(last_order_id=last_run.last_order_id if last_run else 0, orders_processed=0, products_updated=0)
+    db.add(run)
+    db.commit()
+
+    touched = accumulate_orders(db, run, chunk_size)
+    run.products_updated = rebuild_recommendations(db, None if full else touched, top_k)
+    db.commit()
+    return run
+
+# Productos relacionados ya precalculados, en orden de relevancia
+def get_related_products(db: Session, product_id: int, limit: int = DEFAULT_TOP_K) -> List[Product]:
+    return db.query(Product).join(
+        ProductRecommendation, ProductRecommendation.related_product_id == Product.id
+    ).filter(
+        ProductRecommendation.product_id == product_id,
+        Product.is_active == True
+    ).order_by(ProductRecommendation.rank).limit(limit).all()
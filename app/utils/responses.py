@@ -0,0 +1,11 @@
+from typing import Any
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+# Respuesta JSON generada directamente por pydantic-core para las listas grandes del catálogo.
+# Con response_model, FastAPI valida el resultado, lo vuelve a convertir en dicts y después
+# lo codifica a JSON; aquí los objetos ORM se validan una sola vez (from_attributes) y se
+# serializan a bytes en Rust. La ruta mantiene response_model para la documentación.
+def model_response(adapter: TypeAdapter, data: Any, status_code: int = 200) -> Response:
+    return Response(adapter.dump_json(adapter.validate_python(data)), status_code=status_code, media_type="application/json")
@@ -0,0 +1,177 @@
+import hashlib
+import logging
+import os
+import queue
+import re
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import exc
+
+from app.database.database import engine, replicas
+from app.database.async_database import async_engine, async_replicas
+
+logger = logging.getLogger(__name__)
+
+# Registro de consultas lentas: las sentencias que superan SLOW_QUERY_THRESHOLD_MS se agrupan
+# por huella (la sentencia sin valores literales) y, la primera vez que aparece cada huella,
+# un hilo aparte obtiene su plan de ejecución (EXPLAIN QUERY PLAN en SQLite, EXPLAIN en
+# PostgreSQL) en la base de datos que la ejecutó. Los parámetros se guardan enmascarados.
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", 100))
+SLOW_QUERY_MAX_ENTRIES = int(os.getenv("SLOW_QUERY_MAX_ENTRIES", 500))
+SLOW_QUERY_THRESHOLD = SLOW_QUERY_THRESHOLD_MS / 1000
+
+EXPLAINABLE = ("select", "with", "update", "delete", "insert")
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\$\d+|\?")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+# Sentencia normalizada: sin literales ni parámetros y con las listas IN colapsadas
+def fingerprint(statement: str) -> str:
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _PLACEHOLDER.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _IN_LIST.sub("IN (...)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+def _redact_value(value: Any) -> Any:
+    # Se conservan números, booleanos y nulos (ids, límites); el texto se enmascara
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        return f"<str:{len(value)}>"
+    return f"<{type(value).__name__}>"
+
+def redact_parameters(parameters: Any) -> Any:
+    if isinstance(parameters, dict):
+        return {key: _redact_value(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_redact_value(value) for value in parameters]
+    return _redact_value(parameters)
+
+class SlowQuery:
+    __slots__ = ("id", "fingerprint", "statement", "parameters", "count", "total_time", "max_time", "routes", "last_seen", "plan", "plan_error")
+
+    def __init__(self, key: str, statement: str, parameters: Any):
+        self.id = hashlib.sha1(key.encode()).hexdigest()[:12]
+        self.fingerprint = key
+        self.statement = statement
+        self.parameters = parameters
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.routes: Dict[str, int] = {}
+        self.last_seen = datetime.utcnow()
+        self.plan: Optional[List[str]] = None
+        self.plan_error: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "fingerprint": self.fingerprint,
+            "statement": self.statement,
+            "parameters": self.parameters,
+            "count": self.count,
+            "total_ms": round(self.total_time * 1000, 3),
+            "avg_ms": round(self.total_time / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max_time * 1000, 3),
+            "routes": dict(sorted(self.routes.items(), key=lambda item: -item[1])),
+            "last_seen": self.last_seen,
+            "plan": self.plan,
+            "plan_error": self.plan_error,
+        }
+
+_slow_queries: Dict[str, SlowQuery] = {}
+_lock = threading.Lock()
+_explain_queue: "queue.Queue" = queue.Queue(maxsize=100)
+_explain_thread: Optional[threading.Thread] = None
+
+# Motor síncrono con el que explicar una sentencia: el mismo que la ejecutó o, si vino de un
+# motor asíncrono, su equivalente síncrono (primario o réplica) cuando usa el mismo estilo de
+# parámetros; con asyncpg ($1, $2...) no hay equivalente y no se explica
+def _explain_engine(source):
+    if source is engine or source in replicas.engines:
+        return source
+    pairs = [(async_engine.sync_engine, engine), *zip([replica.sync_engine for replica in async_replicas.engines], replicas.engines)]
+    for async_source, target in pairs:
+        if source is async_source:
+            return target if target.dialect.paramstyle == source.dialect.paramstyle else None
+    return None
+
+def _explain(target, statement: str, parameters: Any) -> List[str]:
+    prefix = "EXPLAIN QUERY PLAN " if target.dialect.name == "sqlite" else "EXPLAIN "
+    with target.connect() as connection:
+        rows = connection.exec_driver_sql(prefix + statement, parameters if parameters is not None else ()).fetchall()
+    # SQLite devuelve (id, parent, notused, detail); PostgreSQL una línea de texto por fila
+    return [str(row[-1]) for row in rows]
+
+def _explain_worker() -> None:
+    while True:
+        entry, target, statement, parameters = _explain_queue.get()
+        try:
+            plan, error = _explain(target, statement, parameters), None
+        except exc.SQLAlchemyError as e:
+            plan, error = None, str(e.orig if getattr(e, "orig", None) is not None else e).splitlines()[0]
+        with _lock:
+            entry.plan, entry.plan_error = plan, error
+
+def _schedule_explain(entry: SlowQuery, source, statement: str, parameters: Any) -> None:
+    global _explain_thread
+    target = _explain_engine(source)
+    if target is None:
+        with _lock:
+            entry.plan_error = f"EXPLAIN no disponible para el controlador {source.dialect.driver}"
+        return
+    if _explain_thread is None:
+        _explain_thread = threading.Thread(target=_explain_worker, name="slow-query-explain", daemon=True)
+        _explain_thread.start()
+    try:
+        # Los parámetros reales solo viajan a la cola del EXPLAIN; no se guardan
+        _explain_queue.put_nowait((entry, target, statement, parameters))
+    except queue.Full:
+        with _lock:
+            entry.plan_error = "Cola de EXPLAIN llena"
+
+# Llamado desde el listener after_cursor_execute cuando una sentencia supera el umbral;
+# source es el motor (síncrono) de la conexión que la ejecutó
+def record_slow_query(source, statement: str, parameters: Any, executemany: bool, elapsed: float, route: Optional[str]) -> None:
+    if statement.startswith(("EXPLAIN ", "explain ")):
+        return  # Las propias consultas del EXPLAIN
+    key = fingerprint(statement)
+    route = route or "<fuera de petición>"
+    new_entry = None
+    with _lock:
+        entry = _slow_queries.get(key)
+        if entry is None:
+            if len(_slow_queries) >= SLOW_QUERY_MAX_ENTRIES:
+                # Se descarta la huella que menos tiempo acumula
+                del _slow_queries[min(_slow_queries.values(), key=lambda item: item.total_time).fingerprint]
+            entry = new_entry = _slow_queries[key] = SlowQuery(key, statement, None if executemany else redact_parameters(parameters))
+        entry.count += 1
+        entry.total_time += elapsed
+        entry.max_time = max(entry.max_time, elapsed)
+        entry.routes[route] = entry.routes.get(route, 0) + 1
+        entry.last_seen = datetime.utcnow()
+
+    logger.warning("Consulta lenta (%.0f ms, %s) [%s]: %s", elapsed * 1000, route, entry.id, key[:200])
+    if new_entry is not None and not executemany and statement.lstrip().lower().startswith(EXPLAINABLE):
+        _schedule_explain(new_entry, source, statement, parameters)
+
+# Las consultas más costosas, ordenadas por tiempo total, máximo o número de apariciones
+def get_slow_queries(limit: int = 20, order: str = "total") -> List[dict]:
+    sort_keys = {
+        "total": lambda item: item.total_time,
+        "max": lambda item: item.max_time,
+        "count": lambda item: item.count,
+    }
+    with _lock:
+        entries = sorted(_slow_queries.values(), key=sort_keys[order], reverse=True)[:limit]
+        return [entry.as_dict() for entry in entries]
+
+def reset_slow_queries() -> None:
+    with _lock:
+        _slow_queries.clear()
@@ -0,0 +1,125 @@
+import random
+from datetime import datetime, timezone
+from typing import Dict, Iterable
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from app.models.models import HotProduct, StockShard
+
+# Contadores de stock fragmentados para productos "calientes".
+# Cada descuento se aplica sobre una fila de stock_shards elegida al azar con un UPDATE
+# condicionado (quantity >= cantidad), de modo que los escritores no se encolan sobre una
+# única fila y el stock nunca queda negativo. El libro de inventario sigue registrando
+# cada movimiento, por lo que al terminar el periodo caliente basta con borrar los fragmentos.
+
+# Obtener la configuración de fragmentación de los productos calientes vigentes
+def get_hot_products(db: Session, product_ids: Iterable[int]) -> Dict[int, HotProduct]:
+    product_ids = list(set(product_ids))
+    if not product_ids:
+        return {}
+    hot_products = db.query(HotProduct).filter(
+        HotProduct.product_id.in_(product_ids),
+        HotProduct.hot_until > datetime.now(timezone.utc)
+    ).all()
+    return {hot.product_id: hot for hot in hot_products}
+
+# Suma rápida de los fragmentos de cada producto caliente vigente
+def get_sharded_stock_bulk(db: Session, product_ids: Iterable[int]) -> Dict[int, int]:
+    product_ids = list(set(product_ids))
+    if not product_ids:
+        return {}
+    rows = db.query(StockShard.product_id, func.sum(StockShard.quantity)).join(
+        HotProduct, HotProduct.product_id == StockShard.product_id
+    ).filter(
+        StockShard.product_id.in_(product_ids),
+        HotProduct.hot_until > datetime.now(timezone.utc)
+    ).group_by(StockShard.product_id).all()
+    return {product_id: int(total or 0) for product_id, total in rows}
+
+def _decrement_shard(db: Session, product_id: int, shard_index: int, quantity: int) -> bool:
+    result = db.execute(
+        update(StockShard)
+        .where(
+            StockShard.product_id == product_id,
+            StockShard.shard_index == shard_index,
+            StockShard.quantity >= quantity
+        )
+        .values(quantity=StockShard.quantity - quantity)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+def _increment_shard(db: Session, product_id: int, shard_index: int, quantity: int) -> None:
+    db.execute(
+        update(StockShard)
+        .where(StockShard.product_id == product_id, StockShard.shard_index == shard_index)
+        .values(quantity=StockShard.quantity + quantity)
+        .execution_options(synchronize_session=False)
+    )
+
+# Descontar stock de los fragmentos; devuelve False (sin descontar nada) si no alcanza
+def take_from_shards(db: Session, hot_product: HotProduct, quantity: int) -> bool:
+    product_id = hot_product.product_id
+    shard_order = random.sample(range(hot_product.shard_count), hot_product.shard_count)
+
+    # Camino rápido: un único fragmento al azar cubre toda la cantidad
+    for shard_index in shard_order[:2]:
+        if _decrement_shard(db, product_id, shard_index, quantity):
+            return True
+
+    # Camino lento: repartir el descuento entre varios fragmentos
+    shards = dict(db.query(StockShard.shard_index, StockShard.quantity).filter(
+        StockShard.product_id == product_id
+    ).all())
+    taken = {}
+    remaining = quantity
+    for shard_index in shard_order:
+        take = min(shards.get(shard_index, 0), remaining)
+        if take > 0 and _decrement_shard(db, product_id, shard_index, take):
+            taken[shard_index] = take
+            remaining -= take
+        if remaining == 0:
+            return True
+
+    # Stock insuficiente: devolver lo descontado parcialmente
+    for shard_index, take in taken.items():
+        _increment_shard(db, product_id, shard_index, take)
+    return False
+
+# Devolver stock a un fragmento al azar (cancelaciones y reposiciones)
+def return_to_shards(db: Session, hot_product: HotProduct, quantity: int) -> None:
+    _increment_shard(db, hot_product.product_id, random.randrange(hot_product.shard_count), quantity)
+
+# Marcar un producto como caliente y repartir su stock disponible entre N fragmentos
+def enable_sharding(db: Session, product_id: int, shard_count: int, hot_until: datetime, available: int) -> HotProduct:
+    # hot_until es una columna con zona horaria: se guarda en UTC (sin zona se supone UTC)
+    hot_until = hot_until.astimezone(timezone.utc) if hot_until.tzinfo is not None else hot_until.replace(tzinfo=timezone.utc)
+
+    merge_shards(db, product_id)
+    hot_product = HotProduct(product_id=product_id, shard_count=shard_count, hot_until=hot_until)
+    db.add(hot_product)
+
+    base, remainder = divmod(max(available, 0), shard_count)
+    db.add_all([
+        StockShard(product_id=product_id, shard_index=index, quantity=base + (1 if index < remainder else 0))
+        for index in range(shard_count)
+    ])
+    return hot_product
+
+# Fusionar los fragmentos de un producto (el libro de inventario ya refleja cada movimiento)
+def merge_shards(db: Session, product_id: int) -> None:
+    db.query(StockShard).filter(StockShard.product_id == product_id).delete(synchronize_session=False)
+    db.query(HotProduct).filter(HotProduct.product_id == product_id).delete(synchronize_session=False)
+
+# Fusionar automáticamente los productos cuyo periodo caliente ha terminado
+def merge_expired_shards(db: Session) -> int:
+    expired = [
+        product_id for (product_id,) in db.query(HotProduct.product_id).filter(
+            HotProduct.hot_until <= datetime.now(timezone.utc)
+        ).all()
+    ]
+    for product_id in expired:
+        merge_shards(db, product_id)
+    db.commit()
+    return len(expired)
@@ -0,0 +1,359 @@
+import itertools
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select
+
+from app.database.database import engine
+from app.models.models import (
+    Cart, CartItem, Category, GenderType, InventoryBalance, InventoryMovement, MovementType,
+    Order, OrderItem, OrderStatus, Product, User, product_category
+)
+
+# Generador de datos sintéticos a escala de producción: productos, usuarios, carritos,
+# pedidos y su libro de inventario, con inserciones Core por lotes.
+#
+# Es determinista: cada lote usa su propio generador aleatorio, derivado de la semilla y
+# del primer id del lote, y los ids de productos, usuarios, carritos y pedidos se asignan
+# de forma explícita. Así el mismo --seed produce los mismos datos con uno o con varios
+# procesos (solo cambian los ids autoincrementales de los ítems y movimientos). Los lotes
+# de cada fase se reparten entre procesos; las fases van en orden por las claves foráneas.
+
+DEFAULT_BATCH_SIZE = 10000
+
+# Todos los usuarios sintéticos comparten la contraseña "tiendaf123" (hash bcrypt fijo)
+SYNTHETIC_PASSWORD = "tiendaf123"
+SYNTHETIC_PASSWORD_HASH = "$2b$12$WYM2JndLQlSX5lfH0XC0suXW20TGtMMZhGc.0nHTexl4XhkHbHcfi"
+
+NOUNS = ["Camiseta", "Pantalón", "Zapatillas", "Gorra", "Chaqueta", "Sudadera", "Vestido", "Falda", "Bufanda", "Reloj", "Mochila", "Calcetines"]
+ADJECTIVES = ["Básica", "Deportiva", "Clásica", "Urbana", "Ligera", "Térmica", "Elegante", "Vintage", "Oversize", "Slim"]
+COLORS = ["Negra", "Blanca", "Azul", "Roja", "Verde", "Gris", "Beige", "Marrón"]
+FIRST_NAMES = ["Ana", "Luis", "María", "Carlos", "Lucía", "Javier", "Sofía", "Diego", "Elena", "Pablo", "Laura", "Andrés"]
+LAST_NAMES = ["García", "Martínez", "López", "Sánchez", "Pérez", "Gómez", "Fernández", "Díaz", "Torres", "Ruiz", "Vargas", "Castro"]
+CITIES = ["Madrid", "Lima", "Bogotá", "Ciudad de México", "Buenos Aires", "Santiago", "Quito", "Sevilla"]
+
+# Distribuciones: (valor, peso)
+GENDERS = ((GenderType.UNISEX, 50), (GenderType.MUJER, 30), (GenderType.HOMBRE, 20))
+CART_SIZES = ((1, 40), (2, 25), (3, 15), (4, 8), (5, 5), (6, 3), (8, 2), (12, 2))
+ORDER_SIZES = ((1, 45), (2, 25), (3, 13), (4, 8), (5, 5), (8, 3), (15, 1))
+QUANTITIES = ((1, 75), (2, 17), (3, 5), (5, 3))
+# Estado de un pedido según su antigüedad en días: los recientes siguen en curso
+ORDER_STATUS_BY_AGE = (
+    (2, ((OrderStatus.PENDIENTE, 45), (OrderStatus.PAGADO, 40), (OrderStatus.CANCELADO, 15))),
+    (7, ((OrderStatus.PAGADO, 30), (OrderStatus.ENVIADO, 55), (OrderStatus.CANCELADO, 15))),
+    (None, ((OrderStatus.ENTREGADO, 92), (OrderStatus.CANCELADO, 8))),
+)
+
+class SyntheticConfig:
+    def __init__(
+        self,
+        products: int = 10000,
+        users: int = 10000,
+        orders: int = 20000,
+        categories: int = 50,
+        seed: int = 42,
+        zipf: float = 1.1,
+        cart_ratio: float = 0.3,
+        days: int = 365,
+        batch_size: int = DEFAULT_BATCH_SIZE
+    ):
+        self.products = products
+        self.users = users
+        self.orders = orders
+        self.categories = categories
+        self.seed = seed
+        self.zipf = zipf  # Exponente de la popularidad de los productos (1/rango^zipf)
+        self.cart_ratio = cart_ratio  # Fracción de usuarios con el carrito no vacío
+        self.days = days  # Los pedidos se reparten por los últimos `days` días
+        self.batch_size = batch_size
+        self.now = datetime.utcnow().replace(microsecond=0)
+        # Primer id de cada tabla con ids explícitos (se rellenan al empezar)
+        self.offsets: Dict[str, int] = {}
+
+class GenerationResult:
+    def __init__(self):
+        self.rows: Dict[str, int] = {}
+        self.phases: List[Tuple[str, int, float]] = []  # (fase, filas, segundos)
+
+    @property
+    def total_rows(self) -> int:
+        return sum(self.rows.values())
+
+    def add(self, counts: Dict[str, int]) -> None:
+        for table, count in counts.items():
+            self.rows[table] = self.rows.get(table, 0) + count
+
+def _weighted(rng: random.Random, choices) -> object:
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+def _price(product_id: int) -> float:
+    # Precio fijo por producto (de 4.99 a 149.99), sin guardar una tabla de precios
+    return round(4.99 + (product_id * 2654435761 % 14500) / 100, 2)
+
+def _rng(config: SyntheticConfig, kind: str, start: int) -> random.Random:
+    return random.Random(f"{config.seed}:{kind}:{start}")
+
+# Estado de cada proceso: configuración y distribuciones de popularidad
+_config: Optional[SyntheticConfig] = None
+_popular_products: List[int] = []
+_popularity_weights: List[float] = []
+_category_weights: List[float] = []
+_write_lock = nullcontext()
+
+def _zipf_weights(count: int, exponent: float) -> List[float]:
+    # Pesos acumulados de una distribución de Zipf: el rango r pesa 1/r^exponent
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+def _load_distributions(config: SyntheticConfig) -> None:
+    global _config, _popular_products, _popularity_weights, _category_weights
+    _config = config
+    # Zipf: el producto de rango r tiene peso 1/r^s; el orden de los rangos es una
+    # permutación fija de los ids, para que los más vendidos no sean los primeros ids
+    first = config.offsets["products"]
+    _popular_products = list(range(first, first + config.products))
+    random.Random(f"{config.seed}:popularity").shuffle(_popular_products)
+    _popularity_weights = _zipf_weights(config.products, config.zipf)
+    _category_weights = _zipf_weights(config.categories, 0.8)
+
+def _init_worker(config: SyntheticConfig, write_lock) -> None:
+    global _write_lock
+    # Las conexiones heredadas del proceso padre no se pueden compartir
+    engine.dispose(close=False)
+    _write_lock = write_lock or nullcontext()
+    _load_distributions(config)
+
+def _pick_products(rng: random.Random, count: int) -> List[int]:
+    # Productos distintos según la popularidad (un carrito o pedido no repite producto)
+    picked = []
+    for product_id in rng.choices(_popular_products, cum_weights=_popularity_weights, k=count * 2):
+        if product_id not in picked:
+            picked.append(product_id)
+            if len(picked) == count:
+                break
+    return picked
+
+def _insert(connection, table, rows: List[dict]) -> None:
+    if rows:
+        connection.execute(insert(table), rows)
+
+def _begin():
+    connection = engine.connect()
+    if engine.dialect.name == "sqlite":
+        # Carga masiva: sin fsync por transacción (si se interrumpe, se vuelve a generar)
+        connection.exec_driver_sql("PRAGMA synchronous=OFF")
+    return connection
+
+def _write(tables: List[Tuple[object, List[dict]]]) -> None:
+    # SQLite admite un solo escritor: los procesos generan en paralelo y escriben por turnos
+    with _write_lock, _begin() as connection:
+        for table, rows in tables:
+            _insert(connection, table, rows)
+        connection.commit()
+
+def _generate_products(start: int, count: int) -> Dict[str, int]:
+    config = _config
+    rng = _rng(config, "products", start)
+    category_ids = range(config.offsets["categories"], config.offsets["categories"] + config.categories)
+    products, links = [], []
+    for product_id in range(start, start + count):
+        noun = rng.choice(NOUNS)
+        products.append({
+            "id": product_id,
+            "name": f"{noun} {rng.choice(ADJECTIVES)} {rng.choice(COLORS)}",
+            "description": f"{noun} de la colección sintética {product_id}",
+            "price": _price(product_id),
+            # Saldo final; el libro de inventario se cuadra con él al terminar
+            "stock": 0 if rng.random() < 0.03 else rng.randint(5, 500),
+            "image_url": f"https://example.com/sintetico/{product_id}.jpg",
+            "gender": _weighted(rng, GENDERS),
+            "is_active": rng.random() >= 0.03,
+            "sku": f"SYN-{product_id:09d}",
+            "created_at": config.now - timedelta(days=rng.randint(config.days, config.days * 2)),
+        })
+        # Una a tres categorías, con más productos en las primeras
+        for category_id in set(rng.choices(category_ids, cum_weights=_category_weights, k=rng.randint(1, 3))):
+            links.append({"product_id": product_id, "category_id": category_id})
+
+    _write([(Product.__table__, products), (product_category, links)])
+    return {"products": len(products), "product_category": len(links)}
+
+def _generate_users(start: int, count: int) -> Dict[str, int]:
+    config = _config
+    rng = _rng(config, "users", start)
+    cart_first = config.offsets["carts"] - config.offsets["users"]
+    users, carts, cart_items = [], [], []
+    for user_id in range(start, start + count):
+        created_at = config.now - timedelta(days=rng.randint(0, config.days * 2), seconds=rng.randint(0, 86399))
+        users.append({
+            "id": user_id,
+            "email": f"usuario{user_id}@sintetico.tiendaf.com",
+            "password": SYNTHETIC_PASSWORD_HASH,
+            "first_name": rng.choice(FIRST_NAMES),
+            "last_name": rng.choice(LAST_NAMES),
+            "is_active": rng.random() >= 0.02,
+            "is_admin": False,
+            "created_at": created_at,
+        })
+        cart_id = cart_first + user_id
+        carts.append({"id": cart_id, "user_id": user_id, "created_at": created_at})
+        if rng.random() < config.cart_ratio:
+            for product_id in _pick_products(rng, _weighted(rng, CART_SIZES)):
+                cart_items.append({"cart_id": cart_id, "product_id": product_id, "quantity": _weighted(rng, QUANTITIES)})
+
+    _write([(User.__table__, users), (Cart.__table__, carts), (CartItem.__table__, cart_items)])
+    return {"users": len(users), "carts": len(carts), "cart_items": len(cart_items)}
+
+def _order_status(rng: random.Random, age_days: int) -> OrderStatus:
+    for max_age, statuses in ORDER_STATUS_BY_AGE:
+        if max_age is None or age_days < max_age:
+            return _weighted(rng, statuses)
+
+def _generate_orders(start: int, count: int) -> Dict[str, int]:
+    config = _config
+    rng = _rng(config, "orders", start)
+    user_first = config.offsets["users"]
+    orders, items, movements = [], [], []
+    for order_id in range(start, start + count):
+        # El 20 % de los clientes hace el 60 % de los pedidos, y hay más pedidos recientes que antiguos
+        if rng.random() < 0.6:
+            user_id = user_first + rng.randrange(max(1, config.users // 5))
+        else:
+            user_id = user_first + rng.randrange(config.users)
+        age = min(rng.expovariate(3 / config.days), config.days)
+        created_at = config.now - timedelta(days=age)
+        status = _order_status(rng, int(age))
+
+        total = 0.0
+        for product_id in _pick_products(rng, _weighted(rng, ORDER_SIZES)):
+            quantity = _weighted(rng, QUANTITIES)
+            price = _price(product_id)
+            total += price * quantity
+            items.append({"order_id": order_id, "product_id": product_id, "quantity": quantity, "price": price, "created_at": created_at})
+            # Mismos movimientos que crear y cancelar pedidos en la API
+            if status == OrderStatus.PENDIENTE or status == OrderStatus.CANCELADO:
+                movements.append({"product_id": product_id, "order_id": order_id, "quantity": -quantity, "movement_type": MovementType.RESERVA, "created_at": created_at})
+                if status == OrderStatus.CANCELADO:
+                    movements.append({"product_id": product_id, "order_id": order_id, "quantity": quantity, "movement_type": MovementType.CANCELACION, "created_at": created_at + timedelta(hours=rng.randint(1, 48))})
+            else:
+                movements.append({"product_id": product_id, "order_id": order_id, "quantity": -quantity, "movement_type": MovementType.VENTA, "created_at": created_at})
+
+        orders.append({
+            "id": order_id,
+            "user_id": user_id,
+            "total_amount": round(total, 2),
+            "status": status,
+            "shipping_address": f"Calle {rng.randint(1, 300)} #{rng.randint(1, 999)}, {rng.choice(CITIES)}",
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+
+    _write([(Order.__table__, orders), (OrderItem.__table__, items), (InventoryMovement.__table__, movements)])
+    return {"orders": len(orders), "order_items": len(items), "inventory_movements": len(movements)}
+
+def _next_id(connection, column) -> int:
+    return (connection.execute(select(func.max(column))).scalar() or 0) + 1
+
+def _create_categories(config: SyntheticConfig) -> Dict[str, int]:
+    first = config.offsets["categories"]
+    rows = [
+        {"id": first + index, "name": f"Colección {first + index}", "description": f"Categoría sintética {index + 1}"}
+        for index in range(config.categories)
+    ]
+    _write([(Category.__table__, rows)])
+    return {"categories": len(rows)}
+
+def _reconcile_inventory(config: SyntheticConfig) -> Dict[str, int]:
+    # Reposición inicial de cada producto = saldo final + lo que vendieron los pedidos, y
+    # saldo compactado hasta el último movimiento: el libro cuadra con Product.stock
+    first = config.offsets["products"]
+    last = first + config.products
+    with _begin() as connection:
+        sold = dict(connection.execute(
+            select(InventoryMovement.product_id, func.sum(InventoryMovement.quantity))
+            .where(InventoryMovement.product_id >= first, InventoryMovement.product_id < last)
+            .group_by(InventoryMovement.product_id)
+        ).all())
+        stock = connection.execute(
+            select(Product.id, Product.stock, Product.created_at).where(Product.id >= first, Product.id < last)
+        ).all()
+        for offset in range(0, len(stock), config.batch_size):
+            _insert(connection, InventoryMovement.__table__, [
+                {"product_id": product_id, "quantity": quantity - sold.get(product_id, 0), "movement_type": MovementType.REPOSICION, "created_at": created_at}
+                for product_id, quantity, created_at in stock[offset:offset + config.batch_size]
+            ])
+        connection.execute(
+            insert(InventoryBalance).from_select(
+                ["product_id", "quantity", "last_movement_id"],
+                select(InventoryMovement.product_id, func.sum(InventoryMovement.quantity), func.max(InventoryMovement.id))
+                .where(InventoryMovement.product_id >= first, InventoryMovement.product_id < last)
+                .group_by(InventoryMovement.product_id)
+            )
+        )
+        connection.commit()
+    return {"inventory_movements": len(stock), "inventory_balances": len(stock)}
+
+def _sync_sequences() -> Dict[str, int]:
+    # Los ids explícitos no avanzan las secuencias de PostgreSQL: se ponen al día
+    with _begin() as connection:
+        for table in (Category.__table__, Product.__table__, User.__table__, Cart.__table__, Order.__table__):
+            connection.exec_driver_sql(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), COALESCE((SELECT MAX(id) FROM {table.name}), 1))"
+            )
+        connection.commit()
+    return {}
+
+def _run_phase(executor: Optional[ProcessPoolExecutor], generate: Callable, first: int, total: int, batch_size: int, result: GenerationResult) -> None:
+    batches = [(start, min(batch_size, first + total - start)) for start in range(first, first + total, batch_size)]
+    if executor:
+        counts = executor.map(generate, *zip(*batches)) if batches else []
+    else:
+        counts = (generate(start, count) for start, count in batches)
+    for batch_counts in counts:
+        result.add(batch_counts)
+
+def generate(config: SyntheticConfig, workers: int = 1, progress: Optional[Callable[[str, int, float], None]] = None) -> GenerationResult:
+    result = GenerationResult()
+    with engine.connect() as connection:
+        config.offsets = {
+            "categories": _next_id(connection, Category.id),
+            "products": _next_id(connection, Product.id),
+            "users": _next_id(connection, User.id),
+            "carts": _next_id(connection, Cart.id),
+            "orders": _next_id(connection, Order.id),
+        }
+    if config.orders and not (config.users and config.products):
+        raise ValueError("Para generar pedidos hacen falta usuarios y productos")
+
+    _load_distributions(config)
+    executor = None
+    if workers > 1:
+        write_lock = multiprocessing.Lock() if engine.dialect.name == "sqlite" else None
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(config, write_lock))
+    phases = [
+        ("categorías", lambda: result.add(_create_categories(config))),
+        ("productos", lambda: _run_phase(executor, _generate_products, config.offsets["products"], config.products, config.batch_size, result)),
+        ("usuarios y carritos", lambda: _run_phase(executor, _generate_users, config.offsets["users"], config.users, config.batch_size, result)),
+        ("pedidos", lambda: _run_phase(executor, _generate_orders, config.offsets["orders"], config.orders, config.batch_size, result)),
+        ("libro de inventario", lambda: result.add(_reconcile_inventory(config))),
+    ]
+    if engine.dialect.name == "postgresql":
+        phases.append(("secuencias", lambda: _sync_sequences()))
+    try:
+        for name, run in phases:
+            rows_before = result.total_rows
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            result.phases.append((name, result.total_rows - rows_before, elapsed))
+            if progress:
+                progress(name, result.total_rows - rows_before, elapsed)
+    finally:
+        if executor:
+            executor.shutdown()
+    return result
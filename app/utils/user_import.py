@@ -0,0 +1,181 @@
+import csv
+import io
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, IO, Iterable, Iterator, List, Optional
+
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.models import Cart, User
+from app.schemas.schemas import validate_email
+from app.utils.auth import get_password_hash
+
+# Importación masiva de usuarios: lectura en streaming, hash de contraseñas en paralelo
+# y altas por lotes de usuarios y carritos con inserciones Core.
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+BCRYPT_HASH = re.compile(r"^\$2[aby]\$\d{2}\$[./A-Za-z0-9]{53}$")
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors: List[str] = []
+
+    def add_error(self, number: int, message: str) -> None:
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"Registro {number}: {message}")
+
+# Registro que no se ha podido leer: se cuenta como inválido sin interrumpir la importación
+class InvalidRecord:
+    def __init__(self, message: str):
+        self.message = message
+
+# Leer registros de un CSV (con cabecera) o de JSON por líneas, sin cargar el fichero entero
+def iter_user_records(stream: IO[str], fmt: str = "csv") -> Iterator[Dict[str, str]]:
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+    elif fmt == "jsonl":
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield InvalidRecord("línea JSON inválida")
+                continue
+            yield record if isinstance(record, dict) else InvalidRecord("el registro no es un objeto JSON")
+    else:
+        raise ValueError(f"Formato no soportado: {fmt}")
+
+def open_text_stream(binary: IO[bytes]) -> IO[str]:
+    return io.TextIOWrapper(binary, encoding="utf-8", newline="")
+
+def _text(record: Dict, key: str) -> str:
+    value = record.get(key)
+    return "" if value is None else str(value)
+
+def _as_bool(value, default: bool) -> bool:
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "si", "sí", "yes")
+
+def import_users(
+    db: Session,
+    records: Iterable[Dict[str, str]],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: Optional[int] = None
+) -> ImportResult:
+    result = ImportResult()
+    seen_emails = set()
+    workers = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    try:
+        numbered = enumerate(records, start=1)
+        while True:
+            batch = list(islice(numbered, batch_size))
+            if not batch:
+                break
+            _import_batch(db, batch, seen_emails, executor, workers, result)
+    finally:
+        if executor:
+            executor.shutdown()
+    return result
+
+def _import_batch(db: Session, batch, seen_emails: set, executor: Optional[ProcessPoolExecutor], workers: int, result: ImportResult) -> None:
+    rows = []
+    for number, record in batch:
+        if isinstance(record, InvalidRecord):
+            result.add_error(number, record.message)
+            continue
+        email = _text(record, "email").strip().lower()
+        try:
+            validate_email(email)
+        except ValueError:
+            result.add_error(number, "email inválido")
+            continue
+
+        # Duplicados dentro del propio fichero
+        if email in seen_emails:
+            result.duplicates += 1
+            continue
+        seen_emails.add(email)
+
+        password_hash = _text(record, "password_hash")
+        password = _text(record, "password")
+        if password_hash and not BCRYPT_HASH.match(password_hash):
+            result.add_error(number, "password_hash no es un hash bcrypt válido")
+            continue
+        if not password_hash and not password:
+            result.add_error(number, "falta la contraseña")
+            continue
+
+        rows.append({
+            "email": email,
+            "password": password_hash or None,
+            "plain_password": password if not password_hash else None,
+            "first_name": _text(record, "first_name") or None,
+            "last_name": _text(record, "last_name") or None,
+            "is_active": _as_bool(record.get("is_active"), True),
+            "is_admin": False
+        })
+
+    if not rows:
+        return
+
+    # Duplicados contra la base de datos: una sola consulta por lote
+    existing = {
+        email for (email,) in db.query(func.lower(User.email)).filter(
+            func.lower(User.email).in_([row["email"] for row in rows])
+        )
+    }
+    if existing:
+        result.duplicates += sum(1 for row in rows if row["email"] in existing)
+        rows = [row for row in rows if row["email"] not in existing]
+    if not rows:
+        return
+
+    # Hash de las contraseñas en claro repartido entre procesos
+    pending = [row for row in rows if row["password"] is None]
+    plain_passwords = [row["plain_password"] for row in pending]
+    if executor:
+        hashes = executor.map(get_password_hash, plain_passwords, chunksize=max(1, len(plain_passwords) // (workers * 4)))
+    else:
+        hashes = map(get_password_hash, plain_passwords)
+    for row, password_hash in zip(pending, hashes):
+        row["password"] = password_hash
+    for row in rows:
+        del row["plain_password"]
+
+    # Alta de usuarios y carritos en la misma transacción
+    try:
+        created = _insert_users(db, rows)
+        db.commit()
+    except IntegrityError:
+        # Otro proceso ha dado de alta alguno de los emails entretanto: se repite el lote fila a fila
+        db.rollback()
+        created = []
+        for row in rows:
+            try:
+                created.extend(_insert_users(db, [row]))
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                result.duplicates += 1
+    result.created += len(created)
+
+def _insert_users(db: Session, rows: List[dict]) -> List[int]:
+    created = db.execute(insert(User).returning(User.id), rows).scalars().all()
+    db.execute(insert(Cart), [{"user_id": user_id} for user_id in created])
+    return created
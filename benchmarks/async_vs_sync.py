@@ -0,0 +1,126 @@
+"""Benchmark de la consulta del catálogo en modo síncrono frente a asíncrono.
+
+Ejecuta la misma consulta que GET /products/ (productos activos con sus categorías)
+con N peticiones concurrentes de dos formas:
+
+- síncrono: Session en el threadpool de anyio, como FastAPI ejecuta las rutas `def`
+  (la concurrencia queda limitada por los hilos disponibles, 40 por defecto);
+- asíncrono: AsyncSession en el bucle de eventos, como las rutas `async def`
+  (la concurrencia queda limitada por el pool de conexiones).
+
+Uso:
+    python benchmarks/async_vs_sync.py --concurrency 100 --requests 2000 --products 500
+
+Por defecto usa una base SQLite temporal; con DATABASE_URL apuntando a PostgreSQL
+(y asyncpg instalado) se mide el comportamiento real de ambos pools.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+import anyio.to_thread
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from app.database.database import SessionLocal, engine
+from app.database.async_database import AsyncSessionLocal, async_engine
+from app.models.models import Base, Category, GenderType, Product
+
+
+def seed(products):
+    db = SessionLocal()
+    try:
+        categories = [Category(name=f"Categoría {i}") for i in range(10)]
+        db.add_all(categories)
+        db.add_all(
+            Product(
+                name=f"Producto {i}", price=10 + i % 50, stock=100, gender=GenderType.UNISEX,
+                categories=[categories[i % 10], categories[(i + 3) % 10]]
+            )
+            for i in range(products)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def catalog_query(limit):
+    return select(Product).options(selectinload(Product.categories)).where(Product.is_active == True).limit(limit)
+
+
+def fetch_sync(limit):
+    db = SessionLocal()
+    try:
+        return len(db.execute(catalog_query(limit)).scalars().all())
+    finally:
+        db.close()
+
+
+async def fetch_async(limit):
+    async with AsyncSessionLocal() as db:
+        return len((await db.execute(catalog_query(limit))).scalars().all())
+
+
+async def run(fetch, concurrency, requests):
+    latencies = []
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    async def client():
+        while not queue.empty():
+            queue.get_nowait()
+            start = time.perf_counter()
+            await fetch()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rate": requests / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+async def main_async(args):
+    # Calentar ambos pools antes de medir
+    await anyio.to_thread.run_sync(fetch_sync, args.limit)
+    await fetch_async(args.limit)
+
+    results = {
+        "Síncrono (threadpool)": await run(lambda: anyio.to_thread.run_sync(fetch_sync, args.limit), args.concurrency, args.requests),
+        "Asíncrono (AsyncSession)": await run(lambda: fetch_async(args.limit), args.concurrency, args.requests),
+    }
+    for name, result in results.items():
+        print(f"{name:26} {result['rate']:10.1f} peticiones/s  p50 {result['p50']:7.2f} ms  p95 {result['p95']:7.2f} ms")
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=20, help="productos por petición")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    seed(args.products)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
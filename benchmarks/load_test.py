@@ -0,0 +1,405 @@
+"""Benchmark de carga de extremo a extremo: navegación, búsqueda, login, carrito y compra.
+
+Siembra una base con el tamaño indicado y lanza N usuarios virtuales concurrentes que
+repiten una mezcla de escenarios realistas durante un tiempo fijo:
+
+- browse:   página del catálogo (GET /products/) y detalle de un producto;
+- search:   búsqueda por nombre en GET /products/?search=;
+- login:    POST /auth/login (incluye el coste de bcrypt);
+- cart:     añadir, consultar, cambiar la cantidad y quitar un producto del carrito;
+- checkout: añadir uno de los pocos productos compartidos (--hot-skus) y comprar, de modo
+            que todas las compras compiten por el stock de los mismos productos.
+
+Dos modos:
+
+- asgi:    la aplicación en el mismo proceso, sin red (httpx.ASGITransport); mide el código;
+- uvicorn: un servidor uvicorn local en un subproceso, con HTTP real.
+
+Informa, por petición y en total, del rendimiento (peticiones/s), la latencia p50/p95/p99
+y las consultas SQL por petición (de la cabecera Server-Timing). Con --save-baseline guarda
+el resultado en JSON y con --baseline lo compara: sale con código 1 si el p95 o el
+rendimiento empeoran más de --tolerance o si aumentan las consultas por petición.
+
+Uso:
+    python benchmarks/load_test.py --mode asgi --concurrency 20 --duration 20
+    python benchmarks/load_test.py --mode uvicorn --products 5000 --save-baseline baseline.json
+    python benchmarks/load_test.py --mode uvicorn --products 5000 --baseline baseline.json
+
+Por defecto usa una base SQLite temporal; con DATABASE_URL apuntando a PostgreSQL (vacía)
+se mide el comportamiento real de bloqueos y pools.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from statistics import quantiles
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+import httpx
+
+from app.database.database import SessionLocal, engine
+from app.models.models import (
+    Base, Cart, Category, GenderType, InventoryBalance, InventoryMovement, MovementType, Product, User
+)
+from app.utils.auth import get_password_hash
+from app.utils.inventory import get_available_stock_bulk
+
+PASSWORD = "benchmark"
+NOUNS = ["Camiseta", "Pantalón", "Zapatillas", "Gorra", "Chaqueta", "Sudadera", "Vestido", "Falda", "Bufanda", "Reloj"]
+ADJECTIVES = ["Básica", "Deportiva", "Clásica", "Urbana", "Ligera", "Térmica", "Elegante", "Vintage"]
+COLORS = ["Negra", "Blanca", "Azul", "Roja", "Verde", "Gris"]
+DEFAULT_MIX = "browse=45,search=20,login=2,cart=23,checkout=10"
+QUERIES_HEADER = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+def seed(products, users, categories, hot_skus, hot_stock, rng):
+    db = SessionLocal()
+    try:
+        category_rows = [Category(name=f"Categoría {i}") for i in range(categories)]
+        db.add_all(category_rows)
+
+        product_rows = []
+        for i in range(products):
+            hot = i < hot_skus
+            product_rows.append(Product(
+                name=f"{rng.choice(NOUNS)} {rng.choice(ADJECTIVES)} {rng.choice(COLORS)} {i}",
+                description="Producto de benchmark",
+                price=round(rng.uniform(5, 150), 2),
+                stock=hot_stock if hot else rng.randint(50, 500),
+                gender=rng.choice(list(GenderType)),
+                sku=f"BENCH-{i:06d}",
+                categories=rng.sample(category_rows, k=min(2, categories))
+            ))
+        db.add_all(product_rows)
+        db.flush()
+
+        # Stock inicial en el libro de inventario, como initialize_product_stock pero en bloque
+        movements = [
+            InventoryMovement(product_id=product.id, quantity=product.stock, movement_type=MovementType.REPOSICION)
+            for product in product_rows
+        ]
+        db.add_all(movements)
+        db.flush()
+        db.add_all(
+            InventoryBalance(product_id=movement.product_id, quantity=movement.quantity, last_movement_id=movement.id)
+            for movement in movements
+        )
+
+        # Un solo hash de bcrypt para todos los usuarios
+        password = get_password_hash(PASSWORD)
+        user_rows = [User(email=f"cliente{i}@bench.tiendaf.com", password=password, first_name=f"Cliente {i}") for i in range(users)]
+        db.add_all(user_rows)
+        db.flush()
+        db.add_all(Cart(user_id=user.id) for user in user_rows)
+        db.commit()
+        return [product.id for product in product_rows], [user.email for user in user_rows]
+    finally:
+        db.close()
+
+
+class Recorder:
+    """Muestras (latencia, consultas SQL, código) por petición, desde el fin del calentamiento."""
+
+    def __init__(self, measure_from):
+        self.measure_from = measure_from
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.scenarios = defaultdict(int)
+
+    async def request(self, client, method, url, name=None, **kwargs):
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        elapsed = time.perf_counter() - start
+        if start >= self.measure_from:
+            match = QUERIES_HEADER.search(response.headers.get("server-timing", ""))
+            name = name or f"{method} {url.split('?')[0]}"
+            self.samples[name].append((elapsed, int(match.group(1)) if match else None))
+            self.statuses[name][response.status_code] += 1
+        return response
+
+
+class VirtualUser:
+    def __init__(self, client, recorder, rng, email, product_ids, hot_ids):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.email = email
+        self.product_ids = product_ids
+        self.hot_ids = hot_ids
+        self.headers = {}
+
+    async def login(self):
+        response = await self.recorder.request(
+            self.client, "POST", "/auth/login", data={"username": self.email, "password": PASSWORD}
+        )
+        if response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def browse(self):
+        skip = self.rng.randrange(0, max(1, len(self.product_ids) - 20))
+        response = await self.recorder.request(self.client, "GET", f"/products/?skip={skip}&limit=20")
+        products = response.json() if response.status_code == 200 else []
+        if products:
+            product_id = self.rng.choice(products)["id"]
+            await self.recorder.request(self.client, "GET", f"/products/{product_id}", name="GET /products/{product_id}")
+
+    async def search(self):
+        term = self.rng.choice(NOUNS + ADJECTIVES)
+        await self.recorder.request(self.client, "GET", f"/products/?search={term}&limit=20")
+
+    async def cart(self):
+        product_id = self.rng.choice(self.product_ids)
+        response = await self.recorder.request(
+            self.client, "POST", "/cart/items", json={"product_id": product_id, "quantity": 1}, headers=self.headers
+        )
+        await self.recorder.request(self.client, "GET", "/cart/", headers=self.headers)
+        if response.status_code == 201:
+            item_id = response.json()["id"]
+            await self.recorder.request(
+                self.client, "PUT", f"/cart/items/{item_id}", name="PUT /cart/items/{item_id}",
+                json={"quantity": 2}, headers=self.headers
+            )
+            await self.recorder.request(
+                self.client, "DELETE", f"/cart/items/{item_id}", name="DELETE /cart/items/{item_id}", headers=self.headers
+            )
+
+    async def checkout(self):
+        product_id = self.rng.choice(self.hot_ids)
+        await self.recorder.request(
+            self.client, "POST", "/cart/items", json={"product_id": product_id, "quantity": 1}, headers=self.headers
+        )
+        response = await self.recorder.request(
+            self.client, "POST", "/orders/checkout?shipping_address=Calle%20Benchmark%201", headers=self.headers
+        )
+        if response.status_code != 200:
+            # Sin stock (o bloqueo): vaciar el carrito para el siguiente escenario
+            await self.recorder.request(self.client, "DELETE", "/cart/", headers=self.headers)
+
+    async def run(self, scenarios, weights, deadline):
+        while time.perf_counter() < deadline:
+            scenario = self.rng.choices(scenarios, weights)[0]
+            await getattr(self, scenario)()
+            self.recorder.scenarios[scenario] += 1
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ("browse", "search", "login", "cart", "checkout"):
+            raise SystemExit(f"Escenario desconocido en --mix: {name}")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+async def drive(base_url, transport, args, product_ids, hot_ids, emails):
+    weights = parse_mix(args.mix)
+    recorder = Recorder(float("inf"))
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits, timeout=60) as client:
+        users = [
+            VirtualUser(client, recorder, random.Random(args.seed + i), emails[i % len(emails)], product_ids, hot_ids)
+            for i in range(args.concurrency)
+        ]
+        # Sesiones iniciadas antes de medir (el escenario login mide el coste de bcrypt)
+        await asyncio.gather(*(user.login() for user in users))
+        start = time.perf_counter()
+        recorder.measure_from = start + args.warmup
+        deadline = recorder.measure_from + args.duration
+        await asyncio.gather(*(user.run(list(weights), list(weights.values()), deadline) for user in users))
+    return recorder, time.perf_counter() - recorder.measure_from
+
+
+async def run_asgi(args, product_ids, hot_ids, emails):
+    import main
+
+    # ASGITransport no ejecuta el lifespan: se lanza a mano (routers, cachés y tareas de fondo)
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        return await drive("http://tiendaf", transport, args, product_ids, hot_ids, emails)
+
+
+def run_uvicorn(args, product_ids, hot_ids, emails):
+    command = [
+        sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(args.port),
+        "--log-level", "warning", "--no-access-log"
+    ]
+    server = subprocess.Popen(command, cwd=BASE_DIR, env=os.environ.copy())
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        for _ in range(200):
+            if server.poll() is not None:
+                raise SystemExit("uvicorn terminó antes de aceptar conexiones")
+            try:
+                httpx.get(f"{base_url}/categories/", timeout=1)
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        else:
+            raise SystemExit("uvicorn no respondió a tiempo")
+        return asyncio.run(drive(base_url, None, args, product_ids, hot_ids, emails))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def percentile(sorted_values, q):
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    return quantiles(sorted_values, n=100, method="inclusive")[q - 1]
+
+
+def summarize(recorder, elapsed):
+    endpoints = {}
+    all_latencies = []
+    for name, samples in sorted(recorder.samples.items()):
+        latencies = sorted(latency for latency, _ in samples)
+        queries = [count for _, count in samples if count is not None]
+        statuses = recorder.statuses[name]
+        all_latencies.extend(latencies)
+        endpoints[name] = {
+            "requests": len(samples),
+            "throughput": len(samples) / elapsed,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "queries_per_request": sum(queries) / len(queries) if queries else None,
+            "errors": sum(count for code, count in statuses.items() if code >= 500),
+            "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        }
+    all_latencies.sort()
+    total = {
+        "requests": len(all_latencies),
+        "throughput": len(all_latencies) / elapsed,
+        "p50_ms": percentile(all_latencies, 50) * 1000 if all_latencies else 0,
+        "p95_ms": percentile(all_latencies, 95) * 1000 if all_latencies else 0,
+        "p99_ms": percentile(all_latencies, 99) * 1000 if all_latencies else 0,
+        "errors": sum(endpoint["errors"] for endpoint in endpoints.values()),
+    }
+    return {"endpoints": endpoints, "total": total, "scenarios": dict(recorder.scenarios)}
+
+
+def print_report(result):
+    print(f"\n{'petición':32} {'n':>7} {'pet/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'SQL':>5} {'5xx':>5}  códigos")
+    for name, endpoint in result["endpoints"].items():
+        queries = endpoint["queries_per_request"]
+        print(
+            f"{name:32} {endpoint['requests']:7d} {endpoint['throughput']:8.1f} {endpoint['p50_ms']:6.1f}ms "
+            f"{endpoint['p95_ms']:6.1f}ms {endpoint['p99_ms']:6.1f}ms {queries if queries is not None else float('nan'):5.1f} "
+            f"{endpoint['errors']:5d}  {endpoint['statuses']}"
+        )
+    total = result["total"]
+    print(
+        f"{'TOTAL':32} {total['requests']:7d} {total['throughput']:8.1f} {total['p50_ms']:6.1f}ms "
+        f"{total['p95_ms']:6.1f}ms {total['p99_ms']:6.1f}ms {'':5} {total['errors']:5d}"
+    )
+    print(f"\nEscenarios completados: {result['scenarios']}")
+
+
+def compare(result, baseline, tolerance):
+    regressions = []
+    if result["config"] != baseline.get("config"):
+        print("\nAviso: la configuración difiere de la del baseline; la comparación puede no ser válida")
+
+    base_total, total = baseline["total"], result["total"]
+    if total["throughput"] < base_total["throughput"] * (1 - tolerance):
+        regressions.append(f"TOTAL: {total['throughput']:.1f} pet/s frente a {base_total['throughput']:.1f}")
+    for name, endpoint in result["endpoints"].items():
+        base = baseline["endpoints"].get(name)
+        if base is None:
+            continue
+        if endpoint["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {endpoint['p95_ms']:.1f} ms frente a {base['p95_ms']:.1f} ms")
+        # Las consultas por petición no dependen de la máquina: cualquier aumento es una regresión
+        if endpoint["queries_per_request"] is not None and base["queries_per_request"] is not None:
+            if endpoint["queries_per_request"] > base["queries_per_request"] + 0.5:
+                regressions.append(
+                    f"{name}: {endpoint['queries_per_request']:.1f} consultas por petición frente a {base['queries_per_request']:.1f}"
+                )
+        if endpoint["errors"] > base["errors"]:
+            regressions.append(f"{name}: {endpoint['errors']} respuestas 5xx frente a {base['errors']}")
+
+    if regressions:
+        print(f"\nRegresiones respecto al baseline (tolerancia {tolerance:.0%}):")
+        for regression in regressions:
+            print(f"  - {regression}")
+    else:
+        print(f"\nSin regresiones respecto al baseline (tolerancia {tolerance:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--users", type=int, default=100, help="usuarios sembrados (uno por usuario virtual como mucho)")
+    parser.add_argument("--hot-skus", type=int, default=3, help="productos compartidos por las compras")
+    parser.add_argument("--hot-stock", type=int, default=100000)
+    parser.add_argument("--concurrency", type=int, default=20, help="usuarios virtuales concurrentes")
+    parser.add_argument("--duration", type=float, default=20, help="segundos medidos")
+    parser.add_argument("--warmup", type=float, default=3, help="segundos iniciales que no se miden")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"pesos de los escenarios (por defecto {DEFAULT_MIX})")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", help="JSON con el que comparar; código de salida 1 si hay regresiones")
+    parser.add_argument("--save-baseline", help="guardar el resultado en este JSON")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    seed_start = time.perf_counter()
+    product_ids, emails = seed(args.products, args.users, args.categories, args.hot_skus, args.hot_stock, random.Random(args.seed))
+    hot_ids = product_ids[:args.hot_skus]
+    print(f"Base sembrada en {time.perf_counter() - seed_start:.1f} s: {args.products} productos, {args.users} usuarios ({os.environ['DATABASE_URL']})")
+    print(f"Modo {args.mode}: {args.concurrency} usuarios virtuales, {args.warmup:g} s de calentamiento + {args.duration:g} s medidos")
+
+    if args.mode == "asgi":
+        recorder, elapsed = asyncio.run(run_asgi(args, product_ids, hot_ids, emails))
+    else:
+        recorder, elapsed = run_uvicorn(args, product_ids, hot_ids, emails)
+
+    result = summarize(recorder, elapsed)
+    result["config"] = {
+        key: getattr(args, key)
+        for key in ("mode", "products", "categories", "users", "hot_skus", "concurrency", "duration", "mix")
+    }
+    print_report(result)
+
+    # Las compras concurrentes nunca deben dejar stock negativo en los productos compartidos
+    db = SessionLocal()
+    try:
+        oversold = {product_id: stock for product_id, stock in get_available_stock_bulk(db, hot_ids).items() if stock < 0}
+    finally:
+        db.close()
+    if oversold:
+        print(f"\nERROR: stock negativo tras las compras concurrentes: {oversold}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"\nBaseline guardado en {args.save_baseline}")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+
+    if regressions or oversold:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Coste de la instrumentación de métricas.
+
+Mide por separado las dos piezas que se ejecutan en cada petición:
+
+  - MetricsMiddleware: se llama N veces a una aplicación ASGI mínima, con y sin el
+    middleware, sin servidor ni cliente HTTP de por medio.
+  - Eventos del motor: se ejecuta N veces SELECT 1 sobre SQLite en memoria, con y sin
+    los eventos do_execute del dialecto y con una petición activa.
+
+Uso:
+    python benchmarks/metrics_overhead.py --iterations 20000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+os.environ["DATABASE_URL"] = "sqlite://"
+
+from sqlalchemy import create_engine, text
+
+from app.utils.metrics import MetricsMiddleware, RequestStats, current_request, instrument_engine
+
+SCOPE = {"type": "http", "method": "GET", "path": "/", "headers": []}
+
+async def app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+async def send(message):
+    pass
+
+async def call_many(asgi_app, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await asgi_app(dict(SCOPE), receive, send)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def query_many(engine, iterations: int) -> float:
+    statement = text("SELECT 1")
+    with engine.connect() as connection:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            connection.execute(statement)
+        return (time.perf_counter() - start) / iterations * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    bare = min(asyncio.run(call_many(app, args.iterations)) for _ in range(3))
+    instrumented = min(asyncio.run(call_many(MetricsMiddleware(app), args.iterations)) for _ in range(3))
+    print(f"petición  sin middleware {bare:6.2f} µs  con middleware {instrumented:6.2f} µs  coste {instrumented - bare:5.2f} µs")
+
+    plain_engine = create_engine("sqlite://")
+    instrumented_engine = create_engine("sqlite://")
+    instrument_engine(instrumented_engine)
+    token = current_request.set(RequestStats(SCOPE))
+    try:
+        bare = min(query_many(plain_engine, args.iterations) for _ in range(3))
+        instrumented = min(query_many(instrumented_engine, args.iterations) for _ in range(3))
+    finally:
+        current_request.reset(token)
+    print(f"consulta  sin eventos    {bare:6.2f} µs  con eventos    {instrumented:6.2f} µs  coste {instrumented - bare:5.2f} µs")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Benchmark de serialización de respuestas del catálogo.
+
+Mide, sobre una respuesta de N productos (con sus categorías), el coste en CPU de
+convertir los objetos ORM en el cuerpo JSON por tres caminos:
+
+  - fastapi + JSONResponse: response_model y codificador por defecto (como antes)
+  - fastapi + ORJSONResponse: response_model con la clase de respuesta por defecto de la app
+  - model_response: validación única y JSON generado por pydantic-core (rutas del catálogo)
+
+No usa base de datos: los productos se construyen en memoria para medir solo la serialización.
+
+Uso:
+    python benchmarks/serialization.py --products 1000 --repeat 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import List
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.models.models import Category, GenderType, Product
+from app.schemas.schemas import PRODUCT_LIST, Product as ProductSchema
+from app.utils.responses import model_response
+
+def build_products(count: int) -> List[Product]:
+    now = datetime(2026, 1, 1)
+    categories = [Category(id=i, name=f"Categoría {i}", description="Descripción", created_at=now, updated_at=now) for i in range(10)]
+    return [
+        Product(
+            id=i, name=f"Producto {i}", description="Descripción del producto " * 3, price=10.5 + i % 90, stock=i % 50,
+            image_url=f"https://cdn.tiendaf.com/p/{i}.jpg", gender=GenderType.UNISEX, is_active=True, sku=f"SKU-{i}",
+            categories=[categories[i % 10], categories[(i + 3) % 10]], created_at=now, updated_at=now
+        )
+        for i in range(count)
+    ]
+
+def fastapi_path(response_class):
+    field = create_response_field(name="Response_bench", type_=List[ProductSchema])
+
+    def render(products):
+        # Lo que hace FastAPI con response_model en una ruta síncrona: validar, volcar a tipos JSON y codificar
+        content = asyncio.run(serialize_response(field=field, response_content=products, is_coroutine=True))
+        return response_class(content).body
+    return render
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    products = build_products(args.products)
+    paths = {
+        "fastapi + JSONResponse": fastapi_path(JSONResponse),
+        "fastapi + ORJSONResponse": fastapi_path(ORJSONResponse),
+        "model_response": lambda items: model_response(PRODUCT_LIST, items).body,
+    }
+
+    baseline = None
+    print(f"{'camino':28} {'mediana':>10} {'tamaño':>10} {'vs. JSONResponse':>17}")
+    for name, render in paths.items():
+        render(products)
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            body = render(products)
+            timings.append(time.perf_counter() - start)
+        median_ms = statistics.median(timings) * 1000
+        baseline = baseline or median_ms
+        print(f"{name:28} {median_ms:7.1f} ms {len(body) / 1024:7.0f} KB {baseline / median_ms:16.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Perfil del arranque en frío de la aplicación.
+
+Mide, en procesos nuevos, lo que paga cada worker al arrancar: el import de main
+(con `python -X importtime`, mostrando los módulos más caros) y el tiempo hasta que
+termina el lifespan en modo producción. El presupuesto del import se comprueba en
+tests/test_startup_time.py; este script sirve para ver a qué se debe una regresión.
+
+Uso:
+    python benchmarks/startup_time.py
+    python benchmarks/startup_time.py --top 15
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+STARTUP_SNIPPET = """
+import time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app):
+    ready = time.perf_counter()
+print(f"{(imported - start) * 1000:.1f} {(ready - imported) * 1000:.1f}")
+"""
+
+def run(code: str, env: dict, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *flags, "-c", code], cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Módulos más caros a mostrar")
+    args = parser.parse_args()
+
+    # Base temporal ya migrada, como la que encontraría un worker en producción
+    env = dict(os.environ, STARTUP_MODE="production")
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.db')}")
+    subprocess.run([sys.executable, "manage.py", "migrate"], cwd=BASE_DIR, env=env, capture_output=True, check=True)
+
+    # Módulos con más coste propio al importar main
+    profile = run("import main", env, "-X", "importtime").stderr
+    modules = [
+        (int(match.group(1)), int(match.group(2)), match.group(4))
+        for match in map(IMPORTTIME_LINE.match, profile.splitlines()) if match
+    ]
+    print(f"{'módulo':50} {'propio':>10} {'acumulado':>10}")
+    for self_us, cumulative_us, name in sorted(modules, reverse=True)[:args.top]:
+        print(f"{name:50} {self_us / 1000:7.1f} ms {cumulative_us / 1000:7.1f} ms")
+
+    imports, lifespans = [], []
+    for _ in range(args.runs):
+        imported_ms, ready_ms = map(float, run(STARTUP_SNIPPET, env).stdout.split()[-2:])
+        imports.append(imported_ms)
+        lifespans.append(ready_ms)
+    import_ms = statistics.median(imports)
+    print(f"\nimport main: {import_ms:.0f} ms (mediana de {args.runs})")
+    print(f"lifespan (rutas, pool y cachés): {statistics.median(lifespans):.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Micro-benchmark del coste en Python de las búsquedas más frecuentes.
+
+Compara, para cada búsqueda, construir la consulta en cada petición (db.query(...).filter(...))
+con reutilizar las sentencias precompiladas de app/database/statements.py. La base es SQLite
+en memoria con pocas filas, de modo que el tiempo medido es casi todo sobrecarga de Python
+(construcción de la consulta, clave de caché, compilación y carga de objetos).
+
+Uso:
+    python benchmarks/statement_cache.py --iterations 20000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+os.environ["DATABASE_URL"] = "sqlite://"
+
+from sqlalchemy import func
+
+from app.database.database import SessionLocal, engine
+from app.database.statements import CART_BY_USER, PRODUCT_BY_ID, USER_BY_EMAIL
+from app.models.models import Base, Cart, GenderType, Product, User
+
+EMAIL = "cliente@tiendaf.com"
+
+
+def seed():
+    db = SessionLocal()
+    try:
+        user = User(email=EMAIL, password="x")
+        db.add(user)
+        db.flush()
+        db.add(Cart(user_id=user.id))
+        db.add(Product(name="Producto", price=10, stock=5, gender=GenderType.UNISEX))
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    user_id = seed()
+    db = SessionLocal()
+
+    lookups = {
+        "usuario por email": (
+            lambda: db.query(User).filter(func.lower(User.email) == EMAIL.lower()).first(),
+            lambda: db.scalars(USER_BY_EMAIL, {"email": EMAIL.lower()}).first(),
+        ),
+        "carrito por usuario": (
+            lambda: db.query(Cart).filter(Cart.user_id == user_id).first(),
+            lambda: db.scalars(CART_BY_USER, {"user_id": user_id}).first(),
+        ),
+        "producto por id": (
+            lambda: db.query(Product).filter(Product.id == 1).first(),
+            lambda: db.scalars(PRODUCT_BY_ID, {"product_id": 1}).first(),
+        ),
+    }
+
+    print(f"{'búsqueda':22} {'query por petición':>20} {'precompilada':>14} {'ahorro':>8}")
+    for name, (dynamic, prebuilt) in lookups.items():
+        # Calentar la caché de compilación de SQLAlchemy antes de medir
+        dynamic()
+        prebuilt()
+        dynamic_us = min(timeit.repeat(dynamic, number=args.iterations, repeat=3)) / args.iterations * 1e6
+        prebuilt_us = min(timeit.repeat(prebuilt, number=args.iterations, repeat=3)) / args.iterations * 1e6
+        print(f"{name:22} {dynamic_us:17.1f} µs {prebuilt_us:11.1f} µs {1 - prebuilt_us / dynamic_us:7.0%}")
+
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Benchmark de contención sobre el stock de un único producto.
+
+Compara descontar stock sobre una sola fila (UPDATE products SET stock = stock - 1)
+frente a los contadores fragmentados de app/utils/stock_shards.py, con varios hilos
+confirmando una transacción por compra. El descuento fragmentado pasa por OrderStock,
+el mismo camino que el checkout.
+
+Uso:
+    python benchmarks/stock_contention.py --threads 16 --ops 200 --shards 8
+
+Por defecto usa una base SQLite temporal; con DATABASE_URL apuntando a PostgreSQL
+se mide la contención real de bloqueos por fila.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+from sqlalchemy import update
+
+from app.database.database import SessionLocal, engine
+from app.models.models import Base, GenderType, Product
+from app.utils.inventory import OrderStock
+from app.utils.stock_shards import enable_sharding, merge_shards
+
+
+def create_product(stock):
+    db = SessionLocal()
+    try:
+        product = Product(name="Producto de benchmark", price=10, stock=stock, gender=GenderType.UNISEX)
+        db.add(product)
+        db.commit()
+        return product.id
+    finally:
+        db.close()
+
+
+def take_single_row(db, product_id):
+    result = db.execute(
+        update(Product)
+        .where(Product.id == product_id, Product.stock >= 1)
+        .values(stock=Product.stock - 1)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def take_sharded(db, product_id):
+    # Mismo camino que el checkout: OrderStock decide si el producto es caliente y qué bloquear
+    return OrderStock(db, [product_id]).take(product_id, 1)
+
+
+def run(take, product_id, threads, ops):
+    errors = []
+
+    def worker():
+        db = SessionLocal()
+        try:
+            for _ in range(ops):
+                for attempt in range(20):
+                    try:
+                        take(db, product_id)
+                        db.commit()
+                        break
+                    except Exception as e:
+                        # SQLite serializa las escrituras: reintentar si la base está bloqueada
+                        db.rollback()
+                        if attempt == 19:
+                            errors.append(e)
+        finally:
+            db.close()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return threads * ops / elapsed, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=200)
+    parser.add_argument("--shards", type=int, default=8)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    stock = args.threads * args.ops * 2
+
+    product_id = create_product(stock)
+    rate, errors = run(take_single_row, product_id, args.threads, args.ops)
+    print(f"Fila única:   {rate:10.1f} compras/s  (errores: {errors})")
+
+    product_id = create_product(0)
+    db = SessionLocal()
+    enable_sharding(db, product_id, args.shards, datetime.utcnow() + timedelta(hours=1), stock)
+    db.commit()
+    db.close()
+    rate, errors = run(take_sharded, product_id, args.threads, args.ops)
+    print(f"Fragmentado:  {rate:10.1f} compras/s  (errores: {errors}, fragmentos: {args.shards})")
+
+    db = SessionLocal()
+    merge_shards(db, product_id)
+    db.commit()
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
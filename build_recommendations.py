@@ -0,0 +1,34 @@
+import argparse
+import os
+import sys
+import time
+
+# Añadir la ruta del proyecto al path
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BASE_DIR)
+
+from app.database.database import SessionLocal
+from app.utils.recommendations import DEFAULT_CHUNK_SIZE, DEFAULT_TOP_K, run_recommendation_job
+
+# Construir las recomendaciones "comprados juntos habitualmente" a partir del historial de órdenes.
+# Sin --full solo se procesan las órdenes nuevas desde la última ejecución.
+def main():
+    parser = argparse.ArgumentParser(description="Precalcular productos relacionados a partir de order_items")
+    parser.add_argument("--full", action="store_true", help="Reconstruir la matriz completa desde cero")
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K, help="Productos relacionados a guardar por producto")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Órdenes procesadas por tramo")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        run = run_recommendation_job(db, full=args.full, top_k=args.top_k, chunk_size=args.chunk_size)
+        print(
+            f"Órdenes procesadas: {run.orders_processed}, productos actualizados: {run.products_updated}, "
+            f"última orden: {run.last_order_id} ({time.perf_counter() - start:.1f}s)"
+        )
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
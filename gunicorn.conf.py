@@ -0,0 +1,51 @@
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+# Servidor de producción: gunicorn como supervisor de varios workers de uvicorn.
+# Se usa con `python manage.py serve` o directamente con `gunicorn main:app` (gunicorn carga
+# este fichero por defecto desde el directorio actual). Los valores salen del .env.
+#
+# - preload_app: la aplicación y sus rutas se importan una vez en el proceso maestro antes de
+#   crear los workers, que las comparten (copia en escritura) y arrancan antes.
+# - max_requests: cada worker se recicla tras SERVER_MAX_REQUESTS peticiones (más un margen
+#   aleatorio para que no se reinicien todos a la vez), lo que acota el crecimiento de memoria.
+# - post_fork: cada worker crea sus propios pools de conexiones; nunca se comparten sockets de
+#   base de datos entre procesos.
+# - Cada worker tiene sus propias métricas (etiquetadas con su pid) y su registro de consultas
+#   lentas y perfiles; las tareas periódicas compartidas las ejecuta un solo worker
+#   (app/utils/leader.py).
+load_dotenv()
+
+bind = os.getenv("SERVER_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("SERVER_WORKERS", 0)) or multiprocessing.cpu_count()
+worker_class = "uvicorn.workers.UvicornWorker"
+wsgi_app = "main:app"
+preload_app = True
+
+max_requests = int(os.getenv("SERVER_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.getenv("SERVER_MAX_REQUESTS_JITTER", max_requests // 10))
+
+# Tiempo que un worker saliente tiene para terminar sus peticiones en curso
+graceful_timeout = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", 30))
+timeout = int(os.getenv("SERVER_TIMEOUT", 60))
+keepalive = int(os.getenv("SERVER_KEEPALIVE", 5))
+
+# El pidfile permite a `python manage.py restart` localizar el proceso maestro
+pidfile = os.getenv("SERVER_PIDFILE", "tiendaf.pid")
+accesslog = os.getenv("SERVER_ACCESS_LOG") or None
+errorlog = "-"
+
+def when_ready(server):
+    # Registrar también las rutas en el maestro, para que los workers las hereden ya importadas
+    from main import include_routers
+    include_routers(server.app.wsgi())
+
+def post_fork(server, worker):
+    # Los pools heredados del maestro se descartan sin cerrar sus conexiones (pertenecen al
+    # maestro); el worker abre las suyas en el lifespan o en la primera petición
+    from app.database.database import engine, replicas
+    from app.database.async_database import async_engine, async_replicas
+    for target in [engine, *replicas.engines, async_engine, *async_replicas.engines]:
+        getattr(target, "sync_engine", target).dispose(close=False)
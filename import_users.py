@@ -0,0 +1,38 @@
+import argparse
+import os
+import sys
+import time
+
+# Añadir la ruta del proyecto al path
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BASE_DIR)
+
+from app.database.database import SessionLocal
+from app.utils.user_import import DEFAULT_BATCH_SIZE, import_users, iter_user_records
+
+# Importar usuarios de forma masiva desde un CSV (con cabecera) o JSON por líneas.
+# Columnas: email, password o password_hash (bcrypt), first_name, last_name, is_active
+def main():
+    parser = argparse.ArgumentParser(description="Importación masiva de usuarios")
+    parser.add_argument("file", help="Fichero de entrada ('-' para leer de stdin)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=None, help="Procesos para calcular los hash (por defecto, uno por núcleo)")
+    args = parser.parse_args()
+
+    stream = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8", newline="")
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        result = import_users(db, iter_user_records(stream, args.format), args.batch_size, args.workers)
+        elapsed = time.perf_counter() - start
+        print(f"Usuarios creados: {result.created}, duplicados: {result.duplicates}, inválidos: {result.invalid} ({elapsed:.1f}s)")
+        for error in result.errors:
+            print(f"  {error}")
+    finally:
+        db.close()
+        if stream is not sys.stdin:
+            stream.close()
+
+if __name__ == "__main__":
+    main()
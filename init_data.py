@@ -1,5 +1,7 @@
+import argparse
 import os
 import sys
+import time
 from dotenv import load_dotenv
 from sqlalchemy.orm import Session
 from passlib.context import CryptContext
@@ -130,6 +132,57 @@ def create_initial_data():
     finally:
         db.close()
         
+# Datos sintéticos a escala de producción (ver app/utils/synthetic_data.py)
+def create_synthetic_data(args):
+    from app.utils.synthetic_data import SYNTHETIC_PASSWORD, SyntheticConfig, generate
+
+    config = SyntheticConfig(
+        products=args.products,
+        users=args.users,
+        orders=args.orders,
+        categories=args.categories,
+        seed=args.seed,
+        zipf=args.zipf,
+        cart_ratio=args.cart_ratio,
+        days=args.days,
+        batch_size=args.batch_size
+    )
+    print(f"Generando {args.products} productos, {args.users} usuarios y {args.orders} pedidos (semilla {args.seed}, {args.workers} procesos)...")
+
+    def report(phase, rows, elapsed):
+        print(f"  {phase}: {rows} filas en {elapsed:.1f}s ({rows / elapsed if elapsed else 0:,.0f} filas/s)")
+
+    start = time.perf_counter()
+    result = generate(config, args.workers, report)
+    elapsed = time.perf_counter() - start
+    rate = result.total_rows / elapsed if elapsed else 0
+    print(f"Total: {result.total_rows} filas en {elapsed:.1f}s ({rate:,.0f} filas/s)")
+    for table, rows in result.rows.items():
+        print(f"  {table}: {rows}")
+    print(f"Contraseña de los usuarios sintéticos: {SYNTHETIC_PASSWORD}")
+
+    if args.min_rate and rate < args.min_rate:
+        print(f"Por debajo del objetivo de {args.min_rate:,.0f} filas/s")
+        sys.exit(1)
+
 if __name__ == "__main__":
-    create_initial_data()
+    parser = argparse.ArgumentParser(description="Datos iniciales y datos sintéticos de TiendaF")
+    parser.add_argument("--synthetic", action="store_true", help="Generar datos sintéticos en lugar de los datos iniciales")
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Exponente de la popularidad de los productos")
+    parser.add_argument("--cart-ratio", type=float, default=0.3, help="Fracción de usuarios con el carrito no vacío")
+    parser.add_argument("--days", type=int, default=365, help="Días de historial de pedidos")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=1, help="Procesos que generan e insertan lotes en paralelo")
+    parser.add_argument("--min-rate", type=float, default=None, help="Filas/s mínimas; código de salida 1 si no se alcanzan")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        create_synthetic_data(args)
+    else:
+        create_initial_data()
     print("Proceso de inicialización completado.")
\ No newline at end of file
@@ -1,25 +1,110 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+import asyncio
+import hashlib
+import json
+import logging
 import os
-from dotenv import load_dotenv
+import time
 
-from app.routes import auth, users, categories, products, cart, orders
-from app.database.database import engine
+from app.database.database import engine, warm_pool, READ_PRIMARY_COOKIE, READ_YOUR_WRITES_WINDOW, read_your_writes_until
+from app.database.async_database import warm_async_pool
 from app.models import models
+from app.utils.inventory import run_compaction_loop
+from app.utils.rankings import run_rankings_loop
+from app.utils.category_registry import warm_category_registry
+from app.utils.pricing import warm_pricing_rules
+from app.utils.compression import CompressionMiddleware
+from app.utils.metrics import MetricsMiddleware
+from app.utils.profiling import PROFILING_ENABLED, PROFILING_SAMPLE_RATE, ProfilingMiddleware, install_profiling
 
-# Cargar variables de entorno
-load_dotenv()
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Crear tablas en la base de datos
-models.Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
+
+# Modo de arranque. En "development" (por defecto) se crean al arrancar las tablas que falten.
+# En "production" no se toca el esquema (se aplica antes con `alembic upgrade head`), se sirve
+# el OpenAPI precalculado con `python manage.py openapi` y se abren las conexiones del pool
+# antes de aceptar peticiones.
+STARTUP_MODE = os.getenv("STARTUP_MODE", "development")
+OPENAPI_CACHE_PATH = os.getenv("OPENAPI_CACHE_PATH", os.path.join(BASE_DIR, "openapi.json"))
+
+# Crear tablas en la base de datos (solo desarrollo; en producción usar las migraciones)
+def create_schema() -> None:
+    models.Base.metadata.create_all(bind=engine)
+
+# Las rutas se importan y registran al arrancar, no al importar main
+def include_routers(app: FastAPI) -> None:
+    if getattr(app.state, "routers_loaded", False):
+        return
+    from app.routes import auth, users, categories, products, cart, orders, inventory, promotions, admin, metrics
+    for module in (auth, users, categories, products, cart, orders, inventory, promotions, admin, metrics):
+        app.include_router(module.router)
+    app.state.routers_loaded = True
+
+# Huella de las rutas registradas: una caché de OpenAPI generada con otras rutas no se usa
+def _routes_fingerprint(app: FastAPI) -> str:
+    routes = sorted(f"{' '.join(sorted(getattr(route, 'methods', None) or []))} {route.path}" for route in app.routes)
+    return hashlib.sha1("\n".join(routes).encode()).hexdigest()
+
+def write_openapi_cache(app: FastAPI, path: str = OPENAPI_CACHE_PATH) -> None:
+    include_routers(app)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"version": app.version, "routes": _routes_fingerprint(app), "schema": app.openapi()}, f)
+
+def load_openapi_cache(app: FastAPI, path: str = OPENAPI_CACHE_PATH) -> bool:
+    try:
+        with open(path, encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return False
+    # Si no coincide, el esquema se genera en la primera visita a /docs como hasta ahora
+    if cached.get("version") != app.version or cached.get("routes") != _routes_fingerprint(app):
+        logger.warning("La caché de OpenAPI %s no corresponde a las rutas actuales; se ignora", path)
+        return False
+    app.openapi_schema = cached["schema"]
+    return True
+
+# Tareas en segundo plano durante la vida de la aplicación
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    include_routers(app)
+    if STARTUP_MODE == "production":
+        load_openapi_cache(app)
+        # Abrir el pool síncrono y el asíncrono antes de la primera petición
+        await asyncio.to_thread(warm_pool)
+        await warm_async_pool()
+    else:
+        await asyncio.to_thread(create_schema)
+    # Cargar el registro de categorías y las promociones antes de aceptar peticiones
+    await asyncio.to_thread(warm_category_registry)
+    await asyncio.to_thread(warm_pricing_rules)
+    # Compactación periódica del libro de inventario
+    compaction_task = asyncio.create_task(run_compaction_loop())
+    # Contadores de ventas y rankings de más vendidos
+    rankings_task = asyncio.create_task(run_rankings_loop())
+    yield
+    compaction_task.cancel()
+    rankings_task.cancel()
 
 # Inicializar la aplicación
 app = FastAPI(
     title="TiendaF API",
     description="API para una tienda de productos para hombres y mujeres",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan,
+    # orjson codifica las respuestas mucho más rápido que json de la biblioteca estándar
+    default_response_class=ORJSONResponse
 )
 
+# Perfilado bajo demanda (X-Profile con token de administrador, o PROFILING_SAMPLE_RATE).
+# Solo se instala si está activado; se añade el primero para quedar junto al router.
+if PROFILING_ENABLED or PROFILING_SAMPLE_RATE > 0:
+    install_profiling()
+    app.add_middleware(ProfilingMiddleware)
+
 # Configurar CORS
 app.add_middleware(
     CORSMiddleware,
@@ -29,18 +114,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Incluir rutas
-app.include_router(auth.router)
-app.include_router(users.router)
-app.include_router(categories.router)
-app.include_router(products.router)
-app.include_router(cart.router)
-app.include_router(orders.router)
+# Comprimir las respuestas de texto según Accept-Encoding (COMPRESSION_MINIMUM_SIZE bytes como mínimo)
+app.add_middleware(CompressionMiddleware)
+
+# Tras una escritura, las lecturas del mismo cliente van al primario durante unos segundos
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    response = await call_next(request)
+    if getattr(request.state, "wrote_data", False) and READ_YOUR_WRITES_WINDOW > 0:
+        until = max(time.time() + READ_YOUR_WRITES_WINDOW, read_your_writes_until(request))
+        response.set_cookie(READ_PRIMARY_COOKIE, f"{until:.3f}", max_age=int(READ_YOUR_WRITES_WINDOW) + 1, httponly=True, samesite="lax")
+    return response
+
+# Latencia, consultas SQL y errores por ruta (GET /metrics y cabecera Server-Timing).
+# Se añade el último para envolver a los demás middlewares y medir la petición completa.
+app.add_middleware(MetricsMiddleware)
 
 @app.get("/")
 def read_root():
     return {"message": "Bienvenido a la API de TiendaF"}
 
+# Servidor de desarrollo (un proceso con recarga); en producción: python manage.py serve
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,118 @@
+import argparse
+import os
+import signal
+import sys
+import time
+
+# Añadir la ruta del proyecto al path
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BASE_DIR)
+
+from dotenv import load_dotenv
+
+# Solo se carga el .env: la aplicación (main, rutas y motores) se importa en los subcomandos
+# que la usan, no en restart, que solo envía señales al proceso maestro
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+# Pasos de despliegue que no se ejecutan al arrancar la aplicación en modo producción
+def migrate(args):
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(BASE_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BASE_DIR, "migrations"))
+    command.upgrade(config, "head")
+
+def create_schema(args):
+    import main
+    main.create_schema()
+    print("Tablas creadas")
+
+def openapi(args):
+    import main
+    output = args.output or main.OPENAPI_CACHE_PATH
+    main.write_openapi_cache(main.app, output)
+    print(f"Esquema OpenAPI guardado en {output}")
+
+# Servidor de producción con varios workers (configuración en gunicorn.conf.py)
+def serve(args):
+    from gunicorn.app.base import Application
+
+    class TiendaFServer(Application):
+        def load_config(self):
+            self.load_config_from_file(os.path.join(BASE_DIR, "gunicorn.conf.py"))
+            if args.workers:
+                self.cfg.set("workers", args.workers)
+            if args.bind:
+                self.cfg.set("bind", [args.bind])
+
+        def load(self):
+            # Con preload_app se llama una vez en el maestro, antes de crear los workers
+            import main
+            return main.app
+
+    TiendaFServer().run()
+
+def _read_pid(path: str) -> int:
+    try:
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+# Reinicio sin cortes: USR2 arranca un maestro nuevo (con el código actual) junto al antiguo,
+# que escribe su pid en <pidfile>.2; cuando sus workers están listos, TERM hace que los antiguos
+# terminen sus peticiones y salgan, y el maestro nuevo pasa a ocupar el pidfile
+def _wait_for_pid(path: str, expected, timeout: float) -> int:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        pid = _read_pid(path)
+        if pid and expected(pid):
+            return pid
+        time.sleep(0.5)
+    return 0
+
+def restart(args):
+    old_pid = _read_pid(args.pidfile)
+    if not old_pid:
+        sys.exit(f"No se encuentra el proceso maestro en {args.pidfile}")
+    os.kill(old_pid, signal.SIGUSR2)
+
+    new_pid = _wait_for_pid(args.pidfile + ".2", lambda pid: pid != old_pid, args.timeout)
+    if not new_pid:
+        sys.exit("El nuevo proceso maestro no ha arrancado; el servidor anterior sigue atendiendo")
+
+    # Margen para que los workers nuevos ejecuten el lifespan antes de retirar los antiguos
+    time.sleep(args.warmup)
+    try:
+        os.kill(new_pid, 0)
+    except ProcessLookupError:
+        sys.exit("El nuevo proceso maestro ha terminado; el servidor anterior sigue atendiendo")
+    os.kill(old_pid, signal.SIGTERM)
+
+    if not _wait_for_pid(args.pidfile, lambda pid: pid == new_pid, args.timeout):
+        sys.exit(f"El maestro {old_pid} no ha terminado; revisar las peticiones en curso")
+    print(f"Servidor reiniciado: maestro {old_pid} -> {new_pid}")
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Tareas de despliegue de TiendaF")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("migrate", help="Aplicar las migraciones pendientes (alembic upgrade head)").set_defaults(func=migrate)
+    subparsers.add_parser("create-schema", help="Crear las tablas que falten sin migraciones (desarrollo)").set_defaults(func=create_schema)
+    openapi_parser = subparsers.add_parser("openapi", help="Precalcular el esquema OpenAPI para STARTUP_MODE=production")
+    openapi_parser.add_argument("--output", help="Fichero de salida (por defecto OPENAPI_CACHE_PATH)")
+    openapi_parser.set_defaults(func=openapi)
+    serve_parser = subparsers.add_parser("serve", help="Arrancar el servidor de producción (gunicorn con workers de uvicorn)")
+    serve_parser.add_argument("--workers", type=int, help="Número de workers (por defecto SERVER_WORKERS o un worker por núcleo)")
+    serve_parser.add_argument("--bind", help="Dirección de escucha (por defecto SERVER_BIND)")
+    serve_parser.set_defaults(func=serve)
+    restart_parser = subparsers.add_parser("restart", help="Reiniciar el servidor de producción sin cortar peticiones")
+    restart_parser.add_argument("--pidfile", default=os.getenv("SERVER_PIDFILE", "tiendaf.pid"))
+    restart_parser.add_argument("--timeout", type=float, default=60, help="Segundos de espera a cada maestro")
+    restart_parser.add_argument("--warmup", type=float, default=5, help="Segundos de arranque de los workers nuevos")
+    restart_parser.set_defaults(func=restart)
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main_cli()
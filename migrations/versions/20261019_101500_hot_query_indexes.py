@@ -0,0 +1,81 @@
+"""Hot query indexes
+
+Revision ID: 164490fd4378
+Revises: 1ac7810eef6c
+Create Date: 2026-10-19 10:15:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '164490fd4378'
+down_revision: Union[str, None] = '1ac7810eef6c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Índices de las consultas más frecuentes de los routers
+INDEXES = [
+    ('ix_cart_items_cart_id_product_id', 'cart_items', ['cart_id', 'product_id']),
+    ('ix_orders_user_id_created_at', 'orders', ['user_id', 'created_at']),
+    ('ix_order_items_order_id', 'order_items', ['order_id']),
+    ('ix_addresses_user_id', 'addresses', ['user_id']),
+]
+
+# Índices parciales sobre productos activos (el catálogo nunca lista los inactivos)
+PARTIAL_INDEXES = [
+    ('ix_products_active_price', 'products', ['price', 'id']),
+    ('ix_products_active_name', 'products', ['name', 'id']),
+]
+
+
+def _existing_indexes(table_name: str) -> set:
+    # Las bases creadas con create_all pueden tener ya algunos de estos índices
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table_name)}
+
+
+def upgrade() -> None:
+    for name, table_name, columns in INDEXES:
+        if name not in _existing_indexes(table_name):
+            op.create_index(name, table_name, columns, unique=False)
+
+    active = sa.column('is_active') == sa.true()
+    for name, table_name, columns in PARTIAL_INDEXES:
+        if name not in _existing_indexes(table_name):
+            op.create_index(name, table_name, columns, unique=False, sqlite_where=active, postgresql_where=active)
+
+    # product_category no tenía clave primaria: se eliminan duplicados y filas incompletas
+    # y se crea la clave (product_id, category_id), que también sirve para cargar las
+    # categorías de una lista de productos
+    bind = op.get_bind()
+    if sa.inspect(bind).get_pk_constraint('product_category').get('constrained_columns'):
+        return
+    op.execute("DELETE FROM product_category WHERE product_id IS NULL OR category_id IS NULL")
+    if bind.dialect.name == 'postgresql':
+        op.execute(
+            "DELETE FROM product_category a USING product_category b "
+            "WHERE a.ctid > b.ctid AND a.product_id = b.product_id AND a.category_id = b.category_id"
+        )
+    else:
+        op.execute(
+            "DELETE FROM product_category WHERE rowid NOT IN ("
+            "SELECT min(rowid) FROM product_category GROUP BY product_id, category_id)"
+        )
+    with op.batch_alter_table('product_category', recreate='auto') as batch_op:
+        batch_op.alter_column('product_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column('category_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_primary_key('pk_product_category', ['product_id', 'category_id'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('product_category', recreate='auto') as batch_op:
+        batch_op.drop_constraint('pk_product_category', type_='primary')
+        batch_op.alter_column('product_id', existing_type=sa.Integer(), nullable=True)
+        batch_op.alter_column('category_id', existing_type=sa.Integer(), nullable=True)
+
+    for name, table_name, _ in reversed(PARTIAL_INDEXES + INDEXES):
+        op.drop_index(name, table_name=table_name)
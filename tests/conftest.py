@@ -0,0 +1,25 @@
+import os
+import sys
+import tempfile
+
+# Los tests usan una base SQLite temporal: la URL tiene que fijarse antes de importar la
+# aplicación, porque los motores se crean al importar app.database
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'tests.db')}"
+os.environ.pop("DATABASE_READ_URLS", None)
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ["STARTUP_MODE"] = "production"
+
+import pytest
+
+@pytest.fixture(scope="session")
+def migrated_db():
+    # Esquema creado con las migraciones, como en producción (así se validan también)
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(BASE_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BASE_DIR, "migrations"))
+    command.upgrade(config, "head")
+    return os.environ["DATABASE_URL"]
@@ -0,0 +1,151 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, func
+
+# Libro de inventario (app/utils/inventory.py): las órdenes registran movimientos en lugar de
+# reescribir products.stock, la compactación no cuenta dos veces los mismos movimientos aunque
+# la ejecuten dos procesos a la vez y la comprobación de consistencia detecta los descuadres.
+
+@pytest.fixture(scope="module")
+def client(migrated_db):
+    import main
+    with TestClient(main.app) as client:
+        yield client
+
+@pytest.fixture(scope="module")
+def admin(client):
+    from app.database.database import SessionLocal
+    from app.models.models import User
+    from app.utils.auth import get_password_hash
+
+    db = SessionLocal()
+    try:
+        user = User(email="inventario@tienda.test", password=get_password_hash("inventario"), first_name="Inventario", is_admin=True)
+        db.add(user)
+        db.commit()
+        user_id = user.id
+    finally:
+        db.close()
+    token = client.post("/auth/login", data={"username": "inventario@tienda.test", "password": "inventario"}).json()["access_token"]
+    return user_id, {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture
+def db(migrated_db):
+    from app.database.database import SessionLocal
+    session = SessionLocal()
+    yield session
+    session.close()
+
+def _create_product(db, stock):
+    from app.models.models import GenderType, Product
+    from app.utils.inventory import initialize_product_stock
+
+    product = Product(name="Producto del libro", price=10, stock=stock, gender=GenderType.UNISEX)
+    db.add(product)
+    db.flush()
+    initialize_product_stock(db, product)
+    db.commit()
+    return product.id
+
+def _movements(db, product_id):
+    from app.models.models import InventoryMovement
+    return [
+        (movement_type, quantity)
+        for movement_type, quantity in db.query(InventoryMovement.movement_type, InventoryMovement.quantity)
+        .filter(InventoryMovement.product_id == product_id).order_by(InventoryMovement.id)
+    ]
+
+def _available(db, product_id):
+    from app.utils.inventory import get_available_stock
+    db.expire_all()
+    return get_available_stock(db, product_id, use_cache=False)
+
+def test_order_round_trip_records_movements(client, admin, db):
+    from app.models.models import MovementType
+
+    user_id, headers = admin
+    product_id = _create_product(db, 10)
+    order = {"user_id": user_id, "shipping_address": "Calle 1", "items": [{"product_id": product_id, "quantity": 3}]}
+
+    # Pendiente: reserva el stock; al cancelarla se devuelve
+    response = client.post("/orders/", json=order, headers=headers)
+    assert response.status_code == 201
+    assert _available(db, product_id) == 7
+    assert client.delete(f"/orders/{response.json()['id']}", headers=headers).status_code == 204
+    assert _available(db, product_id) == 10
+
+    # Pagada: se registra como venta y ya no se puede cancelar
+    response = client.post("/orders/", json={**order, "status": "pagado"}, headers=headers)
+    assert response.status_code == 201
+    assert client.delete(f"/orders/{response.json()['id']}", headers=headers).status_code == 400
+    assert _available(db, product_id) == 7
+
+    # Sin stock suficiente no se crea la orden ni se registra nada
+    response = client.post("/orders/", json={**order, "items": [{"product_id": product_id, "quantity": 8}]}, headers=headers)
+    assert response.status_code == 400
+
+    assert _movements(db, product_id) == [
+        (MovementType.REPOSICION, 10),
+        (MovementType.RESERVA, -3),
+        (MovementType.CANCELACION, 3),
+        (MovementType.VENTA, -3),
+    ]
+
+def test_concurrent_compactions_do_not_count_movements_twice(db):
+    from app.database.database import SessionLocal
+    from app.models.models import InventoryBalance, InventoryMovement, MovementType, Product
+    from app.utils.inventory import clear_inventory_cache, compact_inventory, record_movement
+
+    product_id = _create_product(db, 10)
+    compact_inventory(db)
+    record_movement(db, product_id, -4, MovementType.VENTA)
+    record_movement(db, product_id, 2, MovementType.CANCELACION)
+    db.commit()
+
+    # La segunda compactación ya ha leído los saldos pendientes cuando la primera, que incluye
+    # además un movimiento posterior, confirma: su UPDATE llega con un last_movement_id anterior
+    # y no debe pisar el saldo más reciente (ni contar de nuevo lo ya compactado)
+    other = SessionLocal()
+    try:
+        connection = other.connection()
+        compacted_first = []
+
+        @event.listens_for(connection, "before_cursor_execute")
+        def compact_first(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("UPDATE inventory_balances") and not compacted_first:
+                compacted_first.append(True)
+                concurrent = SessionLocal()
+                try:
+                    record_movement(concurrent, product_id, -1, MovementType.VENTA)
+                    concurrent.commit()
+                    compact_inventory(concurrent)
+                finally:
+                    concurrent.close()
+
+        compact_inventory(other)
+        assert compacted_first
+    finally:
+        other.close()
+
+    db.expire_all()
+    clear_inventory_cache()
+    ledger = db.query(func.sum(InventoryMovement.quantity)).filter(InventoryMovement.product_id == product_id).scalar()
+    balance = db.get(InventoryBalance, product_id)
+    assert balance.quantity == ledger == 7
+    assert balance.last_movement_id == db.query(func.max(InventoryMovement.id)).filter(InventoryMovement.product_id == product_id).scalar()
+    assert db.get(Product, product_id).stock == 7
+    assert _available(db, product_id) == 7
+
+def test_consistency_check_reports_seeded_mismatch(db):
+    from app.models.models import Product
+    from app.utils.inventory import check_inventory_consistency, compact_inventory
+
+    product_id = _create_product(db, 6)
+    compact_inventory(db)
+    assert product_id not in {row["product_id"] for row in check_inventory_consistency(db)}
+
+    # Un products.stock reescrito por fuera del libro queda descuadrado frente al saldo
+    db.query(Product).filter(Product.id == product_id).update({Product.stock: 9})
+    db.commit()
+    discrepancies = {row["product_id"]: row for row in check_inventory_consistency(db)}
+    assert discrepancies[product_id] == {"product_id": product_id, "stock": 9, "balance": 6, "available": 6}
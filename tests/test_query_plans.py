@@ -0,0 +1,118 @@
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+# Planes de ejecución de las consultas que lanzan las rutas más usadas. Las sentencias no se
+# copian a mano: se capturan mientras se llama a las rutas reales (con sus combinaciones de
+# filtros) y se explica cada una con EXPLAIN QUERY PLAN. Falla si alguna recorre una tabla
+# completa (SCAN <tabla> sin índice).
+
+FULL_SCAN = re.compile(r"\bSCAN (\w+)(?!\w| USING)")
+
+@pytest.fixture(scope="module")
+def client(migrated_db):
+    from app.utils.synthetic_data import SyntheticConfig, generate
+    generate(SyntheticConfig(products=2000, users=200, orders=500, categories=20, seed=7))
+
+    import main
+    with TestClient(main.app) as client:
+        yield client
+
+@pytest.fixture(scope="module")
+def headers(client):
+    from app.utils.synthetic_data import SYNTHETIC_PASSWORD
+    from app.database.database import SessionLocal
+    from app.models.models import Order, User
+
+    # Un cliente con carrito y pedidos, para que las rutas recorran todas sus consultas
+    db = SessionLocal()
+    try:
+        user = db.query(User).join(Order, Order.user_id == User.id).filter(User.is_admin == False).first()
+        email = user.email
+    finally:
+        db.close()
+    token = client.post("/auth/login", data={"username": email, "password": SYNTHETIC_PASSWORD}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+class StatementRecorder:
+    """Sentencias ejecutadas por los motores síncrono y asíncrono, con sus parámetros."""
+
+    def __init__(self):
+        from app.database.database import engine
+        from app.database.async_database import async_engine
+        self.targets = [engine, async_engine.sync_engine]
+        self.statements = {}
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "WITH", "UPDATE", "DELETE")):
+            self.statements.setdefault(statement, parameters)
+
+    def __enter__(self):
+        for target in self.targets:
+            event.listen(target, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        for target in self.targets:
+            event.remove(target, "before_cursor_execute", self._record)
+
+def _exercise_routes(client, headers):
+    product_queries = [
+        {},
+        {"category_id": 3},
+        {"gender": "mujer"},
+        {"min_price": 20},
+        {"max_price": 50},
+        {"min_price": 20, "max_price": 50},
+        {"category_id": 3, "gender": "hombre", "min_price": 10, "max_price": 90},
+        {"search": "camiseta"},
+        {"category_id": 2, "search": "azul"},
+        {"skip": 100, "limit": 20},
+        {"fields": "id,name,price"},
+        {"fields": "id,name,stock", "embed": "categories"},
+    ]
+    for params in product_queries:
+        assert client.get("/products/", params=params).status_code == 200, params
+    for path in ("/products/5", "/products/5/related", "/products/top", "/products/top?ranking=trending&category_id=3",
+                 "/categories/", "/categories/3", "/categories/3/products"):
+        assert client.get(path).status_code == 200, path
+
+    for path in ("/users/me", "/cart/", "/orders/", "/orders/?fields=id,status,total_amount&embed="):
+        assert client.get(path, headers=headers).status_code == 200, path
+    order_id = client.get("/orders/", headers=headers).json()[0]["id"]
+    assert client.get(f"/orders/{order_id}", headers=headers).status_code == 200
+
+    # Carrito y compra (con productos que tienen stock)
+    from app.database.database import SessionLocal
+    from app.utils.inventory import get_available_stock_bulk
+    db = SessionLocal()
+    try:
+        available = get_available_stock_bulk(db, range(1, 101))
+    finally:
+        db.close()
+    first, second = [product_id for product_id, stock in sorted(available.items()) if stock >= 2][:2]
+    assert client.delete("/cart/", headers=headers).status_code == 204
+    item = client.post("/cart/items", json={"product_id": first, "quantity": 1}, headers=headers)
+    assert item.status_code == 201, item.text
+    assert client.put(f"/cart/items/{item.json()['id']}", json={"quantity": 2}, headers=headers).status_code == 200
+    assert client.post("/cart/items", json={"product_id": second, "quantity": 1}, headers=headers).status_code == 201
+    checkout = client.post("/orders/checkout", params={"shipping_address": "Calle 1"}, headers=headers)
+    assert checkout.status_code == 200, checkout.text
+
+def test_hot_queries_use_indexes(client, headers):
+    from app.database.database import engine
+
+    with StatementRecorder() as recorder:
+        _exercise_routes(client, headers)
+    assert recorder.statements
+
+    failures = []
+    with engine.connect() as connection:
+        for statement, parameters in recorder.statements.items():
+            plan = [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+            scans = [match.group(1) for line in plan for match in [FULL_SCAN.search(line)] if match]
+            if scans:
+                failures.append(f"SCAN {', '.join(scans)}: {' '.join(statement.split())}\n    " + "\n    ".join(plan))
+    assert not failures, "Consultas que recorren tablas completas:\n" + "\n".join(failures)
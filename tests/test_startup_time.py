@@ -0,0 +1,40 @@
+import os
+import statistics
+import subprocess
+import sys
+
+# Presupuesto del import de main en un proceso nuevo (lo que paga cada worker al arrancar).
+# Detecta regresiones como trabajo de base de datos o construcción de rutas al importar.
+IMPORT_BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", 2000))
+RUNS = 5
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import main
+print(f"{(time.perf_counter() - start) * 1000:.1f}")
+"""
+
+def _import_ms() -> float:
+    env = dict(os.environ, STARTUP_MODE="production")
+    result = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True)
+    return float(result.stdout.split()[-1])
+
+def test_main_import_within_budget(migrated_db):
+    import_ms = statistics.median(_import_ms() for _ in range(RUNS))
+    assert import_ms <= IMPORT_BUDGET_MS, f"El import de main tarda {import_ms:.0f} ms (presupuesto {IMPORT_BUDGET_MS:.0f} ms); ver python benchmarks/startup_time.py"
+
+def test_import_does_not_register_routes_or_touch_database(migrated_db):
+    # Las rutas se registran en el lifespan y el pool no se abre al importar
+    code = (
+        "import main\n"
+        "from app.database.database import engine\n"
+        "print(len(main.app.routes), engine.pool.checkedout() + engine.pool.checkedin())\n"
+    )
+    env = dict(os.environ, STARTUP_MODE="production")
+    result = subprocess.run([sys.executable, "-c", code], cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True)
+    routes, connections = map(int, result.stdout.split()[-2:])
+    assert connections == 0
+    assert routes <= 5  # solo / y las rutas de documentación de FastAPI
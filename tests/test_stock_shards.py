@@ -0,0 +1,141 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+# Contadores fragmentados de los productos calientes (app/utils/stock_shards.py): el stock
+# nunca queda negativo, un descuento que no se completa no deja nada descontado y, al fusionar,
+# el disponible vuelve a ser el del libro de inventario.
+
+@pytest.fixture
+def db(migrated_db):
+    from app.database.database import SessionLocal
+    session = SessionLocal()
+    yield session
+    session.close()
+
+def _create_product(db, stock):
+    from app.models.models import GenderType, Product
+    from app.utils.inventory import initialize_product_stock
+
+    product = Product(name="Producto caliente", price=10, stock=stock, gender=GenderType.UNISEX)
+    db.add(product)
+    db.flush()
+    initialize_product_stock(db, product)
+    db.commit()
+    return product.id
+
+def _shard(db, product_id, quantities):
+    from app.models.models import StockShard
+    from app.utils.stock_shards import enable_sharding
+
+    hot_product = enable_sharding(db, product_id, len(quantities), datetime.now(timezone.utc) + timedelta(hours=1), 0)
+    db.flush()
+    for shard_index, quantity in enumerate(quantities):
+        db.query(StockShard).filter(StockShard.product_id == product_id, StockShard.shard_index == shard_index).update({StockShard.quantity: quantity})
+    db.commit()
+    return hot_product
+
+def _shard_quantities(db, product_id):
+    from app.models.models import StockShard
+    db.expire_all()
+    return [quantity for (quantity,) in db.query(StockShard.quantity).filter(StockShard.product_id == product_id).order_by(StockShard.shard_index)]
+
+def test_concurrent_takes_never_go_below_zero(db):
+    from app.database.database import SessionLocal
+    from app.utils.stock_shards import get_hot_products, take_from_shards
+
+    product_id = _create_product(db, 0)
+    _shard(db, product_id, [5, 5, 5, 5])
+    taken = []
+
+    def buyer(quantity):
+        session = SessionLocal()
+        try:
+            for _ in range(10):
+                for _ in range(50):
+                    try:
+                        hot_product = get_hot_products(session, [product_id])[product_id]
+                        if take_from_shards(session, hot_product, quantity):
+                            taken.append(quantity)
+                        session.commit()
+                        break
+                    except OperationalError:
+                        # SQLite serializa las escrituras: se reintenta si la base está bloqueada
+                        session.rollback()
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=buyer, args=(quantity,)) for quantity in (1, 2, 3, 1, 2, 3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    quantities = _shard_quantities(db, product_id)
+    assert min(quantities) >= 0
+    assert sum(taken) <= 20
+    assert sum(quantities) == 20 - sum(taken)
+
+def test_slow_path_rolls_back_when_quantity_cannot_be_filled(db):
+    from app.utils.stock_shards import take_from_shards
+
+    product_id = _create_product(db, 0)
+    hot_product = _shard(db, product_id, [3, 3, 3, 3])
+
+    # Ningún fragmento cubre 13 ni la suma alcanza: no se descuenta nada
+    assert not take_from_shards(db, hot_product, 13)
+    db.commit()
+    assert _shard_quantities(db, product_id) == [3, 3, 3, 3]
+
+    # 10 unidades solo se cubren repartiendo entre varios fragmentos
+    assert take_from_shards(db, hot_product, 10)
+    db.commit()
+    quantities = _shard_quantities(db, product_id)
+    assert sum(quantities) == 2 and min(quantities) >= 0
+
+def test_merge_expired_shards_compares_hot_until_in_utc(db):
+    from app.models.models import HotProduct
+    from app.utils.stock_shards import enable_sharding, merge_expired_shards
+
+    now = datetime.now(timezone.utc)
+    # Con otra zona horaria: si se quitara la zona sin convertir a UTC, el vencido parecería
+    # vigente durante 5 horas y el vigente vencido
+    expired_id = _create_product(db, 4)
+    enable_sharding(db, expired_id, 2, (now - timedelta(minutes=30)).astimezone(timezone(timedelta(hours=5))), 4)
+    current_id = _create_product(db, 4)
+    enable_sharding(db, current_id, 2, (now + timedelta(minutes=30)).astimezone(timezone(timedelta(hours=-5))), 4)
+    db.commit()
+
+    merge_expired_shards(db)
+    hot_ids = {product_id for (product_id,) in db.query(HotProduct.product_id).filter(HotProduct.product_id.in_([expired_id, current_id]))}
+    assert hot_ids == {current_id}
+    assert _shard_quantities(db, expired_id) == []
+    assert sum(_shard_quantities(db, current_id)) == 4
+
+def test_available_matches_ledger_after_merge(db):
+    from sqlalchemy import func
+    from app.models.models import InventoryMovement, MovementType
+    from app.utils.inventory import OrderStock, clear_inventory_cache, get_available_stock, record_movement
+    from app.utils.stock_shards import enable_sharding, merge_shards
+
+    product_id = _create_product(db, 10)
+    enable_sharding(db, product_id, 4, datetime.now(timezone.utc) + timedelta(hours=1), get_available_stock(db, product_id, use_cache=False))
+    db.commit()
+
+    # Compras por el mismo camino que el checkout: fragmentos + movimiento en el libro
+    for quantity in (3, 2, 4):
+        stock = OrderStock(db, [product_id])
+        assert stock.take(product_id, quantity)
+        record_movement(db, product_id, -quantity, MovementType.RESERVA)
+        db.commit()
+    assert not OrderStock(db, [product_id]).take(product_id, 2)
+    db.rollback()
+    assert get_available_stock(db, product_id, use_cache=False) == 1
+
+    merge_shards(db, product_id)
+    db.commit()
+    clear_inventory_cache()
+    ledger = db.query(func.sum(InventoryMovement.quantity)).filter(InventoryMovement.product_id == product_id).scalar()
+    assert get_available_stock(db, product_id) == ledger == 1